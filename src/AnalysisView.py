@@ -0,0 +1,365 @@
+import customtkinter
+import numpy as np
+import os
+from datetime import datetime
+from tkinter import ttk
+import HelperFunctions
+import TraceStatistics
+import TraceContention
+import TraceLatency
+import TraceInterrupts
+import TracePeriods
+import TracePreemption
+import TraceIssues
+import TraceDiff
+import TraceExport
+import TraceArchive
+from TraceView import TraceView
+
+class TableWindow(customtkinter.CTkToplevel):
+    """
+    Window that shows the result of a trace analysis as a table. The rows can be sorted by clicking on a column header.
+    If onSelect is given, it is called with the index of the row (in the given list of rows) that is double clicked.
+    actions is a list of (text, command) that are shown as buttons below the table (e.g. to export the table).
+    """
+    def __init__(self, master, title, columns, rows, onSelect=None, actions=()):
+        super().__init__(master)
+
+        self.title(title)
+        self.geometry("1200x400")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.columns = columns
+        self.rows = rows
+        self.onSelect = onSelect
+        self.sortColumn = None          # Index of the column the table is sorted by
+        self.sortDescending = False
+
+        self.table = ttk.Treeview(self, columns=[str(i) for i in range(len(columns))], show="headings")
+        for i, column in enumerate(columns):
+            self.table.heading(str(i), text=column, command=lambda i=i: self.sortBy(i))
+            self.table.column(str(i), width=max(80, 8 * len(column)), anchor="e" if i > 0 else "w", stretch=False)
+        self.table.grid(row=0, column=0, sticky="nsew")
+
+        self.scrollbarY = customtkinter.CTkScrollbar(self, command=self.table.yview)
+        self.scrollbarY.grid(row=0, column=1, sticky="ns")
+        self.scrollbarX = customtkinter.CTkScrollbar(self, command=self.table.xview, orientation="horizontal")
+        self.scrollbarX.grid(row=1, column=0, sticky="ew")
+        self.table.configure(yscrollcommand=self.scrollbarY.set, xscrollcommand=self.scrollbarX.set)
+
+        if self.onSelect is not None:
+            self.table.bind("<Double-1>", self.rowSelected)
+
+        if len(actions) > 0:
+            self.frm_actions = customtkinter.CTkFrame(self, fg_color="transparent")
+            self.frm_actions.grid(row=2, column=0, columnspan=2, sticky="e")
+            for i, (text, command) in enumerate(actions):
+                customtkinter.CTkButton(self.frm_actions, text=text, command=command).grid(row=0, column=i, padx=(0, 10), pady=5)
+
+        self.fillTable(range(len(rows)))
+
+    def fillTable(self, order):
+        """
+        Shows the rows in the given order.
+        """
+        self.table.delete(*self.table.get_children())
+        for index in order:
+            self.table.insert("", "end", iid=str(index), values=self.rows[index])
+
+    def sortBy(self, column):
+        """
+        Sorts the table by the given column. Clicking the same column again reverses the order.
+        """
+        if self.sortColumn == column:
+            self.sortDescending = not self.sortDescending
+        else:
+            self.sortColumn = column
+            self.sortDescending = False
+
+        def sortKey(index):
+            value = self.rows[index][column]
+            if isinstance(value, (int, float)):
+                return (0, value, "")
+            return (1, 0, str(value))    # Text (e.g. "-" for missing values) is sorted after numbers
+
+        self.fillTable(sorted(range(len(self.rows)), key=sortKey, reverse=self.sortDescending))
+
+    def rowSelected(self, event):
+        selection = self.table.selection()
+        if len(selection) > 0:
+            self.onSelect(int(selection[0]))
+
+def getTraceSet(gui):
+    """
+    Returns the trace set shown in the trace view, or None (and prints a message) if no trace is loaded.
+    """
+    if gui.traceView.tasks is None:
+        HelperFunctions.printState("No trace loaded!")
+        return None
+    return gui.traceView.tasks
+
+def showTaskStatistics(gui):
+    """
+    Shows the timing statistics of all tasks of the loaded trace.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    columns, rows = TraceStatistics.getStatisticsTable(traceSet)
+    return TableWindow(gui, "Task Statistics", columns, rows)
+
+def showWindowStatistics(gui):
+    """
+    Shows the statistics of each task in the visible window of the trace view.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    left = gui.traceView.leftBound_tks
+    right = gui.traceView.rightBound_tks
+    columns, rows = TraceStatistics.getWindowStatisticsTable(traceSet, left, right)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+    return TableWindow(gui, "Window Statistics [" + str(round(left, 1)) + " " + unit + ", " + str(round(right, 1)) + " " + unit + "]", columns, rows)
+
+def showMutexContention(gui):
+    """
+    Prints the statistics of each mutex and lists all waits on mutexes (with priority inversions).
+    Double clicking a wait shows it in the trace view.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    TraceContention.printMutexStatistics(traceSet)
+    waits = TraceContention.analyzeMutexes(traceSet).waits
+    columns, rows = TraceContention.getWaitTable(traceSet)
+
+    def showWait(index):
+        gui.traceView.centerView(waits[index].start, waits[index].acquired)
+
+    return TableWindow(gui, "Mutex Contention", columns, rows, onSelect=showWait)
+
+def showReadyLatency(gui):
+    """
+    Shows the ready latency distribution of each task and core, and the ready phases with the largest latency.
+    Double clicking a ready phase shows it in the trace view.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    if TraceLatency.analyzeReadyLatency(traceSet) is None:
+        HelperFunctions.printState("No trace events available!")
+        return None
+
+    columns, rows = TraceLatency.getLatencyTable(traceSet)
+    TableWindow(gui, "Ready Latency", columns, rows)
+
+    unit = TraceStatistics.getTimeUnit(traceSet)
+    cases = TraceLatency.getWorstCases(traceSet)
+    caseRows = [[task.name if task is not None else "-", core, round(ready, 1), round(start, 1), round(latency, 1)] for task, core, ready, start, latency in cases]
+
+    def showCase(index):
+        gui.traceView.centerView(cases[index][2], cases[index][3])
+
+    return TableWindow(gui, "Worst-Case Ready Latency", ["Task", "Core", "Ready [" + unit + "]", "Start [" + unit + "]", "Latency [" + unit + "]"], caseRows, onSelect=showCase)
+
+def showInterruptProfile(gui):
+    """
+    Prints the interrupt load of each core and lists the profile of each IRQ id.
+    Double clicking an IRQ shows the invocation that delayed a task the most in the trace view.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    profile = TraceInterrupts.analyzeInterrupts(traceSet)
+    if profile is None:
+        HelperFunctions.printState("No ISR events available!")
+        return None
+
+    TraceInterrupts.printInterruptProfile(traceSet)
+    columns, rows = TraceInterrupts.getIrqTable(traceSet)
+
+    def showWorstCase(index):
+        worstCase = profile.irqs[index].worstCase
+        if worstCase is not None:
+            gui.traceView.centerView(worstCase[0], worstCase[1])
+
+    return TableWindow(gui, "Interrupt Profile", columns, rows, onSelect=showWorstCase)
+
+def showTaskPeriods(gui):
+    """
+    Shows the period, offset and jitter of each user task, estimated from the release times of its jobs.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    columns, rows = TracePeriods.getPeriodTable(traceSet)
+    return TableWindow(gui, "Task Periods", columns, rows)
+
+def showPreemptions(gui):
+    """
+    Prints the preemptions, migrations and scheduler time of each core and shows the statistics of each task and
+    which task preempted which task.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    TracePreemption.printCoreStatistics(traceSet)
+    columns, rows = TracePreemption.getTaskTable(traceSet)
+    TableWindow(gui, "Preemptions and Migrations", columns, rows)
+
+    columns, rows = TracePreemption.getPairTable(traceSet)
+    return TableWindow(gui, "Preempted by", columns, rows)
+
+def showTimingIssues(gui):
+    """
+    Lists all timing issues (deadline misses, incomplete jobs, response time outliers). Double clicking an issue shows
+    it in the trace view, the issues are exported as CSV file to the output folder of the trace with the export button.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    index = TraceIssues.getIssueIndex(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    def exportIssues():
+        outputPath = HelperFunctions.getOutputPath(gui)
+        HelperFunctions.makeFolder(outputPath)
+        csvFilename = os.path.abspath(os.path.join(outputPath, "Issues_" + datetime.now().strftime("%d_%m_%Y_%H_%M_%S") + ".csv"))
+        index.exportCsv(csvFilename, unit)
+        HelperFunctions.printState("Exported " + str(len(index)) + " issues to", csvFilename)
+
+    def showIssue(row):
+        gui.traceView.centerView(float(index.start[row]), float(index.stop[row]))
+
+    return TableWindow(gui, "Timing Issues", TraceIssues.getColumns(unit), index.getRows(), onSelect=showIssue, actions=[("Export CSV", exportIssues)])
+
+def exportPerfettoTrace(gui):
+    """
+    Exports the trace as gzip compressed Chrome Trace Event JSON to the output folder of the trace (e.g. to open it in Perfetto).
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    outputPath = HelperFunctions.getOutputPath(gui)
+    HelperFunctions.makeFolder(outputPath)
+    filename = os.path.abspath(os.path.join(outputPath, "Trace_" + datetime.now().strftime("%d_%m_%Y_%H_%M_%S") + ".json.gz"))
+    intervals = TraceExport.exportChromeTrace(traceSet, filename)
+    HelperFunctions.printState("Exported " + str(intervals) + " intervals to", filename)
+    return None
+
+def exportNumpyArchive(gui):
+    """
+    Saves the trace as compressed NumPy archive (.npz) to the output folder of the trace (see TraceArchive.loadArchive()).
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    outputPath = HelperFunctions.getOutputPath(gui)
+    HelperFunctions.makeFolder(outputPath)
+    filename = os.path.abspath(os.path.join(outputPath, "Trace_" + datetime.now().strftime("%d_%m_%Y_%H_%M_%S") + ".npz"))
+    TraceArchive.saveArchive(traceSet, filename)
+    HelperFunctions.printState("Saved archive", filename)
+    return None
+
+class TraceComparisonWindow(customtkinter.CTkToplevel):
+    """
+    Window that shows two traces above each other with a shared time window: the reference trace on top and the
+    compared trace below. The jobs with a response time regression are outlined in both traces.
+    """
+    def __init__(self, master, comparison, title):
+        super().__init__(master)
+
+        self.title(title)
+        self.geometry("1200x800")
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure((1, 3), weight=1)
+
+        self.views = []
+        for row, (traceSet, reference, label) in enumerate(((comparison.referenceSet, True, "Reference"), (comparison.traceSet, False, "Compared Trace"))):
+            customtkinter.CTkLabel(self, text=label, anchor="w", font=customtkinter.CTkFont(size=15, weight="bold")).grid(row=2 * row, column=0, sticky="we", padx=10)
+
+            view = TraceView(self)
+            view.fitWindowHeight = False
+            view.grid(row=2 * row + 1, column=0, sticky="nswe", padx=5, pady=5)
+            view.setTasks(traceSet)
+            view.highlights = TraceDiff.getRegressionWindows(comparison, reference)
+            view.bind("<B1-Motion>", view.mouseDragHandler)
+            view.bind("<ButtonPress>", view.buttonPressed)
+            view.bind("<ButtonRelease>", view.buttonReleased)
+            view.bind("<Configure>", lambda event, view=view: view.draw())
+            self.views.append(view)
+
+        self.views[0].linkedViews.append(self.views[1])
+        self.views[1].linkedViews.append(self.views[0])
+
+        # Both traces can be zoomed up to the end of the longer trace
+        for view in self.views:
+            view.zoomMin = max(other.zoomMin for other in self.views)
+        self.views[1].leftBound_tks = self.views[0].leftBound_tks
+        self.views[1].rightBound_tks = self.views[0].rightBound_tks
+        self.views[0].draw()
+
+        self.bind("<Up>", lambda event: self.views[0].zoom(1))
+        self.bind("<Down>", lambda event: self.views[0].zoom(-1))
+
+    def centerView(self, start, stop):
+        self.views[0].centerView(start, stop)
+
+def showTraceComparison(gui):
+    """
+    Asks for a second recording of the selected target, parses it and compares it with the loaded trace.
+    """
+    traceSet = getTraceSet(gui)
+    if traceSet is None:
+        return None
+
+    target = gui.targets[gui.selectedTarget]
+    recordings = [name for name in gui.opt_selectTrace.cget("values") if name != gui.opt_selectTrace.get() and name != 'None']
+    if target.get('compareTraceFunc') is None or len(recordings) == 0:
+        HelperFunctions.printState("No other recording to compare with!")
+        return None
+
+    dialog = customtkinter.CTkToplevel(gui)
+    dialog.title("Compare Traces")
+    customtkinter.CTkLabel(dialog, text="Reference recording:").grid(row=0, column=0, padx=20, pady=(10, 0), sticky="w")
+    opt_reference = customtkinter.CTkOptionMenu(dialog, values=recordings)
+    opt_reference.grid(row=1, column=0, padx=20, pady=5, sticky="ew")
+    opt_mode = customtkinter.CTkOptionMenu(dialog, values=list(TraceDiff.alignmentModes))
+    opt_mode.grid(row=2, column=0, padx=20, pady=5, sticky="ew")
+
+    def showComparison(referenceSet, name, mode):
+        comparison = TraceDiff.compareTraces(traceSet, referenceSet, mode)
+        window = TraceComparisonWindow(gui, comparison, "Comparison with " + name)
+
+        columns, rows = TraceDiff.getComparisonTable(comparison)
+
+        def showRegression(index):
+            if index < len(comparison.tasks):
+                result = comparison.tasks[index]
+                regressions = result.rows[result.regression]
+                if len(regressions) > 0:    # Show the largest regression of the task
+                    row = regressions[np.nanargmax(result.responseDelta[result.regression])]
+                    window.centerView(float(result.task.columns['job_release'][row]), float(result.task.columns['job_finishMax'][row]))
+
+        TableWindow(gui, "Comparison with " + name, columns, rows, onSelect=showRegression)
+
+    def compare():
+        name = opt_reference.get()
+        mode = opt_mode.get()
+        dialog.destroy()
+        HelperFunctions.printState("Parsing reference recording", name)
+        target.get('compareTraceFunc')(gui, target.get('numCores'), name, lambda referenceSet: showComparison(referenceSet, name, mode))
+
+    customtkinter.CTkButton(dialog, text="Compare", command=compare).grid(row=3, column=0, padx=20, pady=(5, 10), sticky="ew")
+    return dialog
@@ -70,6 +70,24 @@ def hexdump(buffer: bytes, base_addr: int = 0, width: int = 16):
 
             print(f"0x{addr:08x}  {hex_bytes}  |{ascii_part}|") 
 
+def chunkRanges(numItems, firstChunk, maxChunk):
+    """
+    Splits the range 0..numItems into consecutive chunks. The first chunk has firstChunk items,
+    each following chunk is twice as large as the previous one, up to maxChunk items.
+    Returns a list of (first, last) index tuples.
+    """
+    ranges = []
+    first = 0
+    size = firstChunk
+
+    while first < numItems:
+        last = min(first + size, numItems)
+        ranges.append((first, last))
+        first = last
+        size = min(size * 2, maxChunk)
+
+    return ranges
+
 def getTimeString():
     """
     Returns a time string. 
@@ -114,10 +132,11 @@ def getRecordingFolderName(gui):
     measurementName = f"{gui.txt_traceName.get()}_{getTimeString()}"
     return os.path.abspath(os.path.join(os.path.dirname( getCwd() ), 'data', targetName, measurementName))
     
-def getViewingFolderName(gui):
-    """ Helper to create the absolute path for the trace visualization. """
+def getViewingFolderName(gui, measurementName=None):
+    """ Helper to create the absolute path for the trace visualization (of the selected measurement, if measurementName is None). """
     targetName = gui.targets[gui.selectedTarget].get('name').replace(' ', '_')
-    measurementName = gui.opt_selectTrace.get()
+    if measurementName is None:
+        measurementName = gui.opt_selectTrace.get()
     return os.path.abspath(os.path.join(os.path.dirname( getCwd() ), 'data', targetName, measurementName))
 
 def getOutputPath(gui):
@@ -0,0 +1,94 @@
+import sys
+import gc
+import tracemalloc
+from TraceTask import *
+
+"""
+Memory benchmark of the trace data model.
+Builds the same synthetic trace with __dict__ based classes (the layout used before the model
+classes had __slots__), with the classes of TraceTask.py and as a frozen task (NumPy columns)
+and reports the bytes per interval.
+
+Usage: python MemoryBenchmark.py [numIntervals] [intervalsPerJob]
+"""
+
+class DictInterval():
+    """
+    Execution interval with a per-instance __dict__ (reference layout).
+    """
+    def __init__(self, startTime, core, type):
+        self.type = type
+        self.core = core
+        self.start = startTime
+        self.stop = None
+
+class DictJob():
+    """
+    Job with a per-instance __dict__ (reference layout).
+    """
+    def __init__(self, task, id, releaseTime, deadline):
+        self.task = task
+        self.id = id
+        self.execIntervals = []
+        self.releaseTime = releaseTime
+        self.deadline = deadline
+        self.activeInterval = None
+        self.incomplete = False
+        self.mutexAccess = []
+
+def buildTrace(jobClass, intervalClass, numIntervals, intervalsPerJob):
+    """
+    Builds a list of jobs with numIntervals execution intervals in total.
+    Timestamps are distinct integers (as in FreeRTOS traces), so they are not shared between intervals.
+    """
+    jobs = []
+    ts = 1000
+    for jobId in range((numIntervals + intervalsPerJob - 1) // intervalsPerJob):
+        job = jobClass(None, jobId, ts, ts + 10000)
+        for i in range(min(intervalsPerJob, numIntervals - jobId * intervalsPerJob)):
+            interval = intervalClass(ts + 1, i % 2, ExecutionType.EXECUTE)
+            interval.stop = ts + 7
+            job.execIntervals.append(interval)
+            ts = ts + 10
+        jobs.append(job)
+    return jobs
+
+def buildFrozenTrace(numIntervals, intervalsPerJob):
+    """
+    Builds the same trace as buildTrace() in a task and freezes it (see TraceTask.freeze()).
+    """
+    task = TraceTask(1000, "Task", 1, "#121212")
+    task.jobs = buildTrace(TraceJob, TraceInterval, numIntervals, intervalsPerJob)
+    task.freeze()
+    return task
+
+def measure(jobClass, intervalClass, numIntervals, intervalsPerJob):
+    """
+    Returns the number of bytes allocated for the trace and the number of bytes per interval.
+    If jobClass is None, the size of the frozen trace is measured.
+    """
+    gc.collect()
+    tracemalloc.start()
+    if jobClass is None:
+        jobs = buildFrozenTrace(numIntervals, intervalsPerJob)
+    else:
+        jobs = buildTrace(jobClass, intervalClass, numIntervals, intervalsPerJob)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del jobs
+    return size, size / numIntervals
+
+if __name__ == "__main__":
+    numIntervals = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    intervalsPerJob = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print("Memory benchmark: " + str(numIntervals) + " intervals, " + str(intervalsPerJob) + " intervals per job")
+
+    before, beforePerInterval = measure(DictJob, DictInterval, numIntervals, intervalsPerJob)
+    after, afterPerInterval = measure(TraceJob, TraceInterval, numIntervals, intervalsPerJob)
+    frozen, frozenPerInterval = measure(None, None, numIntervals, intervalsPerJob)
+
+    print("\t__dict__:  " + str(round(before / 1e6, 1)) + " MB, " + str(round(beforePerInterval, 1)) + " bytes per interval")
+    print("\t__slots__: " + str(round(after / 1e6, 1)) + " MB, " + str(round(afterPerInterval, 1)) + " bytes per interval")
+    print("\tcolumns:   " + str(round(frozen / 1e6, 1)) + " MB, " + str(round(frozenPerInterval, 1)) + " bytes per interval")
+    print("\tReduction: " + str(round(100 * (1 - after / before), 1)) + "%")
@@ -0,0 +1,515 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import sys
+import traceback
+import numpy as np
+import TraceColumns
+import TraceEventStore
+import HelperFunctions
+import TracePeriods
+import TraceIssues
+from TraceTask import TraceTask
+from TraceSet import TraceSet
+
+"""
+The parsers decode and reconstruct the trace in pure python. Even in a background thread this holds
+the GIL and stalls the Tk event loop. Parsing is therefore done in a separate worker process.
+The result is transferred back as columnar arrays in a shared memory block, only the small task table
+and the column layout are pickled. The events of very large traces are kept in an event store (see TraceEventStore),
+in this case only the folder of the store is sent and the GUI maps the event columns from the files.
+Traces that are too large to reconstruct completely are opened in a windowed parser, which keeps running and sends
+the jobs of the time windows that the GUI requests (see WindowedParserJob).
+"""
+
+"""
+Interval in ms in which the GUI checks for messages from the worker process.
+"""
+pollInterval_ms = 50
+
+"""
+Maximum time in s the worker waits for the GUI to copy the results out of a shared memory block.
+"""
+ackTimeout_s = 60
+
+"""
+Columns in the shared memory block are aligned to this number of bytes.
+"""
+columnAlignment = 64
+
+class QueueWriter():
+    """
+    File-like object used as stdout/stderr of the worker process. The output is forwarded
+    to the GUI process, so it is shown in the textbox as if the parser would run in the GUI.
+    """
+    def __init__(self, messages, tag, bufferSize=16384):
+        self.messages = messages
+        self.tag = tag
+        self.bufferSize = bufferSize
+        self.buffer = []
+        self.size = 0
+
+    def write(self, string):
+        if string:
+            self.buffer.append(string)
+            self.size = self.size + len(string)
+            if self.size >= self.bufferSize:
+                self.flush()
+
+    def flush(self):
+        if self.size > 0:
+            self.messages.put((self.tag, "".join(self.buffer)))
+            self.buffer = []
+            self.size = 0
+
+def packColumns(columns):
+    """
+    Copies all columns into a new shared memory block.
+    Returns the shared memory block and the layout needed to read the columns again.
+    """
+    layout = []
+    offset = 0
+    for name, array in columns.items():
+        array = np.ascontiguousarray(array)
+        offset = (offset + columnAlignment - 1) // columnAlignment * columnAlignment
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset = offset + array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+
+    for name, dtype, shape, offset in layout:
+        array = np.ascontiguousarray(columns[name])
+        target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        target[...] = array
+
+    return shm, layout
+
+def unpackColumns(shmName, layout):
+    """
+    Copies all columns out of the shared memory block created by packColumns().
+    """
+    shm = shared_memory.SharedMemory(name=shmName)     # The block is owned (and unlinked) by the worker
+
+    columns = {}
+    for name, dtype, shape, offset in layout:
+        columns[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset).copy()
+
+    shm.close()
+    return columns
+
+class ChunkPublisher():
+    """
+    Sends the reconstructed trace in chunks to the GUI process. Each chunk only contains the jobs that
+    were finished since the previous chunk. Tasks are identified by a key that stays the same for all chunks.
+    """
+    def __init__(self, messages, acks):
+        self.messages = messages
+        self.acks = acks
+        self.keys = {}          # id(task) -> key of the task
+        self.tasks = []         # All tasks that have a key (keeps the tasks alive, so id() stays unique)
+        self.sentJobs = []      # Number of jobs already sent, per key
+        self.blocks = {}        # Shared memory blocks that are not yet copied by the GUI, per name
+
+    def key(self, task):
+        if id(task) not in self.keys:
+            self.keys[id(task)] = len(self.tasks)
+            self.tasks.append(task)
+            self.sentJobs.append(0)
+        return self.keys[id(task)]
+
+    def publish(self, tasks, events=None, final=False):
+        """
+        Sends all jobs finished since the last call. Intermediate chunks only contain tasks with jobs.
+        The final chunk contains the final list of tasks and the trace events (or the folder of the event store).
+        """
+        traceInfo = tasks.getInfo() if isinstance(tasks, TraceSet) else {}
+
+        if not final:
+            tasks = [task for task in tasks if len(task.jobs) > 0]
+
+        keys = [self.key(task) for task in tasks]
+        firstJobs = [self.sentJobs[key] for key in keys]
+
+        taskTable, columns = TraceColumns.encodeTasks(tasks, firstJobs)
+        for info, key, task in zip(taskTable, keys, tasks):
+            info['key'] = key
+            self.sentJobs[key] = len(task.jobs)
+
+        if isinstance(events, TraceEventStore.EventStore):
+            traceInfo['eventStore'] = events.folder
+            intTime = events.intTime
+        elif events is not None:
+            if isinstance(tasks, TraceSet) and tasks.events is not None:
+                columns.update(tasks.events)    # The parser already created the event columns
+            else:
+                columns.update(TraceColumns.encodeEvents(events))
+            intTime = TraceColumns.isIntTime(events)
+        else:
+            intTime = all(isinstance(task.jobs[0].releaseTime, (int, np.integer)) for task in tasks if len(task.jobs) > 0)
+
+        if final and isinstance(tasks, TraceSet):
+            # The jobs are encoded, so the analyses that need all jobs can freeze the tasks now. They are done here
+            # and not in the GUI, which only restores the results.
+            columns.update(analyzeTrace(tasks))
+            for info, task in zip(taskTable, tasks):
+                info['period'] = task.period
+
+        self.release()
+        shm, layout = packColumns(columns)
+        self.blocks[shm.name] = shm
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.messages.put(('chunk', (taskTable, traceInfo, intTime, shm.name, layout, final)))
+
+    def publishWindow(self, tasks, start, stop):
+        """
+        Sends the jobs of the time window [start, stop] of a windowed parser (see TraceParserFreeRTOS.WindowedTrace).
+        """
+        taskTable, columns = TraceColumns.encodeTasks(tasks)
+        intTime = all(isinstance(task.jobs[0].releaseTime, (int, np.integer)) for task in tasks if len(task.jobs) > 0)
+
+        self.release()
+        shm, layout = packColumns(columns)
+        self.blocks[shm.name] = shm
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.messages.put(('window', (taskTable, tasks.getInfo(), intTime, shm.name, layout, start, stop)))
+
+    def release(self, wait=False):
+        """
+        Removes all shared memory blocks that were copied by the GUI. If wait is True, this waits until all blocks are copied.
+        """
+        while len(self.blocks) > 0:
+            try:
+                name = self.acks.get(wait, ackTimeout_s)
+            except queue.Empty:
+                if wait:
+                    name = None
+                else:
+                    break
+
+            for shmName in ([name] if name is not None else list(self.blocks)):
+                shm = self.blocks.pop(shmName, None)
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+    def discard(self):
+        """
+        Removes all shared memory blocks, also the ones that were not copied (the GUI does not wait for them anymore).
+        """
+        for shm in self.blocks.values():
+            shm.close()
+            shm.unlink()
+        self.blocks = {}
+
+def analyzeTrace(traceSet):
+    """
+    Infers the periods (and implicit deadlines) and builds the issue index of the complete trace.
+    Returns the results as columns (see TracePeriods.encodePeriods() and TraceIssues.encodeIssues()).
+    """
+    TracePeriods.inferPeriods(traceSet)
+    issues = TraceIssues.getIssueIndex(traceSet)
+    HelperFunctions.printState("Found " + str(len(issues)) + " timing issues")
+
+    columns = TracePeriods.encodePeriods(traceSet)
+    columns.update(TraceIssues.encodeIssues(issues, traceSet))
+    return columns
+
+def workerMain(parseFunc, args, messages, acks):
+    """
+    Entry point of the worker process. Calls parseFunc(*args, publish=...), which returns the trace set
+    and the list of events of the trace, and sends the result back as columns in shared memory.
+    The parser can call publish(tasks) to send the part of the trace that is already reconstructed.
+    """
+    sys.stdout = QueueWriter(messages, 'stdout')
+    sys.stderr = QueueWriter(messages, 'stderr')
+
+    publisher = ChunkPublisher(messages, acks)
+
+    try:
+        tasks, events = parseFunc(*args, publish=publisher.publish)
+        publisher.publish(tasks, events, final=True)
+
+    except Exception:
+        sys.stdout.flush()
+        messages.put(('error', traceback.format_exc()))
+
+    # Keep the shared memory blocks alive until the GUI copied the columns.
+    publisher.release(wait=True)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+def windowWorkerMain(openFunc, args, messages, acks, requests):
+    """
+    Entry point of the worker process of a windowed parser. Calls openFunc(*args), which returns a WindowedTrace (see
+    TraceParserFreeRTOS), and sends the jobs of every time window (start, stop) that is requested, until None is requested.
+    """
+    sys.stdout = QueueWriter(messages, 'stdout')
+    sys.stderr = QueueWriter(messages, 'stderr')
+
+    publisher = ChunkPublisher(messages, acks)
+
+    try:
+        trace = openFunc(*args)
+        sys.stdout.flush()
+        messages.put(('opened', trace.getBounds()))
+
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            start, stop = request
+            publisher.publishWindow(trace.getWindow(start, stop), start, stop)
+
+        # The parser was closed by the GUI, windows that were not received yet are not copied anymore.
+        publisher.discard()
+
+    except Exception:
+        sys.stdout.flush()
+        messages.put(('error', traceback.format_exc()))
+
+    publisher.release(wait=True)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+class ParserJob():
+    """
+    A parser running in a worker process. Several jobs can run at the same time.
+    The GUI polls the job from the Tk event loop, so the GUI is never blocked while the trace is parsed.
+    The trace is received in chunks, the tasks are extended with the jobs of every chunk.
+    The received tasks are frozen, i.e. their jobs are stored as columns (see TraceTask.freeze()).
+    """
+    def __init__(self, gui, parseFunc, args, onResult, onError=None, onProgress=None):
+        self.gui = gui
+        self.onResult = onResult        # Called with the trace set (including the events) once the trace is parsed
+        self.onError = onError          # Called with the traceback string if the parser fails
+        self.onProgress = onProgress    # Called with a trace set of the tasks reconstructed so far after each chunk
+        self.done = False
+        self.tasks = {}                 # Received tasks, by key
+
+        context = multiprocessing.get_context("spawn")
+        self.messages = context.Queue()
+        self.acks = context.Queue()
+        self.process = context.Process(target=workerMain, args=(parseFunc, args, self.messages, self.acks), daemon=True)
+        self.process.start()
+
+        self.gui.after(pollInterval_ms, self.poll)
+
+    def poll(self):
+        """
+        Handles all pending messages of the worker and reschedules itself until the worker is done.
+        Only one chunk is handled per call, so the GUI can redraw in between.
+        """
+        while not self.done:
+            try:
+                tag, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if tag == 'stdout':
+                print(payload, end="")
+            elif tag == 'stderr':
+                print(payload, end="", file=sys.stderr)
+            elif tag == 'chunk':
+                self.handleChunk(payload)
+                break
+            elif tag == 'error':
+                self.handleError(payload)
+
+        if not self.done:
+            if not self.process.is_alive() and self.messages.empty():
+                self.handleError("Parser process terminated unexpectedly (exit code " + str(self.process.exitcode) + ")\n")
+            else:
+                self.gui.after(pollInterval_ms, self.poll)
+
+    def handleChunk(self, payload):
+        taskTable, traceInfo, intTime, shmName, layout, final = payload
+
+        try:
+            columns = unpackColumns(shmName, layout)
+        finally:
+            self.acks.put(shmName)
+
+        tasks = []
+        for info in taskTable:
+            if info['key'] not in self.tasks:
+                self.tasks[info['key']] = TraceTask(info['id'], info['name'], info['priority'], info['color'])
+            tasks.append(self.tasks[info['key']])
+
+        TraceColumns.appendTaskColumns(taskTable, columns, intTime, tasks)
+        eventStore = traceInfo.pop('eventStore', None)
+        traceSet = TraceSet(tasks, **traceInfo)
+
+        if final:
+            if eventStore is not None:
+                store = TraceEventStore.EventStore(eventStore)
+                traceSet.events = store.getColumns()
+                traceSet.eventIndex = store.getEventIndex()
+            else:
+                traceSet.events = {name: array for name, array in columns.items() if name.startswith('event_')}
+            if 'period_task' in columns:
+                # The periods and issues were computed by the worker (see analyzeTrace())
+                TracePeriods.decodePeriods(traceSet, columns)
+                TraceIssues.decodeIssues(traceSet, columns)
+            self.done = True
+            self.onResult(traceSet)
+        elif self.onProgress is not None:
+            self.onProgress(traceSet)
+
+    def handleError(self, message):
+        self.done = True
+        print(message, end="", file=sys.stderr)
+        if self.onError is not None:
+            self.onError(message)
+
+class WindowedParserJob():
+    """
+    A windowed parser running in a worker process. The trace is opened once, afterwards the jobs of a time window are
+    reconstructed on request (see requestWindow()). The worker parses one window at a time, if several windows are
+    requested in the meantime (e.g. while the view is moved) only the last one is parsed next.
+    The received tasks are frozen, as the tasks of a ParserJob.
+    """
+    def __init__(self, gui, openFunc, args, onOpened, onWindow, onError=None):
+        self.gui = gui
+        self.onOpened = onOpened        # Called with the timestamps of the first and the last event once the trace is opened
+        self.onWindow = onWindow        # Called with the trace set, start and stop of each window that was requested
+        self.onError = onError          # Called with the traceback string if the parser fails
+        self.done = False
+        self.pending = False            # A window is parsed by the worker
+        self.nextRequest = None         # Window that is requested once the pending window is received
+
+        context = multiprocessing.get_context("spawn")
+        self.messages = context.Queue()
+        self.acks = context.Queue()
+        self.requests = context.Queue()
+        self.process = context.Process(target=windowWorkerMain, args=(openFunc, args, self.messages, self.acks, self.requests), daemon=True)
+        self.process.start()
+
+        self.gui.after(pollInterval_ms, self.poll)
+
+    def requestWindow(self, start, stop):
+        """
+        Requests the jobs of the time window [start, stop], onWindow is called once they are reconstructed.
+        """
+        if self.done:
+            return
+        if self.pending:
+            self.nextRequest = (start, stop)
+        else:
+            self.pending = True
+            self.requests.put((start, stop))
+
+    def close(self):
+        """
+        Stops the worker process, windows that are still parsed are not received anymore.
+        """
+        if not self.done:
+            self.done = True
+            self.requests.put(None)
+
+    def poll(self):
+        """
+        Handles all pending messages of the worker and reschedules itself until the parser is closed.
+        Only one window is handled per call, so the GUI can redraw in between.
+        """
+        while not self.done:
+            try:
+                tag, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if tag == 'stdout':
+                print(payload, end="")
+            elif tag == 'stderr':
+                print(payload, end="", file=sys.stderr)
+            elif tag == 'opened':
+                self.onOpened(*payload)
+            elif tag == 'window':
+                self.handleWindow(payload)
+                break
+            elif tag == 'error':
+                self.handleError(payload)
+
+        if not self.done:
+            if not self.process.is_alive() and self.messages.empty():
+                self.handleError("Parser process terminated unexpectedly (exit code " + str(self.process.exitcode) + ")\n")
+            else:
+                self.gui.after(pollInterval_ms, self.poll)
+
+    def handleWindow(self, payload):
+        taskTable, traceInfo, intTime, shmName, layout, start, stop = payload
+
+        try:
+            columns = unpackColumns(shmName, layout)
+        finally:
+            self.acks.put(shmName)
+
+        tasks = [TraceTask(info['id'], info['name'], info['priority'], info['color']) for info in taskTable]
+        TraceColumns.appendTaskColumns(taskTable, columns, intTime, tasks)
+
+        self.pending = False
+        if self.nextRequest is not None:
+            request = self.nextRequest
+            self.nextRequest = None
+            self.requestWindow(*request)
+
+        self.onWindow(TraceSet(tasks, **traceInfo), start, stop)
+
+    def handleError(self, message):
+        self.done = True
+        print(message, end="", file=sys.stderr)
+        if self.onError is not None:
+            self.onError(message)
+
+def startParser(gui, parseFunc, args):
+    """
+    Parses a trace in a worker process and shows the result in the trace view of the GUI.
+    The first part of the trace is shown as soon as it is reconstructed, the view is extended with every chunk.
+    parseFunc must be a module level function (so it can be used in the worker process) that
+    returns the trace set and the list of events of the trace.
+    """
+    def showProgress(tasks):
+        if gui.traceView.tasks is None:
+            gui.traceView.setTasks(tasks)
+        else:
+            gui.traceView.extendTasks(tasks)
+        gui.traceView.draw()
+
+    def showTrace(tasks):
+        gui.btn_loadTrace.configure(state="normal")
+        showProgress(tasks)
+        gui.update()
+
+    def showError(message):
+        HelperFunctions.printState("Parsing failed")
+        gui.btn_loadTrace.configure(state="normal")
+
+    gui.traceView.setTasks(None)
+    return ParserJob(gui, parseFunc, args, showTrace, showError, showProgress)
+
+def startWindowedParser(gui, openFunc, args):
+    """
+    Opens a trace in a windowed parser and shows it in the trace view of the GUI. The trace view requests the jobs of the
+    visible window whenever it is moved or zoomed (see TraceView.setWindowSource()).
+    openFunc must be a module level function that returns a WindowedTrace (see TraceParserFreeRTOS.parseRecordingWindowed()).
+    """
+    def showTrace(first, last):
+        gui.btn_loadTrace.configure(state="normal")
+        gui.traceView.setWindowSource(job, last if last is not None else 0)
+        gui.traceView.draw()
+
+    def showWindow(tasks, start, stop):
+        gui.traceView.showWindow(tasks, start, stop)
+
+    def showError(message):
+        HelperFunctions.printState("Parsing failed")
+        gui.btn_loadTrace.configure(state="normal")
+
+    gui.traceView.setTasks(None)
+    job = WindowedParserJob(gui, openFunc, args, showTrace, showWindow, showError)
+    return job
@@ -7,15 +7,17 @@ from BufferTraceRecorder import loadPico2BufferTraceRecorder
 from RttTraceRecorder import loadPico2RttTraceBuffers
 from L476Trace import loadSTM32L476TraceBuffers
 from LinuxTraceRecorder import loadLinuxraceBuffers
-from TraceParserFreeRTOS import parseTraceFiles
-from TraceParserLinux import parseTraceFiles as linuxParseTraceFiles
+from TraceParserFreeRTOS import parseTraceFiles, parseComparisonFiles
+from TraceParserLinux import parseTraceFiles as linuxParseTraceFiles, parseComparisonFiles as linuxParseComparisonFiles
 from pathlib import Path
 import subprocess
 import os
 from datetime import datetime
 import HelperFunctions
+import AnalysisView
 import configparser
 import queue
+import multiprocessing
 
 class TraceApp(customtkinter.CTk):
     """
@@ -28,14 +30,32 @@ class TraceApp(customtkinter.CTk):
         Here all available targets are configures. If the flag 'implemented' is False, they are not supported yet.
         'requirement_str' can be used to inform the user of any additional prerequisites, this is displayed in the textbox once the target is selected. 
         'recordTraceFunc' is a target specific function that loads the trace buffer
+        'compareTraceFunc' parses another recording of the target, to compare it with the loaded trace
         """
         self.targets = [
-            {'name': 'Pico2 FreeRTOS RTT', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2RttTraceBuffers, 'loadTraceFunc': parseTraceFiles, 'pathValidationFunc': HelperFunctions.validatePicoRtt},
-            {'name': 'Pico2 FreeRTOS SRAM', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2BufferTraceRecorder, 'loadTraceFunc': parseTraceFiles, 'pathValidationFunc': None},
-            {'name': 'Pico2 FreeRTOS PSRAM', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2BufferTraceRecorder, 'loadTraceFunc': parseTraceFiles, 'pathValidationFunc': None},
+            {'name': 'Pico2 FreeRTOS RTT', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2RttTraceBuffers, 'loadTraceFunc': parseTraceFiles, 'compareTraceFunc': parseComparisonFiles, 'pathValidationFunc': HelperFunctions.validatePicoRtt},
+            {'name': 'Pico2 FreeRTOS SRAM', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2BufferTraceRecorder, 'loadTraceFunc': parseTraceFiles, 'compareTraceFunc': parseComparisonFiles, 'pathValidationFunc': None},
+            {'name': 'Pico2 FreeRTOS PSRAM', 'numCores': 2, 'implemented': True, 'requirement_str' : 'Select a project.', 'recordTraceFunc' : loadPico2BufferTraceRecorder, 'loadTraceFunc': parseTraceFiles, 'compareTraceFunc': parseComparisonFiles, 'pathValidationFunc': None},
             #{'name': 'STM FreeRTOS', 'numCores': 1, 'implemented': True, 'requirement_str' : 'To load the trace buffer, openocd and telnet needs to be on the path.', 'recordTraceFunc' : loadSTM32L476TraceBuffers},
             #{'name': 'RPI QNX', 'numCores': 4, 'implemented': False, 'requirement_str' : 'To load the trace buffer, telnet needs to be on the path.', 'recordTraceFunc' : None},
-            {'name': 'RPI Linux', 'numCores': 4, 'implemented': True, 'requirement_str' : 'Experimental...', 'recordTraceFunc' : loadLinuxraceBuffers, 'loadTraceFunc': linuxParseTraceFiles, 'pathValidationFunc': None}
+            {'name': 'RPI Linux', 'numCores': 4, 'implemented': True, 'requirement_str' : 'Experimental...', 'recordTraceFunc' : loadLinuxraceBuffers, 'loadTraceFunc': linuxParseTraceFiles, 'compareTraceFunc': linuxParseComparisonFiles, 'pathValidationFunc': None}
+        ]
+
+        """
+        Here all available analyses of a loaded trace are configured. 'analysisFunc' is called with the GUI and shows the result.
+        """
+        self.analyses = [
+            {'name': 'Task Statistics', 'analysisFunc': AnalysisView.showTaskStatistics},
+            {'name': 'Window Statistics', 'analysisFunc': AnalysisView.showWindowStatistics},
+            {'name': 'Mutex Contention', 'analysisFunc': AnalysisView.showMutexContention},
+            {'name': 'Ready Latency', 'analysisFunc': AnalysisView.showReadyLatency},
+            {'name': 'Interrupt Profile', 'analysisFunc': AnalysisView.showInterruptProfile},
+            {'name': 'Task Periods', 'analysisFunc': AnalysisView.showTaskPeriods},
+            {'name': 'Preemptions', 'analysisFunc': AnalysisView.showPreemptions},
+            {'name': 'Timing Issues', 'analysisFunc': AnalysisView.showTimingIssues},
+            {'name': 'Compare Traces', 'analysisFunc': AnalysisView.showTraceComparison},
+            {'name': 'Export Perfetto Trace', 'analysisFunc': AnalysisView.exportPerfettoTrace},
+            {'name': 'Export NumPy Archive', 'analysisFunc': AnalysisView.exportNumpyArchive},
         ]
 
         ''' Set default values for the GUI '''
@@ -131,6 +151,28 @@ class TraceApp(customtkinter.CTk):
         self.btn_saveTrace = customtkinter.CTkButton(self.sidebar_frame, text="Save PDF", command=self.save_image_function, corner_radius=default_corner_radius)
         self.btn_saveTrace.grid(row=10, column=0, padx=20, pady=5, sticky="ew")
 
+        ''' Label for the trace analysis section. '''
+        self.lbl_analysis = customtkinter.CTkLabel(self.sidebar_frame, text="Analyze Trace", font=customtkinter.CTkFont(size=15, weight="bold"), anchor="w")
+        self.lbl_analysis.grid(row=11, column=0, padx=(0, 0), pady=(10, 0))
+
+        ''' Option to select the analysis. '''
+        self.selectedAnalysis = 0
+        self.opt_selectAnalysis = customtkinter.CTkOptionMenu(self.sidebar_frame, values=[analysis.get('name') for analysis in self.analyses], command=self.selectAnalysis, corner_radius=default_corner_radius)
+        self.opt_selectAnalysis.grid(row=12, column=0, padx=20, pady=(0, 5), sticky="ew")
+
+        ''' Button to run the selected analysis on the loaded trace. '''
+        self.btn_analyze = customtkinter.CTkButton(self.sidebar_frame, text="Analyze", command=self.analyze_function, corner_radius=default_corner_radius)
+        self.btn_analyze.grid(row=13, column=0, padx=20, pady=5, sticky="ew")
+
+        ''' Buttons to jump to the previous/next timing issue (deadline miss, incomplete job or outlier). Keys: p and n. '''
+        self.frm_issues = customtkinter.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.frm_issues.grid(row=14, column=0, padx=20, pady=5, sticky="ew")
+        self.frm_issues.grid_columnconfigure((0, 1), weight=1)
+        self.btn_prevIssue = customtkinter.CTkButton(self.frm_issues, text="< Issue", width=60, command=lambda: self.traceView.jumpToIssue(-1), corner_radius=default_corner_radius)
+        self.btn_prevIssue.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        self.btn_nextIssue = customtkinter.CTkButton(self.frm_issues, text="Issue >", width=60, command=lambda: self.traceView.jumpToIssue(1), corner_radius=default_corner_radius)
+        self.btn_nextIssue.grid(row=0, column=1, padx=(5, 0), sticky="ew")
+
         ''' Textbox to display stdout. '''
         font = customtkinter.CTkFont(family="DejaVu Sans Mono", size=14)
         self.textbox = customtkinter.CTkTextbox(self, corner_radius=10, font=font)
@@ -147,6 +189,11 @@ class TraceApp(customtkinter.CTk):
         self.traceView = TraceView(self)
         self.traceView.grid(row=0, column=1, rowspan=7, columnspan=1, sticky="nswe", padx=5, pady=5)
 
+        ''' Label with the statistics of the visible part of the trace. '''
+        self.lbl_windowStatistics = customtkinter.CTkLabel(self, text="", anchor="w")
+        self.lbl_windowStatistics.grid(row=7, column=1, sticky="we", padx=10, pady=0)
+        self.traceView.setStatusLabel(self.lbl_windowStatistics)
+
         ''' Print Events Switch '''
        #self.printEvents_var = customtkinter.BooleanVar(value=False)
        # self.switch = customtkinter.CTkSwitch(self.sidebar_frame, text="Print Events", command=self.printEventsSwitch_event,
@@ -200,6 +247,12 @@ class TraceApp(customtkinter.CTk):
             self.traceView.zoom(1)
         elif event.keycode == 2097215233: # Down arrow
             self.traceView.zoom(-1)
+        elif isinstance(event.widget, tk.Entry):  # Don't navigate while a text is entered
+            pass
+        elif event.keysym == 'n':
+            self.traceView.jumpToIssue(1)
+        elif event.keysym == 'p':
+            self.traceView.jumpToIssue(-1)
 
     def disableAllButtons(self):
         """
@@ -226,6 +279,9 @@ class TraceApp(customtkinter.CTk):
         self.btn_loadTrace.configure(state="disabled")
         self.btn_saveTrace.configure(state="disabled")
         self.opt_selectTrace.configure(state="disabled")
+        self.btn_analyze.configure(state="disabled")
+        self.btn_prevIssue.configure(state="disabled")
+        self.btn_nextIssue.configure(state="disabled")
         self.update()
 
     def enableTraceView(self):
@@ -235,6 +291,9 @@ class TraceApp(customtkinter.CTk):
         self.btn_loadTrace.configure(state="enabled")
         self.btn_saveTrace.configure(state="enabled")
         self.opt_selectTrace.configure(state="enabled")
+        self.btn_analyze.configure(state="enabled")
+        self.btn_prevIssue.configure(state="enabled")
+        self.btn_nextIssue.configure(state="enabled")
         self.update()
 
     def button_record_function(self):
@@ -341,6 +400,22 @@ class TraceApp(customtkinter.CTk):
         self.traceView.setTasks(None)
         self.traceView.draw()
 
+    def selectAnalysis(self, analysisName: str):
+        """
+        Callback that is called if a new analysis is selected from the option menu.
+        """
+        for analysis in self.analyses:
+            if analysis.get('name') == analysisName:
+                self.selectedAnalysis = self.analyses.index(analysis)
+
+    def analyze_function(self):
+        """
+        Callback that is called if the button "Analyze" is clicked.
+        """
+        analysis = self.analyses[self.selectedAnalysis]
+        HelperFunctions.printHeader(analysis.get('name'))
+        analysis.get('analysisFunc')(self)
+
     def save_image_function(self):
         """
         Function generates a PDF of the current trace view.
@@ -407,4 +482,5 @@ def main():
 
 if __name__ == "__main__":
 
+    multiprocessing.freeze_support()                # Needed for the parser worker processes in the packaged application
     main()
\ No newline at end of file
@@ -0,0 +1,162 @@
+import argparse
+import contextlib
+import json
+import os
+import struct
+import zipfile
+import numpy as np
+import HelperFunctions
+import TracePeriods
+import TraceBatch
+from TraceTask import TraceTask, jobColumnTypes, offsetColumns
+from TraceSet import TraceSet
+
+"""
+Columnar archive (.npz) of a parsed trace, e.g. to analyze a trace in a notebook or to open it again without parsing.
+The archive holds the columns of all frozen tasks (see TraceTask.jobColumnTypes) concatenated in the order of the
+tasks, the trace events (see TraceColumns.eventFields) and a JSON description ('meta': schema version, trace information
+and task table). The job_intervalOffset and job_mutexOffset columns of each task start at 0 and have one entry more
+than the jobs of the task, so the columns of a task are slices of the archive columns.
+An uncompressed archive is memory mapped when it is loaded: the tasks use views on the file, so even a very large
+archive opens instantly and only the parts that are used are read.
+
+Example (notebook):
+    import TraceArchive
+    traceSet = TraceArchive.loadArchive("trace.npz")
+    release = traceSet.findByName("TaskA").columns['job_release']
+"""
+
+"""
+Version of the archive layout. Archives with another version can not be loaded.
+"""
+schemaVersion = 1
+
+def saveArchive(traceSet, filename, compress=True):
+    """
+    Writes the trace set (tasks and events) to an .npz archive, compressed if compress is True.
+    """
+    tasks = list(traceSet)
+    taskTable = []
+    parts = {name: [] for name in jobColumnTypes}
+    taskOffsets = {'task_jobOffset': [0], 'task_intervalOffset': [0], 'task_mutexOffset': [0]}
+
+    for task in tasks:
+        task.freeze()
+        period = task.period.item() if isinstance(task.period, np.generic) else task.period
+        taskTable.append({'id': task.id, 'name': task.name, 'priority': task.priority, 'period': period, 'color': task.taskColor, 'intTime': bool(task.intTime)})
+        for name in jobColumnTypes:
+            parts[name].append(task.columns[name])
+        taskOffsets['task_jobOffset'].append(taskOffsets['task_jobOffset'][-1] + len(task.columns['job_id']))
+        taskOffsets['task_intervalOffset'].append(taskOffsets['task_intervalOffset'][-1] + len(task.columns['interval_start']))
+        taskOffsets['task_mutexOffset'].append(taskOffsets['task_mutexOffset'][-1] + len(task.columns['mutex_start']))
+
+    arrays = {}
+    for name, dtype in jobColumnTypes.items():
+        arrays[name] = np.concatenate(parts[name]).astype(dtype, copy=False) if len(parts[name]) > 0 else np.zeros(0, dtype=dtype)
+    for name, offsets in taskOffsets.items():
+        arrays[name] = np.asarray(offsets, dtype=np.int64)
+    if traceSet.events is not None:
+        arrays.update(traceSet.events)
+
+    meta = {'schemaVersion': schemaVersion, 'origin': None if traceSet.origin is None else str(traceSet.origin), 'traceFormat': traceSet.traceFormat,
+            'tickIds': traceSet.tickIds, 'events': traceSet.events is not None, 'tasks': taskTable}
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    if compress:
+        np.savez_compressed(filename, **arrays)
+    else:
+        np.savez(filename, **arrays)
+
+def mapMember(filename, info):
+    """
+    Returns a copy-on-write memory map of an array that is stored uncompressed in the zip file.
+    """
+    with open(filename, 'rb') as file:
+        file.seek(info.header_offset)
+        header = file.read(30)
+        nameLength, extraLength = struct.unpack('<HH', header[26:30])
+        file.seek(info.header_offset + 30 + nameLength + extraLength)
+
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    if dtype.hasobject:
+        raise ValueError("Archive member " + info.filename + " holds Python objects")
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode='c', offset=offset, shape=shape, order='F' if fortranOrder else 'C')
+
+def openArrays(filename, mmap=True):
+    """
+    Returns all arrays of the archive. Members that are stored uncompressed are memory mapped if mmap is True.
+    """
+    arrays = {}
+    with zipfile.ZipFile(filename) as archive:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if mmap and info.compress_type == zipfile.ZIP_STORED and name != 'meta':
+                arrays[name] = mapMember(filename, info)
+            else:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+    return arrays
+
+def loadArchive(filename, mmap=True):
+    """
+    Loads a trace set from an .npz archive. The tasks are frozen, their columns are views on the archive columns
+    (memory mapped if the archive is uncompressed and mmap is True), and the periods are inferred as after parsing.
+    """
+    arrays = openArrays(filename, mmap)
+    meta = json.loads(str(arrays['meta'][()]))
+    if meta.get('schemaVersion') != schemaVersion:
+        raise ValueError("Archive " + str(filename) + " has schema version " + str(meta.get('schemaVersion')) + ", expected " + str(schemaVersion))
+
+    jobOffset = arrays['task_jobOffset'].tolist()
+    intervalOffset = arrays['task_intervalOffset'].tolist()
+    mutexOffset = arrays['task_mutexOffset'].tolist()
+
+    tasks = []
+    for index, info in enumerate(meta['tasks']):
+        task = TraceTask(info['id'], info['name'], info['priority'], info['color'])
+        task.period = info['period']
+
+        columns = {}
+        for name in jobColumnTypes:
+            if name in offsetColumns:
+                rows = slice(jobOffset[index] + index, jobOffset[index + 1] + index + 1)
+            elif name.startswith('job_'):
+                rows = slice(jobOffset[index], jobOffset[index + 1])
+            elif name.startswith('interval_'):
+                rows = slice(intervalOffset[index], intervalOffset[index + 1])
+            else:
+                rows = slice(mutexOffset[index], mutexOffset[index + 1])
+            columns[name] = arrays[name][rows]
+        task.setColumns(columns, info['intTime'])
+        tasks.append(task)
+
+    events = {name: array for name, array in arrays.items() if name.startswith('event_')} if meta['events'] else None
+    traceSet = TraceSet(tasks, origin=meta['origin'], traceFormat=meta['traceFormat'], tickIds=meta['tickIds'], events=events)
+    TracePeriods.inferPeriods(traceSet)
+    return traceSet
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Writes a recording as a columnar NumPy archive (.npz).")
+    ap.add_argument("target", choices=sorted(TraceBatch.batchTargets), help="Target, i.e. the data folder of the recording")
+    ap.add_argument("recording", help="Name of the recording")
+    ap.add_argument("output", help="Output file (.npz)")
+    ap.add_argument("--data", default=TraceBatch.getDataPath(), help="Folder that contains the data folders of the targets")
+    ap.add_argument("--uncompressed", action="store_true", help="Do not compress the archive, so it can be memory mapped when it is loaded")
+    args = ap.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        traceSet = TraceBatch.loadRecording(args.target, os.path.join(args.data, args.target, args.recording))
+    saveArchive(traceSet, args.output, not args.uncompressed)
+    HelperFunctions.printState("Saved archive", info=args.output)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,258 @@
+import argparse
+import concurrent.futures
+import contextlib
+import csv
+import fnmatch
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import HelperFunctions
+import TraceEventStore
+import TraceStatistics
+import TracePeriods
+import TraceIssues
+import TraceParserFreeRTOS
+import TraceParserLinux
+
+"""
+Headless batch processing of recordings: the recordings of a target (the measurement folders in data/<target>/) are parsed
+on a process pool without the GUI, and the summary statistics of each recording are written to a JSON and/or CSV file.
+Thresholds (e.g. a maximum response time) turn the run into a regression check, a violation gives a non-zero exit code.
+
+Example:
+    python TraceBatch.py Pico2_FreeRTOS_SRAM "nightly_*" --jobs 8 --json summary.json --max-response-time 5000
+
+FreeRTOS recordings can be reduced to a part of the trace (see TraceParserFreeRTOS.FilterSpec), e.g. core 0 from 1s to 2s:
+    python TraceBatch.py Pico2_FreeRTOS_SRAM "nightly_*" --core 0 --start 1000000 --stop 2000000
+"""
+
+"""
+Trace format and number of cores of each target, by the name of the data folder of the target (see RT-Trace.targets).
+"""
+batchTargets = {
+    'Pico2_FreeRTOS_RTT': ('FreeRTOS', 2),
+    'Pico2_FreeRTOS_SRAM': ('FreeRTOS', 2),
+    'Pico2_FreeRTOS_PSRAM': ('FreeRTOS', 2),
+    'RPI_Linux': ('Linux', 4),
+}
+
+"""
+Exit codes of the command line interface.
+"""
+exitViolation = 1       # At least one threshold was exceeded
+exitError = 2           # At least one recording could not be parsed (or the arguments are invalid)
+
+def getDataPath():
+    """
+    Returns the folder that contains the data folders of all targets.
+    """
+    return os.path.abspath(os.path.join(os.path.dirname(HelperFunctions.getCwd()), 'data'))
+
+def findRecordings(targetFolder, patterns=None):
+    """
+    Returns the names of the recordings (sub folders) of the target folder that match one of the patterns (fnmatch), sorted by name.
+    All recordings are returned if no pattern is given.
+    """
+    recordings = sorted(HelperFunctions.get_subfolders(targetFolder))
+    if not patterns:
+        return recordings
+    return [name for name in recordings if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+def loadRecording(targetName, folderName, filterSpec=None):
+    """
+    Parses a recording of the target in the calling process. Returns the trace set with frozen tasks, the trace
+    events as columns and the inferred periods (i.e. the same trace set the GUI gets from the ParserWorker).
+    If filterSpec is given, only the selected part of a FreeRTOS trace is parsed.
+    """
+    traceFormat, numCores = batchTargets[targetName]
+    if traceFormat == "FreeRTOS":
+        traceSet, events = TraceParserFreeRTOS.parseRecording(folderName, numCores, filterSpec)
+    else:
+        traceSet, events = TraceParserLinux.parseRecording(folderName, targetName)
+
+    for task in traceSet:
+        task.freeze()
+    traceSet.origin = folderName
+    if traceSet.events is None:
+        traceSet.events = TraceEventStore.getEventColumns(events)
+    TracePeriods.inferPeriods(traceSet)
+    return traceSet
+
+def summarizeTraceSet(traceSet):
+    """
+    Returns the summary statistics of a trace set as a dictionary that can be written as JSON.
+    """
+    estimates = traceSet.periods if traceSet.periods is not None else {}
+    tasks = []
+    for statistics in TraceStatistics.getStatistics(traceSet):
+        task = statistics.task
+        estimate = estimates.get(task)
+        summary = {
+            'name': task.name,
+            'id': task.id,
+            'kind': traceSet.getTaskKind(task),
+            'jobs': statistics.jobs,
+            'incompleteJobs': statistics.incompleteJobs,
+            'deadlineMisses': statistics.deadlineMisses,
+            'period': float(estimate.period) if estimate is not None and estimate.isPeriodic() else None,
+        }
+        summary.update(statistics.metrics)
+        tasks.append(summary)
+
+    issues = TraceIssues.getIssueIndex(traceSet)
+    return {
+        'format': traceSet.traceFormat,
+        'unit': TraceStatistics.getTimeUnit(traceSet),
+        'tasks': tasks,
+        'issues': {kind: int((issues.kind == index).sum()) for index, kind in enumerate(TraceIssues.issueKinds)},
+    }
+
+def summarizeRecording(targetName, folderName, verbose=False, filterSpec=None):
+    """
+    Parses a recording and returns its summary (see summarizeTraceSet()). This is the function executed by the workers
+    of the process pool, so it never raises: a failed recording has the traceback in 'error'.
+    The output of the parser is discarded, unless verbose is True.
+    """
+    summary = {'recording': os.path.basename(folderName), 'target': targetName, 'error': None}
+    start = time.time()
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+            traceSet = loadRecording(targetName, folderName, filterSpec)
+            summary.update(summarizeTraceSet(traceSet))
+    except Exception:
+        summary['error'] = traceback.format_exc()
+
+    summary['parseTime'] = round(time.time() - start, 3)
+    return summary
+
+def checkThresholds(summary, maxResponseTime=None, maxDeadlineMisses=None, maxIssues=None, taskPatterns=None):
+    """
+    Returns the list of threshold violations of a recording summary. The task thresholds are checked for the user tasks
+    that match one of the task patterns (all user tasks if no pattern is given).
+    """
+    violations = []
+    for task in summary.get('tasks', []):
+        if task['kind'] != 'user' or (taskPatterns and not any(fnmatch.fnmatch(task['name'], pattern) for pattern in taskPatterns)):
+            continue
+
+        responseTime = task['responseTime']['max']
+        if maxResponseTime is not None and responseTime is not None and responseTime > maxResponseTime:
+            violations.append(task['name'] + ": max response time " + str(round(responseTime, 1)) + " " + summary['unit'] + " > " + str(maxResponseTime))
+        if maxDeadlineMisses is not None and task['deadlineMisses'] > maxDeadlineMisses:
+            violations.append(task['name'] + ": " + str(task['deadlineMisses']) + " deadline misses > " + str(maxDeadlineMisses))
+
+    issues = sum(summary.get('issues', {}).values())
+    if maxIssues is not None and issues > maxIssues:
+        violations.append(str(issues) + " timing issues > " + str(maxIssues))
+    return violations
+
+def writeJson(filename, summaries):
+    with open(filename, 'w') as file:
+        json.dump(summaries, file, indent=2)
+
+def writeCsv(filename, summaries):
+    """
+    Writes one row per task of each recording. Recordings that could not be parsed have one row with the error.
+    """
+    metricColumns = [metric + "_" + field for metric in TraceStatistics.jobMetrics for field in TraceStatistics.summaryFields]
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["recording", "target", "unit", "task", "kind", "jobs", "incompleteJobs", "deadlineMisses", "period"] + metricColumns + ["error"])
+        for summary in summaries:
+            if summary['error'] is not None:
+                writer.writerow([summary['recording'], summary['target']] + [""] * (len(metricColumns) + 7) + [summary['error'].strip().splitlines()[-1]])
+                continue
+            for task in summary['tasks']:
+                writer.writerow([summary['recording'], summary['target'], summary['unit'], task['name'], task['kind'], task['jobs'], task['incompleteJobs'],
+                                 task['deadlineMisses'], task['period']] + [task[metric][field] for metric in TraceStatistics.jobMetrics for field in TraceStatistics.summaryFields] + [""])
+
+def runBatch(targetName, recordings, dataPath, jobs=None, verbose=False, filterSpec=None):
+    """
+    Summarizes the recordings of the target on a process pool with the given number of workers (number of CPUs if None).
+    If filterSpec is given, only the selected part of each recording is parsed (FreeRTOS only).
+    Returns the summaries in the order of the recordings.
+    """
+    targetFolder = os.path.join(dataPath, targetName)
+    summaries = {}
+
+    # The parsers keep module level state (e.g. the task colors), so each worker must be a fresh process.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = {pool.submit(summarizeRecording, targetName, os.path.join(targetFolder, name), verbose, filterSpec): name for name in recordings}
+        for future in concurrent.futures.as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            HelperFunctions.printState("Parsed " + str(len(summaries)) + "/" + str(len(recordings)), info=summary['recording'] + (" (failed)" if summary['error'] is not None else ""))
+
+    return [summaries[name] for name in recordings]
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Parses recordings without the GUI and writes their summary statistics.")
+    ap.add_argument("target", choices=sorted(batchTargets), help="Target, i.e. the data folder of the recordings")
+    ap.add_argument("recordings", nargs="*", help="Recordings (folder names or fnmatch patterns), all recordings of the target if omitted")
+    ap.add_argument("--data", default=getDataPath(), help="Folder that contains the data folders of the targets")
+    ap.add_argument("--jobs", type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+    ap.add_argument("--json", default=None, help="Output file for the summaries as JSON")
+    ap.add_argument("--csv", default=None, help="Output file for the task statistics as CSV")
+    ap.add_argument("--max-response-time", type=float, default=None, help="Maximum response time of each user task (in the unit of the trace)")
+    ap.add_argument("--max-deadline-misses", type=int, default=None, help="Maximum number of deadline misses of each user task")
+    ap.add_argument("--max-issues", type=int, default=None, help="Maximum number of timing issues of each recording")
+    ap.add_argument("--task", action="append", default=None, help="Only check the task thresholds of the matching tasks (fnmatch pattern, can be repeated)")
+    ap.add_argument("--verbose", action="store_true", help="Show the output of the parsers")
+    ap.add_argument("--core", type=int, action="append", default=None, help="Only parse the events of this core (FreeRTOS, can be repeated)")
+    ap.add_argument("--start", type=float, default=None, help="Only parse the events after this time (FreeRTOS, in us after t=0)")
+    ap.add_argument("--stop", type=float, default=None, help="Only parse the events before this time (FreeRTOS, in us after t=0)")
+    args = ap.parse_args()
+
+    if args.jobs is not None and args.jobs < 1:
+        ap.error("--jobs must be at least 1")
+
+    filterSpec = None
+    if args.core is not None or args.start is not None or args.stop is not None:
+        if batchTargets[args.target][0] != "FreeRTOS":
+            ap.error("--core, --start and --stop are only supported for FreeRTOS targets")
+        filterSpec = TraceParserFreeRTOS.FilterSpec(cores=args.core, start=args.start, stop=args.stop)
+
+    targetFolder = os.path.join(args.data, args.target)
+    if not os.path.isdir(targetFolder):
+        print("Error: Folder " + targetFolder + " does not exist!")
+        return exitError
+
+    recordings = findRecordings(targetFolder, args.recordings)
+    if len(recordings) == 0:
+        print("Error: No recordings found in " + targetFolder)
+        return exitError
+
+    HelperFunctions.printHeader("Batch: " + str(len(recordings)) + " recordings")
+    summaries = runBatch(args.target, recordings, args.data, args.jobs, args.verbose, filterSpec)
+
+    if args.json is not None:
+        writeJson(args.json, summaries)
+    if args.csv is not None:
+        writeCsv(args.csv, summaries)
+
+    failed = 0
+    violated = 0
+    for summary in summaries:
+        if summary['error'] is not None:
+            failed = failed + 1
+            print(summary['recording'] + ": parsing failed\n" + summary['error'])
+            continue
+        violations = checkThresholds(summary, args.max_response_time, args.max_deadline_misses, args.max_issues, args.task)
+        if len(violations) > 0:
+            violated = violated + 1
+            print(summary['recording'] + ":\n\t" + "\n\t".join(violations))
+
+    HelperFunctions.printState("Done", info=str(len(summaries)) + " recordings, " + str(failed) + " failed, " + str(violated) + " with threshold violations")
+    if failed > 0:
+        return exitError
+    if violated > 0:
+        return exitViolation
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,372 @@
+import numpy as np
+from TraceTask import *
+
+"""
+Columnar representation of a parsed trace.
+
+A parsed trace is described by a small task table (plain python values) and a set of flat
+NumPy arrays that hold the jobs, execution intervals, mutex accesses and trace events of all tasks.
+This representation is used to move parsing results between processes without pickling the
+complete object graph of tasks, jobs and intervals.
+"""
+
+"""
+Value used for integer event fields that are not set (e.g. the irqId of a task event).
+"""
+NO_VALUE = -1
+
+"""
+Event fields that are stored as columns. The mapping is: column name -> (event key, dtype).
+Fields that are not present in an event are stored as NO_VALUE (or False for flags).
+"""
+eventFields = {
+    'event_ts':         ('ts', np.float64),
+    'event_type':       ('type', np.int16),
+    'event_core':       ('core', np.int16),
+    'event_taskId':     ('taskId', np.int64),
+    'event_irqId':      ('irqId', np.int64),
+    'event_mutexId':    ('mutexId', np.int64),
+    'event_flag':       ('deadlineMiss', np.bool_),
+}
+
+"""
+Event keys that are stored in the generic 'event_value' column (at most one is set per event).
+"""
+eventValueKeys = ('timeToWake', 'delayTime', 'priority', 'period')
+
+"""
+Execution types are stored by their enum value.
+"""
+executionTypes = {t.value: t for t in ExecutionType}
+
+def encodeEvents(events):
+    """
+    Converts a list of event dictionaries into a dictionary of NumPy columns.
+    """
+    n = len(events)
+    columns = {}
+
+    for column, (key, dtype) in eventFields.items():
+        if dtype is np.bool_:
+            values = [bool(evt.get(key, False)) for evt in events]
+        else:
+            values = [NO_VALUE if evt.get(key) is None else evt.get(key) for evt in events]
+        columns[column] = np.fromiter(values, dtype=dtype, count=n)
+
+    values = np.full(n, NO_VALUE, dtype=np.int64)
+    for i, evt in enumerate(events):
+        for key in eventValueKeys:
+            if evt.get(key) is not None:
+                values[i] = evt.get(key)
+                break
+    columns['event_value'] = values
+
+    return columns
+
+def encodeTasks(tasks, firstJobs=None):
+    """
+    Converts a list of trace tasks into a task table and a dictionary of NumPy columns.
+    Job, interval and mutex access columns hold the data of all tasks. The offset columns
+    describe which rows belong to which task (task_jobOffset) and job (job_intervalOffset, job_mutexOffset).
+    If firstJobs is given, only the jobs task.jobs[firstJobs[i]:] of the i-th task are encoded.
+    """
+    taskTable = []
+    jobTask = []
+    jobId = []
+    jobRelease = []
+    jobDeadline = []
+    jobIncomplete = []
+    taskJobOffset = [0]
+    jobIntervalOffset = [0]
+    jobMutexOffset = [0]
+    intervalStart = []
+    intervalStop = []
+    intervalCore = []
+    intervalType = []
+    mutexStart = []
+    mutexStop = []
+    mutexId = []
+    mutexLetter = []
+
+    for taskIndex, task in enumerate(tasks):
+        taskTable.append({'id': task.id, 'name': task.name, 'priority': task.priority, 'period': task.period, 'color': task.taskColor})
+
+        jobs = task.jobs if firstJobs is None else task.jobs[firstJobs[taskIndex]:]
+
+        for job in jobs:
+            jobTask.append(taskIndex)
+            jobId.append(job.id)
+            jobRelease.append(job.releaseTime)
+            jobDeadline.append(np.nan if job.deadline is None else job.deadline)
+            jobIncomplete.append(job.incomplete)
+
+            for interval in job.execIntervals:
+                intervalStart.append(interval.start)
+                intervalStop.append(interval.stop)
+                intervalCore.append(interval.core)
+                intervalType.append(interval.type.value)
+            jobIntervalOffset.append(len(intervalStart))
+
+            for access in job.mutexAccess:
+                mutexStart.append(access.start)
+                mutexStop.append(np.nan if access.stop is None else access.stop)
+                mutexId.append(access.mutexId)
+                mutexLetter.append(0 if access.letter is None else ord(access.letter))
+            jobMutexOffset.append(len(mutexStart))
+
+        taskJobOffset.append(len(jobId))
+
+    columns = {
+        'task_jobOffset':       np.asarray(taskJobOffset, dtype=np.int64),
+        'job_task':             np.asarray(jobTask, dtype=np.int32),
+        'job_id':               np.asarray(jobId, dtype=np.int64),
+        'job_release':          np.asarray(jobRelease, dtype=np.float64),
+        'job_deadline':         np.asarray(jobDeadline, dtype=np.float64),
+        'job_incomplete':       np.asarray(jobIncomplete, dtype=np.bool_),
+        'job_intervalOffset':   np.asarray(jobIntervalOffset, dtype=np.int64),
+        'job_mutexOffset':      np.asarray(jobMutexOffset, dtype=np.int64),
+        'interval_start':       np.asarray(intervalStart, dtype=np.float64),
+        'interval_stop':        np.asarray(intervalStop, dtype=np.float64),
+        'interval_core':        np.asarray(intervalCore, dtype=np.int16),
+        'interval_type':        np.asarray(intervalType, dtype=np.int8),
+        'mutex_start':          np.asarray(mutexStart, dtype=np.float64),
+        'mutex_stop':           np.asarray(mutexStop, dtype=np.float64),
+        'mutex_id':             np.asarray(mutexId, dtype=np.int64),
+        'mutex_letter':         np.asarray(mutexLetter, dtype=np.uint8),
+    }
+
+    return taskTable, columns
+
+def decodeTasks(taskTable, columns, intTime, tasks=None):
+    """
+    Rebuilds the trace tasks from the task table and the columns created by encodeTasks().
+    If intTime is True, all timestamps are converted back to integers.
+    If a list of tasks (one for each entry of the task table) is given, the decoded jobs are appended to those tasks.
+    """
+    toTime = int if intTime else float
+
+    jobOffset = columns['task_jobOffset'].tolist()
+    jobId = columns['job_id'].tolist()
+    jobRelease = columns['job_release'].tolist()
+    jobDeadline = columns['job_deadline'].tolist()
+    jobIncomplete = columns['job_incomplete'].tolist()
+    intervalOffset = columns['job_intervalOffset'].tolist()
+    mutexOffset = columns['job_mutexOffset'].tolist()
+    intervalStart = columns['interval_start'].tolist()
+    intervalStop = columns['interval_stop'].tolist()
+    intervalCore = columns['interval_core'].tolist()
+    intervalType = columns['interval_type'].tolist()
+    mutexStart = columns['mutex_start'].tolist()
+    mutexStop = columns['mutex_stop'].tolist()
+    mutexId = columns['mutex_id'].tolist()
+    mutexLetter = columns['mutex_letter'].tolist()
+
+    if tasks is None:
+        tasks = [TraceTask(info['id'], info['name'], info['priority'], info['color']) for info in taskTable]
+
+    for taskIndex, info in enumerate(taskTable):
+        task = tasks[taskIndex]
+        task.name = info['name']
+        task.priority = info['priority']
+        task.period = info['period']
+
+        for j in range(jobOffset[taskIndex], jobOffset[taskIndex + 1]):
+            deadline = None if np.isnan(jobDeadline[j]) else toTime(jobDeadline[j])
+            job = TraceJob(task, jobId[j], toTime(jobRelease[j]), deadline)
+            job.incomplete = jobIncomplete[j]
+
+            for i in range(intervalOffset[j], intervalOffset[j + 1]):
+                interval = TraceInterval(toTime(intervalStart[i]), intervalCore[i], executionTypes[intervalType[i]])
+                interval.finish(toTime(intervalStop[i]))
+                job.execIntervals.append(interval)
+
+            for m in range(mutexOffset[j], mutexOffset[j + 1]):
+                letter = None if mutexLetter[m] == 0 else chr(mutexLetter[m])
+                access = MutexAccess(toTime(mutexStart[m]), mutexId[m], letter)
+                if not np.isnan(mutexStop[m]):
+                    access.stop = toTime(mutexStop[m])
+                job.mutexAccess.append(access)
+
+            task.jobs.append(job)
+
+    return tasks
+
+def appendTaskColumns(taskTable, columns, intTime, tasks):
+    """
+    Appends the jobs in the columns created by encodeTasks() to the given tasks (one for each entry of the task table)
+    as frozen columns (see TraceTask.freeze()), without creating job and interval objects.
+    """
+    jobOffset = columns['task_jobOffset']
+    intervalOffset = columns['job_intervalOffset']
+    mutexOffset = columns['job_mutexOffset']
+
+    for taskIndex, info in enumerate(taskTable):
+        task = tasks[taskIndex]
+        task.name = info['name']
+        task.priority = info['priority']
+        task.period = info['period']
+
+        firstJob = jobOffset[taskIndex]
+        lastJob = jobOffset[taskIndex + 1]
+        intervals = slice(intervalOffset[firstJob], intervalOffset[lastJob])
+        accesses = slice(mutexOffset[firstJob], mutexOffset[lastJob])
+
+        taskColumns = {}
+        for name in columns:
+            if name in ('job_intervalOffset', 'job_mutexOffset'):
+                taskColumns[name] = columns[name][firstJob:lastJob + 1]
+            elif name.startswith('job_') and name != 'job_task':
+                taskColumns[name] = columns[name][firstJob:lastJob]
+            elif name.startswith('interval_'):
+                taskColumns[name] = columns[name][intervals]
+            elif name.startswith('mutex_'):
+                taskColumns[name] = columns[name][accesses]
+
+        task.appendColumns(taskColumns, intTime)
+
+    return tasks
+
+"""
+Fields of the trace events that have posting lists in an EventIndex: field -> event column.
+"""
+indexFields = {'types': 'event_type', 'taskIds': 'event_taskId', 'irqIds': 'event_irqId', 'mutexIds': 'event_mutexId', 'cores': 'event_core'}
+
+"""
+Arrays of an EventIndex: the positions of the events grouped by the value of each field, and the timestamps of the
+events grouped by core (in the same order as index_cores).
+"""
+indexArrays = dict([('index_' + field, np.int64) for field in indexFields] + [('index_coreTimes', np.float64)])
+
+"""
+Number of events that are processed at once while the posting lists are written.
+"""
+indexChunk = 1 << 20
+
+def writePostingLists(values, positions, chunk=indexChunk, ts=None, times=None):
+    """
+    Writes the positions of the events grouped by their value into positions (an array with one entry per event, e.g. a
+    memory map). The positions of each value are in ascending order. If ts is given, the timestamps of the events are
+    written into times in the same order. The values are processed in chunks, so only one chunk is held in memory.
+    Returns a dictionary value -> (first, last) of the range of each value in positions.
+    """
+    counts = {}
+    for first in range(0, len(values), chunk):
+        keys, keyCounts = np.unique(values[first:first + chunk], return_counts=True)
+        for key, count in zip(keys.tolist(), keyCounts.tolist()):
+            counts[key] = counts.get(key, 0) + count
+
+    ranges = {}
+    offsets = {}
+    offset = 0
+    for key in sorted(counts):
+        ranges[key] = (offset, offset + counts[key])
+        offsets[key] = offset
+        offset = offset + counts[key]
+
+    for first in range(0, len(values), chunk):
+        block = np.asarray(values[first:first + chunk])
+        order = np.argsort(block, kind='stable')
+        keys, starts, keyCounts = np.unique(block[order], return_index=True, return_counts=True)
+        blockTimes = np.asarray(ts[first:first + chunk]) if ts is not None else None
+        for key, start, count in zip(keys.tolist(), starts.tolist(), keyCounts.tolist()):
+            rows = order[start:start + count]
+            positions[offsets[key]:offsets[key] + count] = rows + first
+            if ts is not None:
+                times[offsets[key]:offsets[key] + count] = blockTimes[rows]
+            offsets[key] = offsets[key] + count
+
+    return ranges
+
+def writeEventIndex(columns, arrays):
+    """
+    Writes the posting lists of the event columns into the arrays (see indexArrays). Returns the ranges of the values
+    of each field in the arrays: field -> value -> (first, last).
+    """
+    ranges = {}
+    for field, column in indexFields.items():
+        if field == 'cores':
+            ranges[field] = writePostingLists(columns[column], arrays['index_' + field], ts=columns['event_ts'], times=arrays['index_coreTimes'])
+        else:
+            ranges[field] = writePostingLists(columns[column], arrays['index_' + field])
+        if field not in ('types', 'cores'):
+            ranges[field].pop(NO_VALUE, None)      # Events without a task, irq or mutex id
+    return ranges
+
+class EventIndex():
+    """
+    Posting lists of the time sorted trace events (columns of eventFields): the positions of the events of each event
+    type, task id, irq id, mutex id and core, and the timestamps of the events of each core. The parsers and analyses
+    use them to iterate only the relevant events or to find the events of a time range, without scanning the whole trace.
+    The posting lists are written into arrays, unless the arrays and the ranges are given (e.g. memory maps of an event
+    store, see TraceEventStore.EventStore.getEventIndex()). Only the selected parts of the arrays are read.
+    If the columns are a part of the events of the given arrays (e.g. a time window of an event store), offset is the
+    position of their first event in the arrays. All positions are relative to the columns.
+    """
+    def __init__(self, columns, arrays=None, ranges=None, offset=0):
+        self.count = len(columns['event_type'])
+        self.ts = columns['event_ts']
+        self.offset = offset
+        if arrays is None:
+            arrays = {name: np.empty(self.count, dtype=dtype) for name, dtype in indexArrays.items()}
+            ranges = writeEventIndex(columns, arrays)
+        self.arrays = arrays
+        self.ranges = ranges
+
+    def __len__(self):
+        return self.count
+
+    def getPostings(self, field, value, first=0, last=None):
+        """
+        Returns the positions first <= p < last of the events with the value of the field (e.g. field 'types' and an event type).
+        """
+        if value not in self.ranges[field]:
+            return np.zeros(0, dtype=np.int64)
+        start, stop = self.ranges[field][value]
+        postings = self.arrays['index_' + field][start:stop]
+        if first + self.offset > 0:
+            postings = postings[np.searchsorted(postings, first + self.offset):]
+        postings = postings[:np.searchsorted(postings, (self.count if last is None else last) + self.offset)]
+        if self.offset > 0:
+            return np.asarray(postings) - self.offset
+        return np.asarray(postings)
+
+    def select(self, types=None, taskIds=None, irqIds=None, mutexIds=None, cores=None, first=0, last=None):
+        """
+        Returns the positions first <= p < last (sorted NumPy array) of the events that match all given fields. Each field
+        is a list of values, of which the event must have one. Only the posting lists of the values are read, so selecting
+        the events of a chunk is proportional to the size of the chunk and not to the size of the trace.
+        """
+        if last is None:
+            last = self.count
+        positions = None
+        for field, values in (('types', types), ('taskIds', taskIds), ('irqIds', irqIds), ('mutexIds', mutexIds), ('cores', cores)):
+            if values is None:
+                continue
+            found = [self.getPostings(field, value, first, last) for value in values]
+            if len(found) == 1:
+                matches = found[0]
+            else:
+                matches = np.sort(np.concatenate(found)) if len(found) > 0 else np.zeros(0, dtype=np.int64)
+            positions = matches if positions is None else np.intersect1d(positions, matches, assume_unique=True)
+        return positions if positions is not None else np.arange(first, last)
+
+    def getTimeRange(self, start, stop, core=None):
+        """
+        Returns the positions of the events with start <= ts <= stop (of the core, if given).
+        """
+        if core is None:
+            return np.arange(np.searchsorted(self.ts, start, side='left'), np.searchsorted(self.ts, stop, side='right'))
+        if core not in self.ranges['cores']:
+            return np.zeros(0, dtype=np.int64)
+        first, last = self.ranges['cores'][core]
+        times = self.arrays['index_coreTimes'][first:last]
+        positions = np.asarray(self.arrays['index_cores'][first + np.searchsorted(times, start, side='left'):first + np.searchsorted(times, stop, side='right')])
+        if len(self.arrays['index_cores']) != self.count:      # Only a part of the events of the arrays
+            positions = positions[(positions >= self.offset) & (positions < self.offset + self.count)] - self.offset
+        return positions
+
+def isIntTime(events):
+    """
+    Returns True if the timestamps of the trace are integers (e.g. FreeRTOS traces in us).
+    """
+    return len(events) == 0 or isinstance(events[0].get('ts'), (int, np.integer))
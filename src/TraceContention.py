@@ -0,0 +1,188 @@
+import numpy as np
+import TraceStatistics
+
+"""
+Mutex contention and priority inversion analysis.
+A MutexAccess starts when the task tries to take the mutex (traceENTER_xQueueSemaphoreTake) and stops when the
+task gives the mutex. Since a mutex is held by one task at a time, the accesses of a mutex sorted by their stop
+time are also sorted by the time the mutex was acquired: access k acquires the mutex when it tried to take it,
+or when access k-1 gave it, whatever is later. The time between the take attempt and the acquisition is the
+time the task was blocked by the holders of the mutex.
+The execution time of holders and other tasks during a wait is computed with the window indexes of
+TraceStatistics (prefix sums over the sorted execution intervals of each task and core).
+"""
+
+class MutexWait():
+    """
+    A task that was blocked on a mutex.
+    """
+    def __init__(self, mutexId, letter, task, jobId, start, acquired):
+        self.mutexId = mutexId
+        self.letter = letter
+        self.task = task                # Task that waited for the mutex
+        self.jobId = jobId
+        self.start = start              # Time the task tried to take the mutex
+        self.acquired = acquired        # Time the mutex was given to the task
+        self.holders = []               # List of (task, job id) that held the mutex during the wait
+        self.inversions = []            # PriorityInversion during this wait
+
+    def getWaitTime(self):
+        return self.acquired - self.start
+
+    def getInversionTime(self):
+        return sum(inversion.stop - inversion.start for inversion in self.inversions)
+
+class PriorityInversion():
+    """
+    A window in which a task waits for a mutex that is held by a task with a lower priority.
+    """
+    def __init__(self, wait, holder, holderJobId, start, stop):
+        self.wait = wait                    # MutexWait of the higher priority task
+        self.holder = holder                # Lower priority task that holds the mutex
+        self.holderJobId = holderJobId
+        self.start = start
+        self.stop = stop
+        self.holderExecution = 0.0          # Time the holder executed in the window
+        self.mediumPreemption = 0.0         # Time tasks with a priority between holder and waiter executed on the cores of the holder
+
+class MutexStatistics():
+    """
+    Statistics of one mutex.
+    """
+    def __init__(self, mutexId, letter):
+        self.mutexId = mutexId
+        self.letter = letter
+        self.accesses = 0
+        self.contended = 0                  # Number of accesses that had to wait
+        self.holdTime = None                # Statistics of the hold times (see TraceStatistics.summarize())
+        self.waitTime = None                # Statistics of the wait times of the contended accesses
+        self.inversions = 0                 # Number of priority inversion windows
+        self.inversionTime = 0.0            # Total length of all priority inversion windows
+
+class MutexAnalysis():
+    """
+    Result of the mutex analysis of a trace.
+    """
+    def __init__(self):
+        self.mutexes = []                   # MutexStatistics of each mutex
+        self.waits = []                     # All MutexWait, sorted by start
+        self.inversions = []                # All PriorityInversion, sorted by start
+
+def analyzeMutex(traceSet, mutexId, accesses, traceEnd):
+    """
+    Analyzes the accesses (list of (task, job id, MutexAccess)) of one mutex.
+    Returns the MutexStatistics and the list of MutexWait of the mutex.
+    """
+    letter = accesses[0][2].letter if len(accesses) > 0 else None
+    statistics = MutexStatistics(mutexId, letter)
+    statistics.accesses = len(accesses)
+
+    start = np.asarray([access.start for task, jobId, access in accesses], dtype=np.float64)
+    stop = np.asarray([traceEnd if access.stop is None else access.stop for task, jobId, access in accesses], dtype=np.float64)
+
+    # Sort the accesses by give time, the mutex is acquired when it is free and the task tried to take it.
+    order = np.lexsort((start, stop))
+    start = start[order]
+    stop = stop[order]
+    previousStop = np.concatenate(([-np.inf], stop[:-1]))
+    acquired = np.maximum(start, previousStop)
+
+    statistics.holdTime = TraceStatistics.summarize(stop - acquired)
+    contended = np.flatnonzero(acquired > start)
+    statistics.contended = len(contended)
+    statistics.waitTime = TraceStatistics.summarize(acquired[contended] - start[contended])
+
+    windowIndexes = TraceStatistics.getWindowIndexes(traceSet)
+
+    waits = []
+    for k in contended.tolist():
+        task, jobId, access = accesses[order[k]]
+        wait = MutexWait(mutexId, letter, task, jobId, float(start[k]), float(acquired[k]))
+
+        # All accesses that gave the mutex after the take attempt and before this access held the mutex during the wait.
+        firstHolder = int(np.searchsorted(stop, start[k], side='right'))
+        for j in range(firstHolder, k):
+            holder, holderJobId, holderAccess = accesses[order[j]]
+            wait.holders.append((holder, holderJobId))
+
+            if task.priority is None or holder.priority is None or holder.priority >= task.priority:
+                continue
+
+            inversion = PriorityInversion(wait, holder, holderJobId, float(max(start[k], acquired[j])), float(min(acquired[k], stop[j])))
+            if inversion.stop <= inversion.start:
+                continue
+
+            holderIndex = windowIndexes[holder]
+            inversion.holderExecution = holderIndex.busyTime(inversion.start, inversion.stop)
+
+            # Cores the holder used while it held the mutex
+            holderCores = [core for core in holderIndex.cores if holderIndex.busyTime(acquired[j], stop[j], core) > 0]
+            for other, otherIndex in windowIndexes.items():
+                if other.priority is not None and holder.priority < other.priority < task.priority and traceSet.getTaskKind(other) == 'user':
+                    for core in holderCores:
+                        inversion.mediumPreemption = inversion.mediumPreemption + otherIndex.busyTime(inversion.start, inversion.stop, core)
+
+            wait.inversions.append(inversion)
+            statistics.inversions = statistics.inversions + 1
+            statistics.inversionTime = statistics.inversionTime + (inversion.stop - inversion.start)
+
+        waits.append(wait)
+
+    return statistics, waits
+
+def analyzeMutexes(traceSet):
+    """
+    Returns the MutexAnalysis of the trace set. The result is cached in the trace set.
+    """
+    if traceSet.mutexAnalysis is None:
+        table = traceSet.getMutexTable()
+        traceEnd = traceSet.getBounds()[1]
+        analysis = MutexAnalysis()
+
+        for mutexId in table.getMutexIds():
+            accesses = [row for row in table.getAccesses(mutexId) if row[0] in traceSet]
+            if len(accesses) == 0:
+                continue
+            statistics, waits = analyzeMutex(traceSet, mutexId, accesses, traceEnd)
+            analysis.mutexes.append(statistics)
+            analysis.waits.extend(waits)
+
+        analysis.waits.sort(key=lambda wait: wait.start)
+        analysis.inversions = sorted([inversion for wait in analysis.waits for inversion in wait.inversions], key=lambda inversion: inversion.start)
+        traceSet.mutexAnalysis = analysis
+
+    return traceSet.mutexAnalysis
+
+def getWaitTable(traceSet):
+    """
+    Returns the column names and the rows (one per MutexWait) of the contention table of the trace set.
+    """
+    analysis = analyzeMutexes(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["Mutex", "Task", "Job", "Holder", "Start [" + unit + "]", "Wait [" + unit + "]", "Inversion [" + unit + "]", "Holder Exec [" + unit + "]", "Medium Preemption [" + unit + "]"]
+    rows = []
+    for wait in analysis.waits:
+        holders = ", ".join(holder.name + "-" + str(jobId) for holder, jobId in wait.holders)
+        rows.append([wait.letter if wait.letter is not None else str(wait.mutexId), wait.task.name, wait.jobId, holders, round(wait.start, 1), round(wait.getWaitTime(), 1),
+                     round(wait.getInversionTime(), 1), round(sum(inversion.holderExecution for inversion in wait.inversions), 1),
+                     round(sum(inversion.mediumPreemption for inversion in wait.inversions), 1)])
+    return columns, rows
+
+def printMutexStatistics(traceSet):
+    """
+    Prints the statistics of each mutex of the trace set.
+    """
+    analysis = analyzeMutexes(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    if len(analysis.mutexes) == 0:
+        print("No mutex accesses in the trace.")
+
+    for statistics in analysis.mutexes:
+        name = statistics.letter if statistics.letter is not None else str(statistics.mutexId)
+        print("Mutex " + name + " (" + hex(statistics.mutexId) + "): " + str(statistics.accesses) + " accesses, " + str(statistics.contended) + " contended, "
+              + str(statistics.inversions) + " priority inversions (" + str(round(statistics.inversionTime, 1)) + " " + unit + ")")
+        for label, summary in (("hold", statistics.holdTime), ("wait", statistics.waitTime)):
+            if summary['max'] is not None:
+                print("\t" + label + " time [" + unit + "]: " + ", ".join(field + "=" + str(round(summary[field], 1)) for field in TraceStatistics.summaryFields))
@@ -0,0 +1,156 @@
+import numpy as np
+import TraceStatistics
+import TracePeriods
+
+"""
+Comparison of two traces of the same application (e.g. before and after a change of the firmware).
+Tasks are matched by name. Jobs are matched by their release order, or by their period slot if both tasks are periodic:
+the slot of a job is round((release - offset) / period) with the period and offset inferred from each trace (see TracePeriods),
+so a missing or additional release does not shift all following jobs. Both slot arrays are sorted, so the matching is a merge
+of two sorted arrays. The response time and execution time deltas of all matched jobs are computed as arrays.
+"""
+
+"""
+A job is a regression if its response time is larger than the response time of the matched reference job by more than
+regressionFraction of the reference response time.
+"""
+regressionFraction = 0.1
+
+"""
+Job alignment modes: 'order' matches the k-th jobs, 'slot' matches jobs of the same period slot and 'auto' uses 'slot'
+if both tasks are periodic and 'order' otherwise.
+"""
+alignmentModes = ('auto', 'order', 'slot')
+
+class TaskComparison():
+    """
+    Comparison of the jobs of a task in two traces. All arrays have one entry per matched job.
+    """
+    def __init__(self, task, referenceTask, mode):
+        self.task = task                    # Task of the compared trace
+        self.referenceTask = referenceTask  # Task with the same name in the reference trace
+        self.mode = mode                    # Alignment mode used ('order' or 'slot')
+        self.rows = np.zeros(0, dtype=np.int64)             # Job rows of the task
+        self.referenceRows = np.zeros(0, dtype=np.int64)    # Job rows of the reference task
+        self.responseDelta = np.zeros(0)    # Response time - reference response time (NaN if one of the jobs is incomplete)
+        self.executionDelta = np.zeros(0)   # Execution time - reference execution time
+        self.regression = np.zeros(0, dtype=np.bool_)
+
+class TraceComparison():
+    """
+    Comparison of two traces.
+    """
+    def __init__(self, traceSet, referenceSet):
+        self.traceSet = traceSet
+        self.referenceSet = referenceSet
+        self.tasks = []                     # TaskComparison of each user task that is in both traces
+        self.onlyInTrace = []               # Names of the user tasks that are not in the reference trace
+        self.onlyInReference = []           # Names of the user tasks that are not in the compared trace
+
+def getSlots(release, estimate):
+    """
+    Returns the period slot of each release.
+    """
+    return np.round((release - estimate.offset) / estimate.period).astype(np.int64)
+
+def alignJobs(release, referenceRelease, mode, estimate=None, referenceEstimate=None):
+    """
+    Returns the matched job rows of both tasks. If mode is 'slot', the period estimates of both tasks are needed.
+    """
+    if mode == 'order':
+        count = min(len(release), len(referenceRelease))
+        return np.arange(count), np.arange(count)
+
+    slots = getSlots(release, estimate)
+    referenceSlots = getSlots(referenceRelease, referenceEstimate)
+
+    # Keep the first job of each slot (slots are sorted, since the releases are sorted)
+    rows = np.flatnonzero(np.concatenate(([True], slots[1:] != slots[:-1])))
+    referenceRows = np.flatnonzero(np.concatenate(([True], referenceSlots[1:] != referenceSlots[:-1])))
+
+    common, first, second = np.intersect1d(slots[rows], referenceSlots[referenceRows], assume_unique=True, return_indices=True)
+    return rows[first], referenceRows[second]
+
+def compareTask(traceSet, referenceSet, task, referenceTask, mode='auto'):
+    """
+    Compares the jobs of a task with the jobs of the task with the same name in the reference trace.
+    """
+    estimate = traceSet.periods.get(task)
+    referenceEstimate = referenceSet.periods.get(referenceTask)
+    if mode == 'auto':
+        periodic = estimate is not None and referenceEstimate is not None and estimate.isPeriodic() and referenceEstimate.isPeriodic()
+        mode = 'slot' if periodic else 'order'
+
+    comparison = TaskComparison(task, referenceTask, mode)
+    rows, referenceRows = alignJobs(task.columns['job_release'], referenceTask.columns['job_release'], mode, estimate, referenceEstimate)
+    comparison.rows = rows
+    comparison.referenceRows = referenceRows
+
+    metrics = TraceStatistics.getJobMetrics(task)
+    referenceMetrics = TraceStatistics.getJobMetrics(referenceTask)
+    comparison.responseDelta = metrics['responseTime'][rows] - referenceMetrics['responseTime'][referenceRows]
+    comparison.executionDelta = metrics['executionTime'][rows] - referenceMetrics['executionTime'][referenceRows]
+    with np.errstate(invalid='ignore'):
+        comparison.regression = comparison.responseDelta > regressionFraction * referenceMetrics['responseTime'][referenceRows]
+    return comparison
+
+def compareTraces(traceSet, referenceSet, mode='auto'):
+    """
+    Compares all user tasks of the trace set with the tasks of the same name in the reference trace set.
+    """
+    for tasks in (traceSet, referenceSet):
+        if tasks.periods is None:
+            TracePeriods.inferPeriods(tasks)
+
+    comparison = TraceComparison(traceSet, referenceSet)
+    for task in traceSet:
+        if traceSet.getTaskKind(task) != 'user':
+            continue
+        referenceTask = referenceSet.findByName(task.name)
+        if referenceTask is None:
+            comparison.onlyInTrace.append(task.name)
+            continue
+        comparison.tasks.append(compareTask(traceSet, referenceSet, task, referenceTask, mode))
+
+    for referenceTask in referenceSet:
+        if referenceSet.getTaskKind(referenceTask) == 'user' and traceSet.findByName(referenceTask.name) is None:
+            comparison.onlyInReference.append(referenceTask.name)
+
+    return comparison
+
+def getComparisonTable(comparison):
+    """
+    Returns the column names and the rows (one per task) of the comparison.
+    """
+    unit = TraceStatistics.getTimeUnit(comparison.traceSet)
+    columns = ["Task", "Alignment", "Jobs", "Reference Jobs", "Matched", "Regressions", "Avg Response Delta [" + unit + "]", "Max Response Delta [" + unit + "]",
+               "Avg Exec Delta [" + unit + "]", "Max Exec Delta [" + unit + "]"]
+
+    def rounded(values, function):
+        values = values[~np.isnan(values)]
+        return round(float(function(values)), 1) if len(values) > 0 else "-"
+
+    rows = []
+    for result in comparison.tasks:
+        rows.append([result.task.name, result.mode, len(result.task.jobs), len(result.referenceTask.jobs), len(result.rows), int(np.count_nonzero(result.regression)),
+                     rounded(result.responseDelta, np.mean), rounded(result.responseDelta, np.max), rounded(result.executionDelta, np.mean), rounded(result.executionDelta, np.max)])
+    for name in comparison.onlyInTrace:
+        rows.append([name, "only in trace"] + ["-"] * (len(columns) - 2))
+    for name in comparison.onlyInReference:
+        rows.append([name, "only in reference"] + ["-"] * (len(columns) - 2))
+    return columns, rows
+
+def getRegressionWindows(comparison, reference=False):
+    """
+    Returns task -> (release times, finish times) of the regressed jobs, in the compared trace or in the reference trace.
+    The jobs of a task execute one after the other, so both arrays are sorted.
+    """
+    windows = {}
+    for result in comparison.tasks:
+        task = result.referenceTask if reference else result.task
+        rows = (result.referenceRows if reference else result.rows)[result.regression]
+        if len(rows) > 0:
+            release = task.columns['job_release'][rows]
+            finish = task.columns['job_finish'][rows]
+            windows[task] = (release, np.where(np.isnan(finish), release, finish))
+    return windows
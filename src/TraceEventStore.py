@@ -0,0 +1,341 @@
+import json
+import os
+from collections.abc import Sequence
+import numpy as np
+import HelperFunctions
+import TraceColumns
+
+"""
+Disk-backed store of the trace events of a recording, for captures that do not fit into memory as event dictionaries.
+The decoders append the events in chunks. Each chunk is sorted by time and written as fixed-width records (one run per
+chunk) to a file. finish() merges the runs with a bounded amount of memory into the time sorted offsets of all records
+and writes the time sorted event columns (see TraceColumns.eventFields), which are memory mapped when they are used.
+The reconstruction reads the sorted events through an EventWindow, which only keeps one window of events decoded
+as dictionaries. Events with the same timestamp keep the order in which they were appended (as sorted() would).
+"""
+
+"""
+Size in bytes of the trace files of a recording above which the parsers use an event store instead of lists of events.
+"""
+outOfCoreBytes = 64 << 20
+
+"""
+Number of events per run and per decoded window of an EventWindow.
+"""
+windowEvents = 100000
+
+"""
+Maximum number of records held in memory while the runs are merged.
+"""
+mergeBudget = 1 << 20
+
+"""
+Version of the store layout, a store with another version is created again.
+"""
+storeVersion = 2
+
+"""
+Fixed-width record of one event. seq is the position in which the event was appended.
+"""
+recordDtype = np.dtype([('seq', np.int64)] + [(column, dtype) for column, (key, dtype) in TraceColumns.eventFields.items()] + [('event_value', np.int64)])
+
+class EventStore():
+    """
+    Event store in a folder: records.bin (runs of time sorted records), order.bin (record offsets of all events in time
+    order), one file per sorted event column (and seq.bin), the posting lists of the sorted events (index_*.bin, see
+    TraceColumns.EventIndex) and meta.json.
+    decodeKeys describes the event dictionaries returned by getEvents(): 'valueKeys' (event type -> key of event_value),
+    'flagKeys' (event type -> key of event_flag) and 'nameKey' (key of a string of the event, which is kept in meta.json).
+    If 'allKeys' is given, every event has the keys ts, type, taskId, core and then the keys in allKeys (None if not set),
+    otherwise only the keys that are set.
+    """
+    def __init__(self, folder, create=False, intTime=False, decodeKeys=None, source=None):
+        self.folder = folder
+        self.file = None
+        self.columns = None
+        self.index = None
+
+        if create:
+            HelperFunctions.makeFolder(folder)
+            for name in os.listdir(folder):
+                if name.endswith(".bin") or name == "meta.json":
+                    os.remove(os.path.join(folder, name))
+            self.meta = {'version': storeVersion, 'count': 0, 'runs': [], 'intTime': intTime, 'complete': False, 'names': {},
+                         'decodeKeys': json.loads(json.dumps(decodeKeys if decodeKeys is not None else {})), 'source': source, 'info': None}
+            self.file = open(self.path("records.bin"), 'ab')
+        else:
+            with open(self.path("meta.json")) as file:
+                self.meta = json.load(file)
+
+    def path(self, name):
+        return os.path.join(self.folder, name)
+
+    @property
+    def intTime(self):
+        return self.meta['intTime']
+
+    @property
+    def info(self):
+        """
+        Information of the parser that is kept with the store (e.g. the task create events), or None.
+        """
+        return self.meta['info']
+
+    def __len__(self):
+        return self.meta['count']
+
+    def append(self, events):
+        """
+        Appends a chunk of event dictionaries as one time sorted run.
+        """
+        if len(events) == 0:
+            return
+        nameKey = self.meta['decodeKeys'].get('nameKey')
+        if nameKey is not None:
+            for seq, evt in enumerate(events, start=self.meta['count']):
+                if evt.get(nameKey) is not None:
+                    self.meta['names'][str(seq)] = evt.get(nameKey)
+
+        columns = TraceColumns.encodeEvents(events)
+        records = np.empty(len(events), dtype=recordDtype)
+        records['seq'] = np.arange(self.meta['count'], self.meta['count'] + len(events))
+        for name in columns:
+            records[name] = columns[name]
+
+        records = records[np.argsort(records['event_ts'], kind='stable')]
+        records.tofile(self.file)
+        self.meta['runs'].append((self.meta['count'], self.meta['count'] + len(events)))
+        self.meta['count'] = self.meta['count'] + len(events)
+
+    def finish(self, timeOffset=0, info=None):
+        """
+        Merges the runs into the time sorted order and writes the sorted event columns. timeOffset is subtracted from all
+        timestamps (e.g. to start the trace at t=0) before the events are sorted. info is kept in the store for the parser.
+        """
+        self.file.close()
+        self.file = None
+        count = self.meta['count']
+        records = np.memmap(self.path("records.bin"), dtype=recordDtype, mode='r', shape=(count,)) if count > 0 else np.zeros(0, dtype=recordDtype)
+
+        outputs = {name: open(self.path(name + ".bin"), 'wb') for name in ["order"] + list(recordDtype.names)}
+        runs = [list(run) for run in self.meta['runs']]
+        perRun = max(1, mergeBudget // max(len(runs), 1))
+
+        while len(runs) > 0:
+            # Every run contributes the records up to the smallest (ts, seq) key that is known in all runs
+            windows = []
+            cutoff = None
+            for run in runs:
+                window = records[run[0]:min(run[0] + perRun, run[1])]
+                ts = window['event_ts'] - timeOffset
+                windows.append((ts, window['seq']))
+                if run[0] + len(window) < run[1]:
+                    key = (ts[-1], window['seq'][-1])
+                    if cutoff is None or key < cutoff:
+                        cutoff = key
+
+            positions = []
+            for run, (ts, seq) in zip(runs, windows):
+                if cutoff is None:
+                    taken = len(ts)
+                else:
+                    taken = int(np.searchsorted(ts, cutoff[0], side='left'))
+                    tie = int(np.searchsorted(ts, cutoff[0], side='right'))
+                    taken = taken + int(np.searchsorted(seq[taken:tie], cutoff[1], side='right'))
+                positions.append(np.arange(run[0], run[0] + taken))
+                run[0] = run[0] + taken
+
+            positions = np.concatenate(positions)
+            block = records[positions]
+            block['event_ts'] = block['event_ts'] - timeOffset
+            order = np.lexsort((block['seq'], block['event_ts']))
+            positions[order].astype(np.int64).tofile(outputs["order"])
+            block = block[order]
+            for name in recordDtype.names:
+                block[name].tofile(outputs[name])
+            runs = [run for run in runs if run[0] < run[1]]
+
+        for output in outputs.values():
+            output.close()
+        del records
+
+        # The posting lists are written in chunks into memory maps, so they are not held in memory either
+        arrays = {name: self.createColumn(name, dtype) for name, dtype in TraceColumns.indexArrays.items()}
+        ranges = TraceColumns.writeEventIndex(self.getColumns(), arrays)
+        for array in arrays.values():
+            if isinstance(array, np.memmap):
+                array.flush()
+        del arrays
+        self.meta['index'] = {field: [[value, first, last] for value, (first, last) in values.items()] for field, values in ranges.items()}
+
+        self.meta['complete'] = True
+        self.meta['info'] = info
+        with open(self.path("meta.json"), 'w') as file:
+            json.dump(self.meta, file)
+
+    def getOrder(self):
+        """
+        Returns the record offsets (in records.bin) of all events in time order.
+        """
+        return self.getColumn("order", np.int64)
+
+    def createColumn(self, name, dtype):
+        if len(self) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path(name + ".bin"), dtype=dtype, mode='w+', shape=(len(self),))
+
+    def getColumn(self, name, dtype):
+        if len(self) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path(name + ".bin"), dtype=dtype, mode='c', shape=(len(self),))
+
+    def getColumns(self):
+        """
+        Returns the time sorted event columns as copy-on-write memory maps (the same columns as TraceColumns.encodeEvents()).
+        """
+        if self.columns is None:
+            self.columns = {name: self.getColumn(name, recordDtype[name]) for name in recordDtype.names[1:]}
+        return self.columns
+
+    def getEventIndex(self):
+        """
+        Returns the posting lists of the sorted events (TraceColumns.EventIndex) with memory mapped arrays.
+        """
+        if self.index is None:
+            arrays = {name: self.getColumn(name, dtype) for name, dtype in TraceColumns.indexArrays.items()}
+            ranges = {field: {value: (first, last) for value, first, last in values} for field, values in self.meta['index'].items()}
+            self.index = TraceColumns.EventIndex(self.getColumns(), arrays, ranges)
+        return self.index
+
+    def getEvents(self, first, last):
+        """
+        Returns the events first..last-1 (in time order) as dictionaries, like the events of the decoders.
+        """
+        columns = self.getColumns()
+        decodeKeys = self.meta['decodeKeys']
+        valueKeys = decodeKeys.get('valueKeys', {})
+        flagKeys = decodeKeys.get('flagKeys', {})
+        nameKey = decodeKeys.get('nameKey')
+        allKeys = decodeKeys.get('allKeys')
+        names = self.meta['names']
+        seqs = self.getColumn("seq", np.int64)[first:last].tolist() if len(names) > 0 else None
+        toTime = int if self.intTime else float
+
+        events = []
+        for row, (ts, type, core, taskId, irqId, mutexId, flag, value) in enumerate(zip(columns['event_ts'][first:last].tolist(), columns['event_type'][first:last].tolist(),
+                columns['event_core'][first:last].tolist(), columns['event_taskId'][first:last].tolist(), columns['event_irqId'][first:last].tolist(),
+                columns['event_mutexId'][first:last].tolist(), columns['event_flag'][first:last].tolist(), columns['event_value'][first:last].tolist())):
+            if allKeys is not None:
+                evt = {'ts': toTime(ts), 'type': type, 'taskId': taskId, 'core': core}
+                for key in allKeys:
+                    evt[key] = None
+            else:
+                evt = {'type': type, 'ts': toTime(ts), 'core': core}
+                if taskId != TraceColumns.NO_VALUE:
+                    evt['taskId'] = taskId
+                if irqId != TraceColumns.NO_VALUE:
+                    evt['irqId'] = irqId
+                if mutexId != TraceColumns.NO_VALUE:
+                    evt['mutexId'] = mutexId
+
+            if seqs is not None and str(seqs[row]) in names:
+                evt[nameKey] = names[str(seqs[row])]
+            if str(type) in valueKeys and value != TraceColumns.NO_VALUE:
+                evt[valueKeys[str(type)]] = value
+            if str(type) in flagKeys:
+                evt[flagKeys[str(type)]] = flag
+            events.append(evt)
+        return events
+
+def openStore(folder, source):
+    """
+    Returns the complete event store in the folder if it was created from the same source (e.g. the sizes and modification
+    times of the trace files), otherwise None.
+    """
+    try:
+        store = EventStore(folder)
+    except (OSError, ValueError):
+        return None
+    if store.meta.get('version') != storeVersion or not store.meta.get('complete') or store.meta.get('source') != source:
+        return None
+    return store
+
+def getSource(paths):
+    """
+    Returns a description of the trace files (name, size and modification time) to detect if a store is up to date.
+    """
+    return [[os.path.basename(str(path)), os.path.getsize(path), os.path.getmtime(path)] for path in paths]
+
+class EventWindow(Sequence):
+    """
+    Read-only list of the time sorted events of a store. Only the window of windowEvents events that contains the last
+    accessed event is kept as dictionaries, so the parse functions can index the events as if they were a list.
+    The parsers must process the events in the chunks given by ranges, so every window is decoded only once.
+    If first and last are given, the list only holds the sorted events first..last-1 of the store (e.g. a time window).
+    """
+    def __init__(self, store, first=0, last=None):
+        self.store = store
+        self.offset = first
+        self.count = (len(store) if last is None else last) - first
+        self.ranges = HelperFunctions.chunkRanges(self.count, windowEvents, windowEvents)
+        self.first = 0
+        self.events = []
+
+    def __len__(self):
+        return self.count
+
+    def isComplete(self):
+        """
+        Returns True if the list holds all events of the store.
+        """
+        return self.offset == 0 and self.count == len(self.store)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index = index + len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("event index out of range")
+
+        if not self.first <= index < self.first + len(self.events):
+            self.first = index - index % windowEvents
+            self.events = self.store.getEvents(self.offset + self.first, self.offset + min(self.first + windowEvents, len(self)))
+        return self.events[index - self.first]
+
+def getChunkRanges(events, firstChunk, maxChunk):
+    """
+    Returns the chunks in which the parsers process the events: the windows of an EventWindow, or chunks that grow
+    from firstChunk to maxChunk events for a list of events.
+    """
+    if isinstance(events, EventWindow):
+        return events.ranges
+    return HelperFunctions.chunkRanges(len(events), firstChunk, maxChunk)
+
+def getEventColumns(events):
+    """
+    Returns the time sorted event columns of the events of a parser (a list of event dictionaries, an event store or an
+    EventWindow).
+    """
+    if isinstance(events, EventStore):
+        return events.getColumns()
+    if isinstance(events, EventWindow):
+        columns = events.store.getColumns()
+        if events.isComplete():
+            return columns
+        return {name: column[events.offset:events.offset + len(events)] for name, column in columns.items()}
+    return TraceColumns.encodeEvents(events)
+
+def getEventIndex(events, columns=None):
+    """
+    Returns the posting lists (TraceColumns.EventIndex) of the time sorted events of a parser. For an event store (or an
+    EventWindow) these are the memory mapped posting lists of the store, otherwise they are created from the event
+    columns (from the events, if the columns are not given).
+    """
+    if isinstance(events, EventWindow) and not events.isComplete():
+        # The posting lists of the store are used with the positions relative to the window
+        index = events.store.getEventIndex()
+        return TraceColumns.EventIndex(getEventColumns(events), index.arrays, index.ranges, events.offset)
+    if isinstance(events, EventWindow):
+        events = events.store
+    if isinstance(events, EventStore):
+        return events.getEventIndex()
+    return TraceColumns.EventIndex(columns if columns is not None else getEventColumns(events))
@@ -0,0 +1,179 @@
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import numpy as np
+import HelperFunctions
+import TraceStatistics
+import TraceBatch
+
+"""
+Export of a trace as Chrome Trace Event JSON, which can be opened in Perfetto (ui.perfetto.dev) or chrome://tracing.
+Each task has a track (process "Tasks") with its execution intervals, job releases and deadline misses, each core has a
+track (process "Cores") with the execution intervals of all tasks on the core. Mutex accesses are flow events from the
+release of a mutex to the next access of the same mutex.
+The events are written directly to the file in blocks of blockSize rows of the task columns, so the memory used by the
+export does not grow with the length of the trace. Files ending with .gz are written with gzip.
+"""
+
+"""
+Number of rows formatted at once.
+"""
+blockSize = 20000
+
+"""
+Chrome trace timestamps are in us. Factor to convert the timestamps of each trace format.
+"""
+timeScales = {'FreeRTOS': 1.0, 'Linux': 1e-3}
+
+taskProcess = 1
+coreProcess = 2
+
+def openOutput(filename, compress=None):
+    """
+    Opens the output file for writing text. The file is compressed if compress is True, or if compress is None and the
+    filename ends with .gz.
+    """
+    if compress is None:
+        compress = filename.endswith(".gz")
+    if compress:
+        return io.TextIOWrapper(gzip.open(filename, 'wb', compresslevel=6), encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8', buffering=1 << 20)
+
+def writeBlocks(file, count, formatBlock):
+    """
+    Writes count rows in blocks. formatBlock(first, last) returns the event strings of the rows first..last-1.
+    """
+    for first in range(0, count, blockSize):
+        lines = formatBlock(first, min(first + blockSize, count))
+        if len(lines) > 0:
+            file.write(",\n" + ",\n".join(lines))
+
+def writeMetadata(file, pid, tid, key, name, sortIndex=None):
+    file.write(",\n" + json.dumps({'ph': 'M', 'pid': pid, 'tid': tid, 'name': key, 'args': {'name': name}}))
+    if sortIndex is not None:
+        file.write(",\n" + json.dumps({'ph': 'M', 'pid': pid, 'tid': tid, 'name': key.replace('name', 'sort_index'), 'args': {'sort_index': sortIndex}}))
+
+def writeTask(file, task, tid, scale):
+    """
+    Writes the intervals (on the task track and on the core track), the releases and the deadline misses of one task.
+    """
+    columns = task.columns
+    name = json.dumps(task.name)
+    start = columns['interval_start']
+    stop = columns['interval_stop']
+    core = columns['interval_core']
+    intervalJob = np.repeat(columns['job_id'], np.diff(columns['job_intervalOffset']))
+
+    def intervals(first, last):
+        lines = []
+        for ts, end, c, job in zip((start[first:last] * scale).tolist(), (stop[first:last] * scale).tolist(), core[first:last].tolist(), intervalJob[first:last].tolist()):
+            args = '"args":{"job":%d,"core":%d}}' % (job, c)
+            lines.append('{"ph":"X","pid":%d,"tid":%d,"name":%s,"ts":%.3f,"dur":%.3f,%s' % (taskProcess, tid, name, ts, end - ts, args))
+            lines.append('{"ph":"X","pid":%d,"tid":%d,"name":%s,"ts":%.3f,"dur":%.3f,%s' % (coreProcess, c, name, ts, end - ts, args))
+        return lines
+    writeBlocks(file, len(start), intervals)
+
+    release = columns['job_release']
+    jobIds = columns['job_id']
+
+    def releases(first, last):
+        return ['{"ph":"i","s":"t","pid":%d,"tid":%d,"name":"Release","ts":%.3f,"args":{"job":%d}}' % (taskProcess, tid, ts, job)
+                for ts, job in zip((release[first:last] * scale).tolist(), jobIds[first:last].tolist())]
+    writeBlocks(file, len(release), releases)
+
+    metrics = TraceStatistics.getJobMetrics(task)
+    missed = np.flatnonzero(metrics['deadlineMiss'])
+    finish = columns['job_finish'][missed]
+    deadline = metrics['deadline'][missed]
+
+    def misses(first, last):
+        return ['{"ph":"i","s":"t","pid":%d,"tid":%d,"name":"Deadline miss","ts":%.3f,"args":{"job":%d,"deadline":%.3f}}' % (taskProcess, tid, ts, job, d)
+                for ts, job, d in zip((finish[first:last] * scale).tolist(), jobIds[missed[first:last]].tolist(), (deadline[first:last] * scale).tolist())]
+    writeBlocks(file, len(missed), misses)
+
+def writeMutexFlows(file, tasks, scale):
+    """
+    Writes a flow from the end of each mutex access to the start of the next access of the same mutex.
+    """
+    starts = []
+    stops = []
+    mutexIds = []
+    tids = []
+    for tid, task in enumerate(tasks, start=1):
+        columns = task.columns
+        starts.append(columns['mutex_start'])
+        stops.append(columns['mutex_stop'])
+        mutexIds.append(columns['mutex_id'])
+        tids.append(np.full(len(columns['mutex_id']), tid, dtype=np.int64))
+    if len(starts) == 0:
+        return
+
+    start = np.concatenate(starts)
+    stop = np.concatenate(stops)
+    mutexId = np.concatenate(mutexIds)
+    tid = np.concatenate(tids)
+
+    order = np.lexsort((start, mutexId))
+    handover = np.flatnonzero((mutexId[order[1:]] == mutexId[order[:-1]]) & ~np.isnan(stop[order[:-1]]))
+    source = order[handover]
+    target = order[handover + 1]
+
+    def flows(first, last):
+        lines = []
+        for flow, mutex, fromTid, ts, toTid, toTs in zip(range(first, last), mutexId[source[first:last]].tolist(), tid[source[first:last]].tolist(),
+                                                         (stop[source[first:last]] * scale).tolist(), tid[target[first:last]].tolist(), (start[target[first:last]] * scale).tolist()):
+            name = '"Mutex %d"' % mutex
+            lines.append('{"ph":"s","pid":%d,"tid":%d,"name":%s,"cat":"mutex","id":%d,"ts":%.3f}' % (taskProcess, fromTid, name, flow, ts))
+            lines.append('{"ph":"f","bp":"e","pid":%d,"tid":%d,"name":%s,"cat":"mutex","id":%d,"ts":%.3f}' % (taskProcess, toTid, name, flow, toTs))
+        return lines
+    writeBlocks(file, len(source), flows)
+
+def exportChromeTrace(traceSet, filename, compress=None):
+    """
+    Writes the trace set as Chrome Trace Event JSON to the file. Returns the number of exported execution intervals.
+    """
+    scale = timeScales.get(traceSet.traceFormat, 1.0)
+    tasks = list(traceSet)
+    for task in tasks:
+        task.freeze()
+
+    with openOutput(filename, compress) as file:
+        file.write('{"displayTimeUnit":"ns","otherData":' + json.dumps({'origin': str(traceSet.origin), 'format': traceSet.traceFormat}) + ',"traceEvents":[\n')
+        file.write(json.dumps({'ph': 'M', 'pid': taskProcess, 'tid': 0, 'name': 'process_name', 'args': {'name': 'Tasks'}}))
+        writeMetadata(file, coreProcess, 0, 'process_name', 'Cores')
+
+        cores = set()
+        for tid, task in enumerate(tasks, start=1):
+            writeMetadata(file, taskProcess, tid, 'thread_name', task.name + " (" + str(task.id) + ")", tid)
+            cores.update(np.unique(task.columns['interval_core']).tolist())
+        for core in sorted(cores):
+            writeMetadata(file, coreProcess, core, 'thread_name', "Core " + str(core), core)
+
+        intervals = 0
+        for tid, task in enumerate(tasks, start=1):
+            writeTask(file, task, tid, scale)
+            intervals = intervals + len(task.columns['interval_start'])
+        writeMutexFlows(file, tasks, scale)
+
+        file.write("\n]}\n")
+    return intervals
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Exports a recording as Chrome Trace Event JSON (Perfetto).")
+    ap.add_argument("target", choices=sorted(TraceBatch.batchTargets), help="Target, i.e. the data folder of the recording")
+    ap.add_argument("recording", help="Name of the recording")
+    ap.add_argument("output", help="Output file (.json or .json.gz)")
+    ap.add_argument("--data", default=TraceBatch.getDataPath(), help="Folder that contains the data folders of the targets")
+    args = ap.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        traceSet = TraceBatch.loadRecording(args.target, os.path.join(args.data, args.target, args.recording))
+    intervals = exportChromeTrace(traceSet, args.output)
+    HelperFunctions.printState("Exported " + str(intervals) + " intervals to", args.output)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
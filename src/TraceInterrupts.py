@@ -0,0 +1,210 @@
+import numpy as np
+import TraceStatistics
+import TraceParserFreeRTOS
+
+"""
+Interrupt load profile of a FreeRTOS trace.
+The parser only reconstructs the ISR executions of the tick interrupts (tickIds). This profile uses the ISR_ENTER/EXIT
+events of all IRQ ids in the trace events. The nesting depth on each core is the running sum of +1 (enter) and -1 (exit),
+reflected at zero so exits without enter (e.g. at the start of the trace) are ignored. An enter at depth d is closed by the
+next exit on the same core that returns to depth d-1. So the events sorted by (core, depth, time) alternate between enter
+and exit, and each enter is paired with the exit that directly follows it in this order.
+"""
+
+"""
+Number of bins used for the invocation rate over time and for the duration histograms.
+"""
+rateBins = 50
+durationBins = 20
+
+class IrqProfile():
+    """
+    Profile of one IRQ id.
+    """
+    def __init__(self, irqId, name):
+        self.irqId = irqId
+        self.name = name
+        self.count = 0                  # Number of invocations
+        self.cores = []                 # Cores the IRQ was executed on
+        self.rate = 0.0                 # Average number of invocations per second
+        self.rateOverTime = None        # Invocations per second in each of the rateBins bins of the trace
+        self.duration = None            # Statistics of the durations (see TraceStatistics.summarize())
+        self.histogram = None           # (counts, bin edges) of the durations
+        self.maxDepth = 0               # Maximum nesting depth of the invocations (1 = not nested)
+        self.maxAddedLatency = 0.0      # Longest time a task was preempted by this IRQ (including nested IRQs)
+        self.worstCase = None           # (enter time, exit time, preempted task) of the invocation with the maxAddedLatency
+
+class CoreProfile():
+    """
+    Interrupt load of one core.
+    """
+    def __init__(self, core):
+        self.core = core
+        self.count = 0                  # Number of invocations
+        self.maxDepth = 0               # Maximum nesting depth
+        self.depthCounts = {}           # Nesting depth -> number of invocations at this depth
+        self.busyTime = 0.0             # Time the core executed ISRs
+        self.load = 0.0                 # busyTime / length of the trace
+
+class InterruptProfile():
+    """
+    Result of the interrupt analysis of a trace.
+    """
+    def __init__(self):
+        self.irqs = []                  # IrqProfile of each IRQ id, sorted by id
+        self.cores = []                 # CoreProfile of each core
+        self.edges = None               # Bin edges of IrqProfile.rateOverTime
+
+def pairInvocations(ts, types, cores):
+    """
+    Pairs the ISR_ENTER and ISR_EXIT events (time sorted columns) of all cores.
+    Returns the event indexes of the enters, the event indexes of the matching exits and the nesting depth of each invocation.
+    """
+    enter = types == TraceParserFreeRTOS.TRACE_ISR_ENTER
+    step = np.where(enter, 1, -1)
+    depthBefore = np.zeros(len(ts), dtype=np.int64)
+
+    for core in np.unique(cores).tolist():
+        rows = np.flatnonzero(cores == core)
+        depth = np.cumsum(step[rows])
+        depth = depth - np.minimum(np.minimum.accumulate(depth), 0)     # Reflect at zero: exits at depth 0 are ignored
+        depthBefore[rows] = np.concatenate(([0], depth[:-1]))
+
+    # Depth of the invocation an event belongs to: the depth after an enter, or the depth before an exit.
+    level = np.where(enter, depthBefore + 1, depthBefore)
+    order = np.lexsort((np.arange(len(ts)), level, cores))
+
+    first = order[:-1]
+    second = order[1:]
+    paired = enter[first] & ~enter[second] & (cores[first] == cores[second]) & (level[first] == level[second]) & (level[first] > 0)
+    enters = first[paired]
+    exits = second[paired]
+
+    order = np.argsort(enters, kind='stable')
+    return enters[order], exits[order], level[enters[order]]
+
+def getRunningTasks(events, eventRows, eventIndex):
+    """
+    Returns the id of the task that executed on the core of each of the events (e.g. when an ISR was entered), -1 if no task executed.
+    eventIndex holds the posting lists of the events (see TraceSet.getEventIndex()).
+    """
+    types = events['event_type']
+    cores = events['event_core']
+    result = np.full(len(eventRows), -1, dtype=np.int64)
+
+    switchTypes = [TraceParserFreeRTOS.TRACE_TASK_START_EXEC, TraceParserFreeRTOS.TRACE_TASK_STOP_EXEC, TraceParserFreeRTOS.TRACE_ISR_EXIT_TO_SCHEDULER]
+    for core in np.unique(cores[eventRows]).tolist():
+        coreSwitches = eventIndex.select(types=switchTypes, cores=[core])
+        selected = np.flatnonzero(cores[eventRows] == core)
+        last = np.searchsorted(coreSwitches, eventRows[selected]) - 1     # Last task switch event before the event
+        valid = last >= 0
+        running = np.zeros(len(selected), dtype=np.bool_)
+        running[valid] = types[coreSwitches[last[valid]]] == TraceParserFreeRTOS.TRACE_TASK_START_EXEC
+        result[selected[running]] = events['event_taskId'][coreSwitches[last[running]]]
+    return result
+
+def analyzeInterrupts(traceSet):
+    """
+    Returns the InterruptProfile of the trace set, or None if the trace set has no FreeRTOS events.
+    The result is cached in the trace set.
+    """
+    if traceSet.interruptProfile is None:
+        if traceSet.events is None or traceSet.traceFormat != "FreeRTOS":
+            return None
+
+        events = traceSet.events
+        rows = traceSet.getEventIndex().select(types=[TraceParserFreeRTOS.TRACE_ISR_ENTER, TraceParserFreeRTOS.TRACE_ISR_EXIT, TraceParserFreeRTOS.TRACE_ISR_EXIT_TO_SCHEDULER])
+        ts = events['event_ts'][rows]
+        cores = events['event_core'][rows].astype(np.int64)
+        enters, exits, depth = pairInvocations(ts, events['event_type'][rows], cores)
+
+        irqIds = events['event_irqId'][rows[enters]]
+        start = ts[enters]
+        stop = ts[exits]
+        duration = stop - start
+        core = cores[enters]
+        preempted = getRunningTasks(events, rows[enters], traceSet.getEventIndex())
+
+        traceStart = float(events['event_ts'][0]) if len(events['event_ts']) > 0 else 0.0
+        traceStop = float(events['event_ts'][-1]) if len(events['event_ts']) > 0 else 0.0
+        length = max(traceStop - traceStart, 1e-9)
+        unitsPerSecond = 1e6        # FreeRTOS timestamps are in us
+
+        profile = InterruptProfile()
+        profile.edges = np.linspace(traceStart, traceStop, rateBins + 1)
+        binLength = max((traceStop - traceStart) / rateBins, 1e-9)
+
+        for irqId in np.unique(irqIds).tolist():
+            selected = irqIds == irqId
+            task = traceSet.findById(irqId)
+            irq = IrqProfile(irqId, task.name if task is not None else "IRQ " + str(irqId))
+            irq.count = int(np.count_nonzero(selected))
+            irq.cores = np.unique(core[selected]).tolist()
+            irq.rate = irq.count / length * unitsPerSecond
+            irq.rateOverTime = np.histogram(start[selected], bins=profile.edges)[0] / binLength * unitsPerSecond
+            irq.duration = TraceStatistics.summarize(duration[selected])
+            irq.histogram = np.histogram(duration[selected], bins=durationBins)
+            irq.maxDepth = int(depth[selected].max())
+
+            # A task is delayed by the complete invocation (including nested ISRs) if the ISR interrupted the task directly.
+            direct = np.flatnonzero(selected & (depth == 1) & (preempted >= 0))
+            if len(direct) > 0:
+                worst = direct[np.argmax(duration[direct])]
+                irq.maxAddedLatency = float(duration[worst])
+                irq.worstCase = (float(start[worst]), float(stop[worst]), traceSet.findById(int(preempted[worst])))
+            profile.irqs.append(irq)
+
+        for coreId in np.unique(cores).tolist():
+            selected = core == coreId
+            coreProfile = CoreProfile(coreId)
+            coreProfile.count = int(np.count_nonzero(selected))
+            if coreProfile.count > 0:
+                coreProfile.maxDepth = int(depth[selected].max())
+                levels, counts = np.unique(depth[selected], return_counts=True)
+                coreProfile.depthCounts = dict(zip(levels.tolist(), counts.tolist()))
+                coreProfile.busyTime = float(duration[selected & (depth == 1)].sum())   # Nested ISRs are part of the outer ISR
+                coreProfile.load = coreProfile.busyTime / length
+            profile.cores.append(coreProfile)
+
+        traceSet.interruptProfile = profile
+
+    return traceSet.interruptProfile
+
+def getIrqTable(traceSet):
+    """
+    Returns the column names and the rows (one per IRQ id) of the interrupt profile.
+    """
+    profile = analyzeInterrupts(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["IRQ", "Id", "Cores", "Count", "Rate [1/s]", "Peak Rate [1/s]", "Max Depth", "Max Added Latency [" + unit + "]", "Preempted Task"] + [field + " [" + unit + "]" for field in TraceStatistics.summaryFields]
+    rows = []
+    if profile is None:
+        return columns, rows
+
+    for irq in profile.irqs:
+        preempted = irq.worstCase[2].name if irq.worstCase is not None and irq.worstCase[2] is not None else "-"
+        rows.append([irq.name, irq.irqId, ", ".join(str(core) for core in irq.cores), irq.count, round(irq.rate, 1), round(float(irq.rateOverTime.max()), 1), irq.maxDepth,
+                     round(irq.maxAddedLatency, 1), preempted] + [round(irq.duration[field], 1) for field in TraceStatistics.summaryFields])
+    return columns, rows
+
+def printInterruptProfile(traceSet):
+    """
+    Prints the interrupt load and nesting depth of each core and the duration histogram of each IRQ.
+    """
+    profile = analyzeInterrupts(traceSet)
+    if profile is None:
+        print("No ISR events in the trace.")
+        return
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    for coreProfile in profile.cores:
+        print("Core " + str(coreProfile.core) + ": " + str(coreProfile.count) + " ISR invocations, load " + str(round(100 * coreProfile.load, 2)) + "%, max nesting depth "
+              + str(coreProfile.maxDepth) + " (" + ", ".join("depth " + str(depth) + ": " + str(count) for depth, count in coreProfile.depthCounts.items()) + ")")
+
+    for irq in profile.irqs:
+        counts, edges = irq.histogram
+        print(irq.name + " (" + str(irq.irqId) + ") duration histogram [" + unit + "]:")
+        for count, low, high in zip(counts.tolist(), edges[:-1].tolist(), edges[1:].tolist()):
+            if count > 0:
+                print("\t" + str(round(low, 1)) + " - " + str(round(high, 1)) + ": " + str(count))
@@ -0,0 +1,179 @@
+import csv
+import numpy as np
+import TraceStatistics
+import TraceParserFreeRTOS
+import TraceInterrupts
+
+"""
+Index of the timing issues of a trace: deadline misses, incomplete jobs, response time outliers and deadline misses
+reported by the target (deadlineMiss flag of TRACE_DELAY_UNTIL). The issues of all tasks are sorted by time once, so the
+next or previous issue of any point in time is found with a binary search.
+"""
+
+"""
+Kinds of issues.
+"""
+issueKinds = ('deadline miss', 'incomplete', 'outlier', 'reported miss')
+
+"""
+A response time is an outlier if it is larger than the third quartile plus outlierFactor times the interquartile
+range (at least outlierMinFraction of the median). Only tasks with at least outlierMinJobs complete jobs are checked.
+"""
+outlierFactor = 3.0
+outlierMinFraction = 0.1
+outlierMinJobs = 10
+
+class IssueIndex():
+    """
+    Time sorted issues of a trace. Issue i is shown as the time window [start[i], stop[i]].
+    """
+    def __init__(self, time, start, stop, kind, tasks, jobIds, values):
+        order = np.argsort(time, kind='stable')
+        self.time = np.asarray(time, dtype=np.float64)[order]       # Time of the issue (e.g. the missed deadline)
+        self.start = np.asarray(start, dtype=np.float64)[order]
+        self.stop = np.asarray(stop, dtype=np.float64)[order]
+        self.kind = np.asarray(kind, dtype=np.int8)[order]          # Index in issueKinds
+        self.tasks = [tasks[i] for i in order.tolist()]
+        self.jobIds = np.asarray(jobIds, dtype=np.int64)[order]     # Job id, -1 for issues that are not related to a job
+        self.values = np.asarray(values, dtype=np.float64)[order]   # Response time of the job (NaN if not known)
+
+    def __len__(self):
+        return len(self.time)
+
+    def findNext(self, time):
+        """
+        Returns the index of the first issue after the time, or None if there is none.
+        """
+        index = int(np.searchsorted(self.time, time, side='right'))
+        return index if index < len(self.time) else None
+
+    def findPrevious(self, time):
+        """
+        Returns the index of the last issue before the time, or None if there is none.
+        """
+        index = int(np.searchsorted(self.time, time, side='left')) - 1
+        return index if index >= 0 else None
+
+    def getRows(self):
+        """
+        Returns one row (kind, task name, job id, time, start, stop, response time) per issue.
+        """
+        rows = []
+        for i in range(len(self.time)):
+            rows.append([issueKinds[self.kind[i]], self.tasks[i].name if self.tasks[i] is not None else "-", int(self.jobIds[i]) if self.jobIds[i] >= 0 else "-",
+                         round(float(self.time[i]), 1), round(float(self.start[i]), 1), round(float(self.stop[i]), 1),
+                         round(float(self.values[i]), 1) if not np.isnan(self.values[i]) else "-"])
+        return rows
+
+    def exportCsv(self, filename, unit):
+        """
+        Writes all issues to a CSV file.
+        """
+        with open(filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(getColumns(unit))
+            writer.writerows(self.getRows())
+
+def getColumns(unit):
+    return ["Issue", "Task", "Job", "Time [" + unit + "]", "Start [" + unit + "]", "Stop [" + unit + "]", "Response Time [" + unit + "]"]
+
+def getOutliers(responseTime):
+    """
+    Returns a boolean array that marks the response time outliers (see outlierFactor).
+    """
+    outliers = np.zeros(len(responseTime), dtype=np.bool_)
+    values = responseTime[~np.isnan(responseTime)]
+    if len(values) < outlierMinJobs:
+        return outliers
+
+    q1, median, q3 = np.percentile(values, (25, 50, 75))
+    fence = q3 + max(outlierFactor * (q3 - q1), outlierMinFraction * median)
+    with np.errstate(invalid='ignore'):
+        outliers = responseTime > fence
+    return outliers
+
+def buildIssueIndex(traceSet):
+    """
+    Collects the issues of all user tasks and of the trace events of the trace set.
+    """
+    time = []
+    start = []
+    stop = []
+    kind = []
+    tasks = []
+    jobIds = []
+    values = []
+
+    def add(mask, issueTime, issueKind, task, columns, responseTime):
+        rows = np.flatnonzero(mask)
+        release = columns['job_release'][rows]
+        finish = columns['job_finish'][rows]
+        time.append(issueTime[rows])
+        start.append(release)
+        stop.append(np.where(np.isnan(finish), columns['job_finishMax'][rows], finish))
+        kind.append(np.full(len(rows), issueKinds.index(issueKind)))
+        tasks.extend([task] * len(rows))
+        jobIds.append(columns['job_id'][rows])
+        values.append(responseTime[rows])
+
+    for task in traceSet:
+        if traceSet.getTaskKind(task) != 'user':
+            continue
+        metrics = TraceStatistics.getJobMetrics(task)
+        columns = task.columns
+        responseTime = metrics['responseTime']
+
+        add(metrics['deadlineMiss'], metrics['deadline'], 'deadline miss', task, columns, responseTime)
+        add(columns['job_incomplete'], columns['job_release'], 'incomplete', task, columns, responseTime)
+        add(getOutliers(responseTime), columns['job_finish'], 'outlier', task, columns, responseTime)
+
+    events = traceSet.events
+    if events is not None and traceSet.traceFormat == "FreeRTOS":
+        reported = traceSet.getEventIndex().select(types=[TraceParserFreeRTOS.TRACE_DELAY_UNTIL])
+        reported = reported[events['event_flag'][reported]]
+        ts = events['event_ts'][reported]
+        time.append(ts)
+        start.append(ts)
+        stop.append(ts)
+        kind.append(np.full(len(reported), issueKinds.index('reported miss')))
+        tasks.extend([traceSet.findById(taskId) for taskId in TraceInterrupts.getRunningTasks(events, reported, traceSet.getEventIndex()).tolist()])   # The event has no task id
+        jobIds.append(np.full(len(reported), -1))
+        values.append(np.full(len(reported), np.nan))
+
+    def concatenate(arrays):
+        return np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0)
+
+    stop = [np.where(np.isnan(s), b, s) for s, b in zip(stop, start)]     # Jobs that never executed are shown at their release
+    return IssueIndex(concatenate(time), concatenate(start), concatenate(stop), concatenate(kind), tasks, concatenate(jobIds), concatenate(values))
+
+def encodeIssues(issues, traceSet):
+    """
+    Returns the issue index as columns, e.g. to send it to another process. Tasks are identified by their index in the
+    trace set (-1 if the issue has no task).
+    """
+    return {
+        'issue_time':   issues.time,
+        'issue_start':  issues.start,
+        'issue_stop':   issues.stop,
+        'issue_kind':   issues.kind,
+        'issue_task':   np.asarray([traceSet.index(task) if task is not None else -1 for task in issues.tasks], dtype=np.int64),
+        'issue_jobId':  issues.jobIds,
+        'issue_value':  issues.values,
+    }
+
+def decodeIssues(traceSet, columns):
+    """
+    Rebuilds the issue index from the columns created by encodeIssues() and caches it in the trace set.
+    """
+    tasks = [traceSet[index] if index >= 0 else None for index in columns['issue_task'].tolist()]
+    traceSet.issues = IssueIndex(columns['issue_time'], columns['issue_start'], columns['issue_stop'], columns['issue_kind'],
+                                 tasks, columns['issue_jobId'], columns['issue_value'])
+    return traceSet.issues
+
+def getIssueIndex(traceSet):
+    """
+    Returns the IssueIndex of the trace set. It is built on the first call and cached in the trace set.
+    """
+    if traceSet.issues is None:
+        traceSet.issues = buildIssueIndex(traceSet)
+    return traceSet.issues
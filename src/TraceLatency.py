@@ -0,0 +1,174 @@
+import numpy as np
+import TraceStatistics
+import TraceParserFreeRTOS
+import TraceParserLinux
+
+"""
+Ready-to-run latency analysis.
+A task is ready when it is moved to the ready state (FreeRTOS: TRACE_TASK_START_READY, Linux: WAKE/WAKE_NEW) and
+the ready phase ends when the task starts to execute (FreeRTOS: TRACE_TASK_START_EXEC, Linux: SCHED_IN). If the task
+is moved to the suspended list before it executes (FreeRTOS: TRACE_TASK_STOP_READY), the ready phase is cancelled.
+All transitions are paired in one sweep over the trace events, sorted by task (the events are already sorted by time).
+"""
+
+"""
+Event types used for each trace format: (ready events, start of execution events, cancel events).
+"""
+readyEventTypes = {
+    'FreeRTOS': ((TraceParserFreeRTOS.TRACE_TASK_START_READY,), (TraceParserFreeRTOS.TRACE_TASK_START_EXEC,), (TraceParserFreeRTOS.TRACE_TASK_STOP_READY,)),
+    'Linux':    ((TraceParserLinux.WAKE, TraceParserLinux.WAKE_NEW), (TraceParserLinux.SCHED_IN,), ()),
+}
+
+"""
+Number of worst-case instances listed per trace.
+"""
+worstCaseCount = 100
+
+"""
+Codes of the transitions in the sweep.
+"""
+READY = 0
+EXEC = 1
+CANCEL = 2
+OTHER = 3
+
+class ReadyLatency():
+    """
+    All ready phases of a trace. The arrays hold one entry per ready phase that ended with the start of the execution,
+    sorted by task and time.
+    """
+    def __init__(self):
+        self.taskId = np.zeros(0, dtype=np.int64)
+        self.ready = np.zeros(0)                # Time the task became ready
+        self.start = np.zeros(0)                # Time the task started to execute
+        self.core = np.zeros(0, dtype=np.int64) # Core the task started to execute on
+        self.cancelled = {}                     # Task id -> number of ready phases cancelled before the task executed
+        self.taskRows = {}                      # Task id -> (first, last) rows of the task
+
+    def getLatency(self):
+        return self.start - self.ready
+
+    def getSegments(self, taskId, left, right):
+        """
+        Returns the ready phases (ready, start) of the task that overlap the time window [left, right].
+        """
+        if taskId not in self.taskRows:
+            return []
+        first, last = self.taskRows[taskId]
+        ready = self.ready[first:last]
+        start = self.start[first:last]
+        begin = int(np.searchsorted(start, left, side='right'))    # Ready phases of a task do not overlap, so start is sorted as well
+        end = int(np.searchsorted(ready, right, side='right'))
+        return list(zip(ready[begin:end].tolist(), start[begin:end].tolist()))
+
+def encodeTransitions(types, formatName):
+    """
+    Maps the event types to the transition codes (READY, EXEC, CANCEL or OTHER).
+    """
+    readyTypes, execTypes, cancelTypes = readyEventTypes[formatName]
+    codes = np.full(len(types), OTHER, dtype=np.int8)
+    codes[np.isin(types, readyTypes)] = READY
+    codes[np.isin(types, execTypes)] = EXEC
+    codes[np.isin(types, cancelTypes)] = CANCEL
+    return codes
+
+def analyzeReadyLatency(traceSet):
+    """
+    Returns the ReadyLatency of the trace set, or None if the trace set has no events (e.g. while the trace is still loaded).
+    The result is cached in the trace set.
+    """
+    if traceSet.readyLatency is None:
+        if traceSet.events is None or traceSet.traceFormat not in readyEventTypes:
+            return None
+
+        events = traceSet.events
+        codes = encodeTransitions(events['event_type'], traceSet.traceFormat)
+        selected = np.flatnonzero(codes != OTHER)
+
+        # Sort the transitions by task, the stable sort keeps the time order of each task.
+        order = selected[np.argsort(events['event_taskId'][selected], kind='stable')]
+        taskId = events['event_taskId'][order]
+        code = codes[order]
+        ts = events['event_ts'][order]
+        core = events['event_core'][order]
+
+        n = len(order)
+        sameTaskAsPrevious = np.zeros(n, dtype=np.bool_)
+        sameTaskAsPrevious[1:] = taskId[1:] == taskId[:-1]
+
+        # A ready phase starts with the first READY after a non READY transition of the task (READY events of a task that is already ready are merged).
+        phaseStart = (code == READY) & ~(sameTaskAsPrevious & (np.concatenate(([OTHER], code[:-1])) == READY))
+
+        # Index of the next transition that is not READY (n if there is none).
+        positions = np.where(code != READY, np.arange(n), n)
+        nextNonReady = np.minimum.accumulate(np.concatenate((positions, [n]))[::-1])[::-1][1:]
+
+        starts = np.flatnonzero(phaseStart)
+        ends = nextNonReady[starts]
+        valid = ends < n
+        starts = starts[valid]
+        ends = ends[valid]
+        valid = taskId[ends] == taskId[starts]
+        starts = starts[valid]
+        ends = ends[valid]
+
+        executed = code[ends] == EXEC
+        cancelled = code[ends] == CANCEL
+
+        latency = ReadyLatency()
+        latency.taskId = taskId[starts[executed]]
+        latency.ready = ts[starts[executed]]
+        latency.start = ts[ends[executed]]
+        latency.core = core[ends[executed]].astype(np.int64)
+
+        ids, counts = np.unique(taskId[starts[cancelled]], return_counts=True)
+        latency.cancelled = dict(zip(ids.tolist(), counts.tolist()))
+
+        ids, firstRows, counts = np.unique(latency.taskId, return_index=True, return_counts=True)
+        latency.taskRows = {id: (first, first + count) for id, first, count in zip(ids.tolist(), firstRows.tolist(), counts.tolist())}
+
+        traceSet.readyLatency = latency
+
+    return traceSet.readyLatency
+
+def getLatencyTable(traceSet):
+    """
+    Returns the column names and the rows (one per task and core) of the ready latency distribution.
+    """
+    latency = analyzeReadyLatency(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["Task", "Core", "Count", "Cancelled"] + [field + " [" + unit + "]" for field in TraceStatistics.summaryFields]
+    rows = []
+    if latency is None:
+        return columns, rows
+
+    values = latency.getLatency()
+    for task in traceSet:
+        if task.id not in latency.taskRows:
+            continue
+        first, last = latency.taskRows[task.id]
+        cores = latency.core[first:last]
+        for core in np.unique(cores).tolist():
+            summary = TraceStatistics.summarize(values[first:last][cores == core])
+            rows.append([task.name, core, int(np.count_nonzero(cores == core)), latency.cancelled.get(task.id, 0)] + [round(summary[field], 1) for field in TraceStatistics.summaryFields])
+    return columns, rows
+
+def getWorstCases(traceSet, count=worstCaseCount):
+    """
+    Returns the rows of the ready phases with the largest latency: (task, core, ready time, start time, latency).
+    """
+    latency = analyzeReadyLatency(traceSet)
+    if latency is None or len(latency.ready) == 0:
+        return []
+
+    values = latency.getLatency()
+    count = min(count, len(values))
+    worst = np.argpartition(-values, count - 1)[:count]
+    worst = worst[np.argsort(-values[worst], kind='stable')]
+
+    cases = []
+    for row in worst.tolist():
+        task = traceSet.findById(int(latency.taskId[row]))
+        cases.append((task, int(latency.core[row]), float(latency.ready[row]), float(latency.start[row]), float(values[row])))
+    return cases
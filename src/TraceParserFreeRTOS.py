@@ -1,10 +1,13 @@
-from threading import Thread
 from pathlib import Path
 import io
 from TraceTask import *
+from TraceSet import TraceSet
 import os
 import HelperFunctions
+import ParserWorker
+import TraceEventStore
 import configparser
+import copy
 import sys
 import numpy as np
 
@@ -62,6 +65,38 @@ eventMap = {
     TRACE_MUTEX_GIVE: "TRACE_MUTEX_GIVE"
 }
 
+"""
+The reconstruction processes the trace events in time ordered chunks. The first chunk is small to show
+the beginning of the trace quickly, every following chunk is twice as large (up to maxChunkEvents).
+"""
+firstChunkEvents = 20000
+maxChunkEvents = 1000000
+
+"""
+Number of events between two checkpoints of the reconstruction state (see WindowedTrace).
+"""
+checkpointEvents = 100000
+
+"""
+Traces with larger trace buffers (in bytes) are opened in a windowed parser, which only reconstructs the visible part.
+"""
+windowedViewBytes = 256 << 20
+
+"""
+Ticks are aligned to a grid with this period (in us) to find the start of the trace, ticks within the tolerance count as aligned.
+"""
+tickPeriod_us = 1000
+tickTolerance_us = 50
+
+"""
+Key of the event_value and event_flag columns and of the string of the events, to read the events from an event store.
+"""
+storeDecodeKeys = {
+    'valueKeys': {TRACE_TASK_CREATE: 'priority', TRACE_DELAY_UNTIL: 'timeToWake', TRACE_DELAY: 'delayTime'},
+    'flagKeys': {TRACE_DELAY_UNTIL: 'deadlineMiss'},
+    'nameKey': 'name'
+}
+
 """
 Task ID we use for the scheduler
 """
@@ -74,6 +109,86 @@ every time a color is assigned to a task. The index wraps around if it reaches t
 taskColorIndex = 0
 taskColors = [(100, 237, 157), (100, 143, 237), (212, 237, 76), (237, 123, 100), (141, 100, 237)]
 
+"""
+Event types the reconstruction needs. They are always decoded, FilterSpec.types only selects the other event types.
+"""
+requiredEventTypes = {TRACE_IDLE, TRACE_TASK_START_EXEC, TRACE_TASK_STOP_EXEC, TRACE_TASK_START_READY, TRACE_TASK_CREATE, TRACE_DELAY_UNTIL,
+                      TRACE_ISR_ENTER, TRACE_ISR_EXIT, TRACE_ISR_EXIT_TO_SCHEDULER, TRACE_DELAY, TRACE_TIME_ZERO, TRACE_EVT_GROUP_WAIT,
+                      TRACE_EVT_GROUP_SYNC, TRACE_MUTEX_CREATE}
+
+"""
+Event types that are decoded on all cores. The tick ISRs are needed to find the start of the trace and the ticks of deadline misses.
+"""
+globalEventTypes = {TRACE_TASK_CREATE, TRACE_TIME_ZERO, TRACE_MUTEX_CREATE, TRACE_ISR_ENTER}
+
+"""
+Size in bytes of the payload of each event (after time and event id). TRACE_TASK_CREATE has a name of variable length.
+"""
+payloadSizes = {TRACE_TASK_START_EXEC: 4, TRACE_TASK_STOP_EXEC: 4, TRACE_TASK_START_READY: 4, TRACE_TASK_STOP_READY: 4, TRACE_DELAY_UNTIL: 4,
+                TRACE_ISR_ENTER: 4, TRACE_DELAY: 4, TRACE_EVT_GROUP_WAIT: 4, TRACE_EVT_GROUP_SYNC: 4, TRACE_MUTEX_CREATE: 4,
+                TRACE_MUTEX_TAKE: 4, TRACE_MUTEX_GIVE: 4}
+
+"""
+Returned by EventParser.read_event() for events that are skipped by the filter.
+"""
+skippedEvent = {}
+
+class FilterSpec():
+    """
+    Selection of the trace events that are parsed, to reconstruct only a part of a large trace.
+    taskIds:    IDs of the tasks to reconstruct (TraceTask.id). The tick ISRs and schedulers are always reconstructed.
+    types:      Event types to decode in addition to requiredEventTypes (e.g. TRACE_MUTEX_TAKE). TRACE_MUTEX_TAKE and
+                TRACE_MUTEX_GIVE are only decoded together.
+    cores:      Cores to reconstruct. The tick ISR, the scheduler and the idle task of other cores are removed.
+    start/stop: Time window (in us after t=0) of the events that are reconstructed. Jobs released before the window are
+                not reconstructed, jobs that are not finished at the end of the window are incomplete.
+    The decoder skips events of other types, tasks and cores without creating them. The time window is applied to the
+    sorted events, since t=0 is only known once all tick ISRs are decoded. The ticks before the window are still counted,
+    so deadline misses in the window refer to the same tick as in the complete trace.
+    For traces in an event store the events are not decoded again: the time window is found with a binary search on the
+    sorted timestamps and only the selected tasks are reconstructed, events of other types are kept in the store.
+    """
+    def __init__(self, taskIds=None, types=None, cores=None, start=None, stop=None):
+        self.taskIds = set(taskIds) if taskIds is not None else None
+        if types is None:
+            self.types = set(eventMap)
+        else:
+            self.types = set(types) | requiredEventTypes
+            if TRACE_MUTEX_TAKE in self.types or TRACE_MUTEX_GIVE in self.types:
+                self.types.update((TRACE_MUTEX_TAKE, TRACE_MUTEX_GIVE))
+        self.cores = set(cores) if cores is not None else None
+        self.start = start
+        self.stop = stop
+
+    def keepEvent(self, type, core):
+        """
+        Returns True if the event of this type on the core is decoded.
+        """
+        if type not in self.types and type in eventMap:
+            return False
+        return self.cores is None or core in self.cores or type in globalEventTypes
+
+    def keepTask(self, taskId):
+        """
+        Returns True if the task events (ready, event group, create) of the task are decoded.
+        """
+        return self.taskIds is None or taskId in self.taskIds
+
+    def inWindow(self, ts):
+        return (self.start is None or ts >= self.start) and (self.stop is None or ts <= self.stop)
+
+    def removeTasks(self, tasks, tickIds):
+        """
+        Removes the tick ISR, the scheduler and the idle task of the cores that are not reconstructed.
+        """
+        if self.cores is None:
+            return
+        for core, tickId in enumerate(tickIds):
+            if core not in self.cores:
+                for task in list(tasks):
+                    if task.id == tickId or task.id == schedulerId + core or task.name.lower() == "idle" + str(core):
+                        tasks.remove(task)
+
 def getTaskColor(taskId):
     """
     Function returns the task colors for the trace. The colors are selected in sequence from the list, wrapping around when the end of the list is reached. 
@@ -94,40 +209,58 @@ def getTaskColor(taskId):
 def parseTraceFiles(gui, numCores):
     """
     Main function that is called from the GUI to read the trace files from the target device.
-    To not block the GUI, this is done in a separate thread.
+    To not block the GUI, this is done in a separate worker process. Very large traces (see windowedViewBytes) are not
+    reconstructed completely, the trace view requests the jobs of the visible window from the worker instead.
     """
-    global taskColorIndex
-    global enable_event_print
-
-    #enable_event_print = gui.printEvents_var.get()
+    folderName = HelperFunctions.getViewingFolderName(gui)
+    bufferPaths = [os.path.join(folderName, 'raw_buffer' + str(c) + ".txt") for c in range(0, numCores)]
+    if sum(os.path.getsize(buffer) for buffer in bufferPaths if os.path.isfile(buffer)) > windowedViewBytes:
+        ParserWorker.startWindowedParser(gui, parseRecordingWindowed, (folderName, numCores))
+    else:
+        ParserWorker.startParser(gui, parseRecording, (folderName, numCores))
 
-    taskColorIndex = 0      # Reset the task color index, so we always start with the same task color assignments.
-    thread = Thread(target = parser_thread, args = (gui, numCores))
-    thread.start()
+def parseComparisonFiles(gui, numCores, measurementName, onResult):
+    """
+    Parses another recording of the selected target in a worker process (e.g. to compare it with the loaded trace).
+    onResult is called with the trace set once the recording is parsed.
+    """
+    folderName = HelperFunctions.getViewingFolderName(gui, measurementName)
+    return ParserWorker.ParserJob(gui, parseRecording, (folderName, numCores), onResult, lambda message: HelperFunctions.printState("Parsing failed"))
 
-def parser_thread(gui, numCores):
+def parseRecording(folderName, numCores, filterSpec=None, publish=None):
     """
-    Thread to parse the trace buffers. The trace events are then converted to tasks, jobs and execution segments.
+    Parses the trace buffers of a recording. The trace events are then converted to tasks, jobs and execution segments.
+    Returns the trace set with all tasks and the list of time sorted trace events. If the trace buffers are larger than
+    TraceEventStore.outOfCoreBytes, the events are kept in an event store in the recording folder instead of a list.
+    If a filterSpec is given, only the selected events are parsed (see FilterSpec).
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
     """
+    global taskColorIndex
+
+    taskColorIndex = 0      # Reset the task color index, so we always start with the same task color assignments.
     bufferPaths = []
     
     # Get the tick id for each core from the config file.
-    if gui is not None:
-        #configName = gui.targets[gui.selectedTarget].get('name').replace(' ', '_')    # Get the configuration name
-        configName = "general"
-        config = configparser.ConfigParser()
-        config.read(HelperFunctions.getConfigFilePath())
-        tickIds = [int(x) for x in config.get(configName,'tickId').split(",")]
-    else:
-        tickIds = [15, 42]
+    configName = "general"
+    config = configparser.ConfigParser()
+    config.read(HelperFunctions.getConfigFilePath())
+    tickIds = [int(x) for x in config.get(configName,'tickId', fallback="15,42").split(",")]
 
     for c in range(0,numCores):
-        filename = os.path.abspath(os.path.join(HelperFunctions.getViewingFolderName(gui), 'raw_buffer' + str(c)))
+        filename = os.path.abspath(os.path.join(folderName, 'raw_buffer' + str(c)))
 
         bufferPaths.append(Path(filename + ".txt"))
         if not bufferPaths[-1].is_file():
             print("Error: File " + str(bufferPaths[-1]) + " does not exist!")
 
+    eventFilePath = os.path.abspath(os.path.join(folderName, 'events.txt'))
+
+    if sum(os.path.getsize(buffer) for buffer in bufferPaths if buffer.is_file()) > TraceEventStore.outOfCoreBytes:
+        # The trace is too large to keep all events in memory (and to print a hexdump of the buffers)
+        tasks, events = parserOutOfCore(bufferPaths, os.path.join(folderName, 'eventstore'), eventFilePath, tickIds, publish, filterSpec)
+        tasks.origin = folderName
+        return tasks, events
+
     allBuffers = []
     core = 0
     for buffer in bufferPaths:
@@ -136,37 +269,123 @@ def parser_thread(gui, numCores):
         allBuffers.append(traceBuffer)
         
         HelperFunctions.printState("Loaded trace buffer: ", info=str(buffer))
-        HelperFunctions.hexdump(traceBuffer, base_addr=int(config.get(configName, "buffer"+str(core), fallback="0x00000000"),16))
+        if filterSpec is None:      # A filtered parse only selects a part of the trace, the buffers are not printed
+            HelperFunctions.hexdump(traceBuffer, base_addr=int(config.get(configName, "buffer"+str(core), fallback="0x00000000"),16))
         core = core + 1
 
-    eventFilePath = os.path.abspath(os.path.join(HelperFunctions.getViewingFolderName(gui), 'events.txt'))
-    tasks = parser(allBuffers, eventFilePath, tickIds)    # Parse the content of the trace buffers
+    events = []
+    tasks = parser(allBuffers, eventFilePath, tickIds, events, publish, filterSpec)    # Parse the content of the trace buffers
+    tasks.origin = folderName
 
-    # If this was called from the GUI, enable the buttons and update the GUI
-    if gui is not None:
-        gui.btn_loadTrace.configure(state="normal")
-        gui.traceView.setTasks(tasks)
-        gui.traceView.draw()
-        gui.update()
+    return tasks, events
 
-def parser(buffers, eventFilePath, tickIds):
+def parser(buffers, eventFilePath, tickIds, sortedEvents=None, publish=None, filterSpec=None):
     """
     Function parses a variable number of trace buffers.
     Trace events are then converted to tasks, jobs and execution segments.
-    The function returns an array with all trace tasks.
+    The function returns a trace set with all trace tasks.
+    If sortedEvents is a list, the time sorted trace events are added to it.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
+    If filterSpec is given, only the selected events are decoded and reconstructed (see FilterSpec).
     """
     HelperFunctions.printHeader("parsing files")
 
     events = []
-    parseTraceEvents(events, buffers)       # Parse the raw events from the trace files of each core
+    parseTraceEvents(events, buffers, filterSpec)       # Parse the raw events from the trace files of each core
 
-    allTasks = []
-    allTasks = extractTraceInfo(events, eventFilePath, tickIds)     # Parse all trace tasks from the event trace (afterwards we have trace tasks, jobs and execution segments). 
-    tasks = []
-    
-    for task in allTasks:                   # Some tasks might be created in the trace but never execute. We exclue those here. 
-        if len(task.jobs) != 0:
-            tasks.append(task)
+    allTasks = extractTraceInfo(events, eventFilePath, tickIds, sortedEvents, publish, filterSpec)     # Parse all trace tasks from the event trace (afterwards we have trace tasks, jobs and execution segments). 
+    return selectTasks(allTasks)
+
+def parserOutOfCore(bufferPaths, storeFolder, eventFilePath, tickIds, publish=None, filterSpec=None):
+    """
+    Parses trace buffers that are too large to keep all events in memory. The events are decoded into an event store
+    (or an existing store of the same buffers is used), the reconstruction reads the time sorted events window by window.
+    If filterSpec is given, only its tasks and the events of its time window are reconstructed (see FilterSpec).
+    Returns the trace set with all tasks and the event store (or the EventWindow of the time window).
+    """
+    HelperFunctions.printHeader("parsing files")
+
+    store = openEventStore(bufferPaths, storeFolder, tickIds)
+    tasks, mutex_id_to_letter = createStoreTasks(store, tickIds, filterSpec)
+
+    first = 0
+    last = len(store)
+    tickTs = None
+    if filterSpec is not None and (filterSpec.start is not None or filterSpec.stop is not None):
+        ts = store.getColumns()['event_ts']
+        if filterSpec.start is not None:
+            first = int(np.searchsorted(ts, filterSpec.start, side='left'))
+        if filterSpec.stop is not None:
+            last = int(np.searchsorted(ts, filterSpec.stop, side='right'))
+        last = max(first, last)
+
+        # Deadline misses refer to the ticks since the start of the trace, so the ticks before the window are kept.
+        ticks = store.getEventIndex().select(types=[TRACE_ISR_ENTER], irqIds=[tickIds[0]], last=first)
+        tickTs = [0] + ts[ticks].astype(np.int64).tolist()
+
+    sortedEvents = TraceEventStore.EventWindow(store, first, last)
+    executionParser(sortedEvents, tasks, tickIds, mutex_id_to_letter, publish, tickTs)
+    writeEventFile(sortedEvents, eventFilePath)
+
+    return selectTasks(tasks), store if sortedEvents.isComplete() else sortedEvents
+
+def parseRecordingWindowed(folderName, numCores, interval=None):
+    """
+    Opens a recording for the reconstruction of time windows (see WindowedTrace). The events are decoded into the event
+    store of the recording (as for large traces), the trace is not reconstructed yet.
+    Returns the WindowedTrace, the jobs of a time window are reconstructed with getWindow(start, stop).
+    interval is the number of events between two checkpoints (checkpointEvents if None).
+    """
+    global taskColorIndex
+
+    taskColorIndex = 0      # Same task colors as parseRecording()
+
+    config = configparser.ConfigParser()
+    config.read(HelperFunctions.getConfigFilePath())
+    tickIds = [int(x) for x in config.get("general", 'tickId', fallback="15,42").split(",")]
+    bufferPaths = [Path(os.path.abspath(os.path.join(folderName, 'raw_buffer' + str(c) + ".txt"))) for c in range(0, numCores)]
+
+    HelperFunctions.printHeader("parsing files")
+
+    store = openEventStore(bufferPaths, os.path.join(folderName, 'eventstore'), tickIds)
+    tasks, mutex_id_to_letter = createStoreTasks(store, tickIds)
+
+    return WindowedTrace(TraceEventStore.EventWindow(store), tasks, tickIds, mutex_id_to_letter, interval)
+
+def openEventStore(bufferPaths, storeFolder, tickIds):
+    """
+    Returns the event store of the trace buffers. An existing store is used if it was created from the same buffers.
+    """
+    source = {'buffers': TraceEventStore.getSource(bufferPaths), 'tickIds': tickIds}
+    store = TraceEventStore.openStore(storeFolder, source)
+    if store is None:
+        store = storeTraceEvents(bufferPaths, storeFolder, tickIds, source)
+    else:
+        HelperFunctions.printState("Using event store: ", info=storeFolder)
+    return store
+
+def createStoreTasks(store, tickIds, filterSpec=None):
+    """
+    Creates the tasks and the mutex letters of the trace from the information of the event store.
+    If filterSpec is given, only the tasks it selects are created (as if the other events were not decoded).
+    """
+    if filterSpec is None:
+        tasks = createTasks(tickIds, store.info['taskCreates'])
+    else:
+        tasks = createTasks(tickIds, [create for create in store.info['taskCreates'] if filterSpec.keepTask(create[0])])
+        filterSpec.removeTasks(tasks, tickIds)
+
+    mutex_id_to_letter: dict[int, str] = {}
+    for id in store.info['mutexIds']:
+        map_mutex_id(mutex_id_to_letter, id)
+
+    return tasks, mutex_id_to_letter
+
+def selectTasks(allTasks):
+    """
+    Returns the tasks that have jobs in the trace and prints them.
+    """
+    tasks = allTasks.select(lambda task: len(task.jobs) != 0)   # Some tasks might be created in the trace but never execute. We exclue those here. 
 
     HelperFunctions.printState("Found trace data for tasks:")
     for task in tasks:                      # Print a list with parsed tasks and the number of jobs they have in the trace.
@@ -175,12 +394,113 @@ def parser(buffers, eventFilePath, tickIds):
 
     return tasks
 
-def extractTraceInfo(events, eventFilePath, tickIds):
+def createTasks(tickIds, taskCreates):
+    """
+    Creates the trace set with the tick ISR and the scheduler of each core and a task for each (id, name, priority) in taskCreates.
+    """
+    tasks = TraceSet(traceFormat="FreeRTOS", tickIds=tickIds, mutexTable=MutexAccessTable())
+
+    # Create tasks to represent the scheduler, tick ISR for each core.
+    if len(tickIds) == 1:
+        # Exclude the core in the name if there is only one core
+        tasks.append(TraceTask(tickIds[0], "Tick", None, getTaskColor(tickIds[0])))
+        tasks.append(TraceTask(schedulerId, "Scheduler", None, getTaskColor(schedulerId)))
+    else:
+        coreId = 0
+        for id in tickIds:
+            tasks.append(TraceTask(id, "Tick Core " + str(coreId), None, getTaskColor(id)))
+            tasks.append(TraceTask(schedulerId + coreId, "Scheduler Core " + str(coreId), None, getTaskColor(schedulerId + coreId)))
+            coreId = coreId + 1
+
+    for id, name, prio in taskCreates:
+        tasks.append(TraceTask(id, name, prio, getTaskColor(id)))
+
+    return tasks
+
+def storeTraceEvents(bufferPaths, storeFolder, tickIds, source):
+    """
+    Decodes the trace buffers into a new event store. The buffers are read from the files and the events are appended in
+    chunks, so only one chunk of events is in memory. The information needed before the reconstruction (start of the trace,
+    created tasks and mutexes) is collected while decoding, missing ISR enter events are added as in extractTraceInfo().
+    """
+    store = TraceEventStore.EventStore(storeFolder, create=True, intTime=True, decodeKeys=storeDecodeKeys, source=source)
+
+    traceStart = None
+    timeZero = False
+    lastIrqTs = None
+    taskCreates = []
+    mutexIds = []
+    residueCounts = np.zeros(tickPeriod_us, dtype=np.int64)
+    firstTick = None
+    tickTimes = []
+    prevTaskEvt = None
+    prevIrqEvt = None
+    chunk = []
+
+    for coreId, buffer in enumerate(bufferPaths):
+        HelperFunctions.printState("Reading events of core " + str(coreId))
+
+        with open(buffer, "rb") as fh:
+            parser = EventParser(fh, printEvents=False)     # Large traces are not printed (as their hexdump)
+
+            while True:
+                evt = parser.read_event(coreId)
+                if evt is None:
+                    break
+                type = evt.get('type')
+
+                if type == TRACE_TIME_ZERO and not timeZero:    # The trace starts at the last tick before the first TRACE_TIME_ZERO
+                    timeZero = True
+                    traceStart = lastIrqTs
+                elif type == TRACE_ISR_ENTER:
+                    if evt.get('irqId') == 15:
+                        lastIrqTs = evt.get('ts')
+                    if evt.get('irqId') == tickIds[0]:
+                        tickTimes.append(evt.get('ts'))
+                elif type == TRACE_TASK_CREATE:
+                    taskCreates.append((evt.get('taskId'), evt.get('name').split('\x00', 1)[0], evt.get('priority')))
+                elif type == TRACE_MUTEX_CREATE:
+                    if evt.get('mutexId') not in mutexIds:
+                        mutexIds.append(evt.get('mutexId'))
+
+                if (type == TRACE_ISR_EXIT) or (type == TRACE_ISR_EXIT_TO_SCHEDULER):
+                    if prevIrqEvt is not None and ((prevIrqEvt.get('type') == TRACE_ISR_EXIT) or (prevIrqEvt.get('type') == TRACE_ISR_EXIT_TO_SCHEDULER)):
+                        chunk.append({'type':TRACE_ISR_ENTER, 'ts':prevTaskEvt.get('ts')-1, 'core':prevTaskEvt.get('core'), 'irqId':tickIds[prevTaskEvt.get('core')]})
+                chunk.append(evt)
+
+                if (type == TRACE_TASK_START_EXEC) or (type == TRACE_TASK_START_READY):
+                    prevTaskEvt = evt
+                elif (type == TRACE_ISR_ENTER) or (type == TRACE_ISR_EXIT) or (type == TRACE_ISR_EXIT_TO_SCHEDULER):
+                    prevIrqEvt = evt
+
+                if len(chunk) >= TraceEventStore.windowEvents:
+                    store.append(chunk)
+                    chunk = []
+                    if len(tickTimes) > 0:
+                        firstTick = tickTimes[0] if firstTick is None else firstTick
+                        residueCounts = residueCounts + np.bincount(np.asarray(tickTimes, dtype=np.int64) % tickPeriod_us, minlength=tickPeriod_us)
+                        tickTimes = []
+
+    store.append(chunk)
+    if len(tickTimes) > 0:
+        firstTick = tickTimes[0] if firstTick is None else firstTick
+        residueCounts = residueCounts + np.bincount(np.asarray(tickTimes, dtype=np.int64) % tickPeriod_us, minlength=tickPeriod_us)
+
+    if traceStart is None:
+        traceStart = getTickOrigin(residueCounts, firstTick)
+
+    HelperFunctions.printState("Sorting " + str(len(store)) + " events")
+    store.finish(traceStart, {'taskCreates': taskCreates, 'mutexIds': mutexIds})
+    return store
+
+def extractTraceInfo(events, eventFilePath, tickIds, sortedEventsOut=None, publish=None, filterSpec=None):
     """ 
     Extract trace information from the raw trace events. So we have information on task-level.
+    If sortedEventsOut is a list, the time sorted events used for the reconstruction are added to it.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
+    If filterSpec is given, the tasks of other cores and the events outside of its time window are removed.
+    Returns a trace set with all tasks.
     """
-    tasks = []
-
     traceStart = None
 
     # Check if there is a TRACE_TIME_ZERO. If so, set trace start (i.e. t=0) to the first tick before the event.
@@ -200,31 +520,23 @@ def extractTraceInfo(events, eventFilePath, tickIds):
     if traceStart is None:
         traceStart = getTickStart(events, tickIds[0])
 
-    # Create tasks to represent the scheduler, tick ISR for each core.
-    if len(tickIds) == 1:
-        # Exclude the core in the name if there is only one core
-        tasks.append(TraceTask(tickIds[0], "Tick", None, getTaskColor(tickIds[0])))
-        tasks.append(TraceTask(schedulerId, "Scheduler", None, getTaskColor(schedulerId)))
-    else:
-        coreId = 0
-        for id in tickIds:
-            tasks.append(TraceTask(id, "Tick Core " + str(coreId), None, getTaskColor(id)))
-            tasks.append(TraceTask(schedulerId + coreId, "Scheduler Core " + str(coreId), None, getTaskColor(schedulerId + coreId)))
-            coreId = coreId + 1
-
     # All other tasks are parsed from the trace events. 
+    taskCreates = []
     for evt in events:
         if evt.get('type') is TRACE_TASK_CREATE:    # Parse all task create events and create trace tasks for each.
             id = evt.get('taskId')
             prio = evt.get('priority')
             #name = evt.get('name').split('\\')[0]
             name = evt.get('name').split('\x00', 1)[0]
-            tmpTask = TraceTask(id, name, prio, getTaskColor(id))
-            tasks.append(tmpTask)
+            taskCreates.append((id, name, prio))
         if evt.get('type') is TRACE_TASK_START_READY:   # We set the trace time t=0 to the first task ready event (if no TRACE_TIME_ZERO event was found).
             if traceStart is None:
                 traceStart = evt.get('ts')  # By convention we set the start of the first task to t=0
 
+    tasks = createTasks(tickIds, taskCreates)
+    if filterSpec is not None:
+        filterSpec.removeTasks(tasks, tickIds)
+
     # Parse all mutex create events to map each mutex ID to a letter (max. 26 mutexes).
     mutex_id_to_letter: dict[int, str] = {}
     for evt in events:
@@ -232,8 +544,6 @@ def extractTraceInfo(events, eventFilePath, tickIds):
             id = evt.get('mutexId')
             map_mutex_id(mutex_id_to_letter, id)
 
-    eventFile = open(eventFilePath, 'w')
-    
     # Prepare all events sorted by time to be processed by the state machine parser.
     allEvents = []
 
@@ -256,19 +566,39 @@ def extractTraceInfo(events, eventFilePath, tickIds):
 
     sortedEvents = sorted(allEvents, key=lambda d: d['ts'])    # Sort all events of this task by timestamp. Since timestamps on cores are synchronised this can be done. Attention, if the platform does not support this!
 
-    for evt in sortedEvents:
-        if traceStart is not None:
+    if traceStart is not None:
+        for evt in sortedEvents:
             evt['ts'] = evt['ts'] - traceStart
-        eventFile.write('\tts: ' + "%06.3f" % (evt.get('ts')/1000) + "ms\t" + eventMap.get(evt.get('type')) + ":  " + str(evt) + "\n")
 
-    executionParser(sortedEvents, tasks, tickIds, mutex_id_to_letter)
+    tickTs = None
+    if filterSpec is not None and (filterSpec.start is not None or filterSpec.stop is not None):
+        # Deadline misses refer to the ticks since the start of the trace, so the ticks before the window are kept.
+        tickTs = [0]
+        if filterSpec.start is not None:
+            tickTs.extend(evt['ts'] for evt in sortedEvents if evt['ts'] < filterSpec.start and evt['type'] == TRACE_ISR_ENTER and evt.get('irqId') == tickIds[0])
+        sortedEvents = [evt for evt in sortedEvents if filterSpec.inWindow(evt['ts'])]
+
+    if sortedEventsOut is not None:
+        sortedEventsOut.extend(sortedEvents)
+
+    executionParser(sortedEvents, tasks, tickIds, mutex_id_to_letter, publish, tickTs)
    #->  smParser(traceStart, sortedEvents, tasks, len(tickIds))
 
-    eventFile.close()
-    HelperFunctions.printState("Wrote event file to: ", info=eventFilePath)
+    # The event file is written after the reconstruction, so the first chunks of the trace can be shown earlier.
+    writeEventFile(sortedEvents, eventFilePath)
 
     return tasks
 
+def writeEventFile(sortedEvents, eventFilePath):
+    """
+    Writes the time sorted events to the event file.
+    """
+    eventFile = open(eventFilePath, 'w')
+    for evt in sortedEvents:
+        eventFile.write('\tts: ' + "%06.3f" % (evt.get('ts')/1000) + "ms\t" + eventMap.get(evt.get('type')) + ":  " + str(evt) + "\n")
+    eventFile.close()
+    HelperFunctions.printState("Wrote event file to: ", info=eventFilePath)
+
 def map_mutex_id(mutex_map, mutex_id: int) -> str | None:
     """
     Function maps a mutex id to letters A to Z. If 26 IDs are already mapped, the function returns NULL.
@@ -289,43 +619,317 @@ def map_mutex_id(mutex_map, mutex_id: int) -> str | None:
     mutex_map[mutex_id] = letter
     return letter
 
-def executionParser(sortedEvents, tasks, tickIds, mutex_id_to_letter):
+class TaskParserState():
+    """
+    State of the reconstruction of one task. The state is kept outside of the parse functions,
+    so the trace events can be processed in time ordered chunks. Jobs that are still open at the end
+    of a chunk (task.currentJob) are carried over to the next chunk together with this state.
+    """
+    def __init__(self):
+        self.finishJob = False          # Flag to indicate that the job is about to finish.
+        self.deadlineMiss = False       # Flag to indicate that a deadline was missed.
+        self.startExecCore = None       # Task started to execute on this core.
+        self.lastExecTask = None        # Keep track of the last task started on the core.
+        self.tickTs = [0]               # We keep track if tick timestamps to be able to handle deadline misses. By default the first tick appears at t=0
+        self.missedDeadlineAt = None    # Record the tick at which the release should have happened after a deadline miss.
+        self.enterCore = None           # Core on which the ISR was entered (only used for ISR tasks).
+
+class CheckpointTask(TraceTask):
+    """
+    Task of the reconstruction between two checkpoints (see WindowedTrace). Finished jobs are only counted and not kept,
+    the jobs are numbered as in a full parse.
+    """
+    __slots__ = ('jobCount',)
+
+    def __init__(self, id, name, priority, color, jobCount=0):
+        super().__init__(id, name, priority, color)
+        self.jobCount = jobCount    # Number of finished jobs
+
+    def newJob(self, releaseTime, deadline):
+        assert self.currentJob == None
+        self.currentJob = TraceJob(self, self.jobCount, releaseTime, deadline)
+
+    def finishJob(self):
+        assert self.currentJob != None
+        self.jobCount = self.jobCount + 1
+        self.currentJob = None
+
+    def finishJobIncomplete(self):
+        self.finishJob()
+
+class ParserCheckpoint():
+    """
+    Reconstruction state of all tasks (CheckpointTasks) before the event sortedEvents[index]: the number of finished jobs,
+    a copy of the open job (with its active interval and held mutexes) and a copy of the TaskParserState of each task.
+    The tick timestamps of the states are not copied, only their number is kept (see WindowedTrace.ticks).
+    """
+    def __init__(self, index, tasks, states):
+        self.index = index
+        self.jobCounts = [task.jobCount for task in tasks]
+        self.jobs = [task.currentJob.copy(None) if task.currentJob is not None else None for task in tasks]
+        self.states = []
+        self.tickCounts = []
+        for state in states:
+            self.states.append(copy.copy(state))
+            self.states[-1].tickTs = None
+            self.tickCounts.append(len(state.tickTs))
+
+    def restore(self, tasks, ticks):
+        """
+        Sets the open jobs of the tasks to copies of the saved jobs and returns copies of the saved states.
+        """
+        states = []
+        for task, job, state, tickCount in zip(tasks, self.jobs, self.states, self.tickCounts):
+            task.currentJob = job.copy(task) if job is not None else None
+            states.append(copy.copy(state))
+            states[-1].tickTs = ticks[:tickCount]
+        return states
+
+class WindowedTrace():
+    """
+    Reconstruction of a trace on demand for time windows. The trace is not parsed when it is opened: the tasks that have
+    jobs are found with the posting lists of the events, and checkpoints of the reconstruction state are saved every
+    interval events (checkpointEvents if None) the first time the reconstruction passes them. Between two checkpoints
+    the finished jobs are only counted (see CheckpointTask).
+    getWindow() continues the reconstruction from the last checkpoint before the window, so only the events around the
+    window (and the events up to the window that were never parsed) are parsed. The jobs of the window are identical to
+    the jobs of a full parse (including the job ids).
+    """
+    def __init__(self, sortedEvents, tasks, tickIds, mutex_id_to_letter, interval=None):
+        if interval is None:
+            interval = checkpointEvents
+        self.sortedEvents = sortedEvents
+        self.tickIds = tickIds
+        self.mutex_id_to_letter = mutex_id_to_letter
+        self.interval = interval
+        self.columns = TraceEventStore.getEventColumns(sortedEvents)
+        self.eventIndex = TraceEventStore.getEventIndex(sortedEvents, self.columns)
+        self.taskInfo = [(task.id, task.name, task.priority, task.taskColor) for task in tasks]
+
+        # The chunks end at every checkpoint and at the windows of an event store, so each window is decoded once per chunk
+        bounds = set(range(0, len(sortedEvents), interval))
+        bounds.update(first for first, last in TraceEventStore.getChunkRanges(sortedEvents, interval, interval))
+        bounds = sorted(bounds) + [len(sortedEvents)]
+        self.ranges = list(zip(bounds[:-1], bounds[1:]))
+
+        allTasks = list(tasks)
+        self.ticks = [0]
+        self.checkpoints = [ParserCheckpoint(0, [CheckpointTask(*info) for info in self.taskInfo], [TaskParserState() for task in allTasks])]
+
+        # Select the tasks as parser() does after the reconstruction
+        if not self.executesOnCore1(allTasks):
+            removeCore1Tasks(tasks, tickIds)
+        self.selected = [i for i, task in enumerate(allTasks) if task in tasks and self.hasJobs(task)]
+
+    def hasJobs(self, task):
+        """
+        Returns True if a full parse creates jobs of the task (see the parse functions): a job of an idle task starts with
+        each idle event of its core, a job of the scheduler when the scheduler is entered (and it finishes once a task or the
+        idle task starts), a job of an ISR at the ISR entry (and it finishes at the next ISR exit on the core) and a job of a
+        task when it becomes ready.
+        """
+        index = self.eventIndex
+        if "idle" in task.name.lower():
+            return len(index.select(types=[TRACE_IDLE], cores=[int(task.name[len("IDLE"):])])) > 0
+        elif 100 <= task.id <= len(self.tickIds) + 100:    # scheduler IDs
+            entered = index.select(types=[TRACE_ISR_EXIT_TO_SCHEDULER, TRACE_TASK_STOP_EXEC], cores=[task.id - 100])
+            return len(entered) > 0 and len(index.select(types=[TRACE_IDLE, TRACE_TASK_START_EXEC], cores=[task.id - 100], first=int(entered[0]) + 1)) > 0
+        elif task.id in self.tickIds:
+            entered = index.select(types=[TRACE_ISR_ENTER], irqIds=[task.id])
+            if len(entered) == 0:
+                return False
+            core = int(self.columns['event_core'][entered[0]])
+            return len(index.select(types=[TRACE_ISR_EXIT, TRACE_ISR_EXIT_TO_SCHEDULER], cores=[core], first=int(entered[0]) + 1)) > 0
+        return len(index.select(types=[TRACE_TASK_START_READY], taskIds=[task.id])) > 0
+
+    def executesOnCore1(self, tasks):
+        """
+        Returns True if a user task executes on core 1, i.e. it is started on core 1 after its first release.
+        """
+        for task in tasks:
+            if isUserTask(task, self.tickIds):
+                released = self.eventIndex.select(types=[TRACE_TASK_START_READY], taskIds=[task.id])
+                if len(released) > 0 and len(self.eventIndex.select(types=[TRACE_TASK_START_EXEC], taskIds=[task.id], cores=[1], first=int(released[0]))) > 0:
+                    return True
+        return False
+
+    def getBounds(self):
+        """
+        Returns the timestamps of the first and the last event.
+        """
+        ts = self.columns['event_ts']
+        if len(ts) == 0:
+            return None, None
+        return ts[0].item(), ts[-1].item()
+
+    def parseRange(self, tasks, states, first, last, mutex_id_to_letter):
+        """
+        Continues the reconstruction of all tasks with the events sortedEvents[first:last].
+        """
+        for task, state in zip(tasks, states):
+            parseChunk(self.sortedEvents, task, state, self.tickIds, mutex_id_to_letter, first, last, self.eventIndex)
+
+    def getCheckpoint(self, index):
+        """
+        Returns the checkpoint before the event sortedEvents[index * interval]. The missing checkpoints up to it are saved
+        by continuing the reconstruction from the last saved checkpoint.
+        """
+        if index < len(self.checkpoints):
+            return self.checkpoints[index]
+
+        checkpoint = self.checkpoints[-1]
+        tasks = [CheckpointTask(*info, jobCount=jobCount) for info, jobCount in zip(self.taskInfo, checkpoint.jobCounts)]
+        states = checkpoint.restore(tasks, self.ticks)
+        mutex_id_to_letter = dict(self.mutex_id_to_letter)
+
+        for first, last in self.ranges:
+            if first < checkpoint.index:
+                continue
+            if first % self.interval == 0 and first > checkpoint.index:
+                self.checkpoints.append(ParserCheckpoint(first, tasks, states))
+                if len(self.checkpoints) > index:
+                    break
+            self.parseRange(tasks, states, first, last, mutex_id_to_letter)
+
+        self.ticks = max([self.ticks] + [state.tickTs for state in states], key=len)
+        HelperFunctions.printState("Saved " + str(len(self.checkpoints)) + " checkpoints")
+        return self.checkpoints[index]
+
+    def getWindow(self, start, stop):
+        """
+        Returns a trace set with the jobs of all tasks that are released before stop and finish after start.
+        The jobs have the ids of the complete trace, the job lists of the tasks only hold the jobs of the window.
+        """
+        first = int(np.searchsorted(self.columns['event_ts'], start, side='left'))
+        checkpoint = self.getCheckpoint(min(first, max(len(self.sortedEvents) - 1, 0)) // self.interval)
+
+        tasks = [TraceTask(id, name, priority, color) for id, name, priority, color in self.taskInfo]
+        states = checkpoint.restore(tasks, self.ticks)
+        restored = [task.currentJob for task in tasks]
+
+        mutex_id_to_letter = dict(self.mutex_id_to_letter)
+        for first, last in self.ranges:
+            if first < checkpoint.index:
+                continue
+            self.parseRange(tasks, states, first, last, mutex_id_to_letter)
+
+            # Continue until all jobs that are released in the window are finished
+            if self.columns['event_ts'][last - 1] > stop and all(task.currentJob is None or task.currentJob.releaseTime > stop for task in tasks):
+                break
+
+        window = TraceSet(traceFormat="FreeRTOS", tickIds=self.tickIds)
+        for i in self.selected:
+            task = tasks[i]
+            for job in task.jobs:
+                if job is not restored[i]:
+                    job.id = job.id + checkpoint.jobCounts[i]   # Jobs after the checkpoint continue the numbering of the full trace
+            task.jobs = [job for job in task.jobs if job.releaseTime <= stop and (job.getFinishTime() if job.getFinishTime() is not None else job.releaseTime) >= start]
+            task.currentJob = None
+            window.append(task)
+        return window
+
+def executionParser(sortedEvents, tasks, tickIds, mutex_id_to_letter, publish=None, tickTs=None):
+    """
+    Reconstructs the execution of all tasks from the time sorted trace events. Each task only parses its own events
+    and the events that change its state (see getTaskEvents()).
+    The events are processed in time ordered chunks. After each chunk the tasks are passed to publish() (if given), 
+    so the part of the trace that is already reconstructed can be displayed while the rest is parsed.
+    If the events start after the beginning of the trace (e.g. a time window), tickTs holds the tick timestamps before the first event.
+    """
 
     # This hardcodes that there are 2 cores, should be generalized!
     core1Flag = False
 
-    for task in tasks:
+    states = [TaskParserState() for task in tasks]
+    if tickTs is not None:
+        for state in states:
+            state.tickTs = list(tickTs)
+    tasks.events = TraceEventStore.getEventColumns(sortedEvents)     # The event columns of the trace set are also used for the posting lists
+    tasks.eventIndex = TraceEventStore.getEventIndex(sortedEvents, tasks.events)
 
-        if "idle" in task.name.lower():
-            parseIdleTask(sortedEvents, task)
-        elif 100 <= task.id <= len(tickIds) + 100:    # scheduler IDs
-            parseScheduler(sortedEvents, task)
-        elif task.id in tickIds:
-            parseIrq(sortedEvents, task)
-        else:
-            parseTask(sortedEvents, task, mutex_id_to_letter, tickIds[0])
+    for first, last in TraceEventStore.getChunkRanges(sortedEvents, firstChunkEvents, maxChunkEvents):
+        for task, state in zip(tasks, states):
+            parseChunk(sortedEvents, task, state, tickIds, mutex_id_to_letter, first, last, tasks.eventIndex)
+
+        if publish is not None and last < len(sortedEvents):
+            publish(tasks)
+
+    for task in tasks:
+        if isUserTask(task, tickIds):
             for job in task.jobs:
                 for execInterval in job.execIntervals:
                     if execInterval.core == 1:
                         core1Flag = True
 
     if core1Flag == False:  # No user task executes on core 1
-        # Remove scheduler core 1 and tick core 1 from the data (since they don't affect the schedule on core 0 and there are no user tasks on core 1)
-        toRemove = []
-        for task in tasks:
-            if "idle1" in task.name.lower():
-                toRemove.append(task)
-            elif task.id == tickIds[1]:
-                toRemove.append(task)
-            elif task.id == schedulerId + 1:
-                toRemove.append(task)
-        tasks[:] = [x for x in tasks if x not in toRemove]
+        removeCore1Tasks(tasks, tickIds)
+
+def removeCore1Tasks(tasks, tickIds):
+    """
+    Removes the idle task, scheduler and tick of core 1 (used if no user task executes on core 1).
+    """
+    # Remove scheduler core 1 and tick core 1 from the data (since they don't affect the schedule on core 0 and there are no user tasks on core 1)
+    for task in tasks:
+        if "idle1" in task.name.lower():
+            tasks.remove(task)
+        elif task.id == tickIds[1]:
+            tasks.remove(task)
+        elif task.id == schedulerId + 1:
+            tasks.remove(task)
+
+def isUserTask(task, tickIds):
+    """
+    Returns True if the task is neither an idle task, a scheduler or a tick ISR.
+    """
+    if "idle" in task.name.lower():
+        return False
+    elif 100 <= task.id <= len(tickIds) + 100:    # scheduler IDs
+        return False
+    elif task.id in tickIds:
+        return False
+    return True
+
+def parseChunk(sortedEvents, task, state, tickIds, mutex_id_to_letter, first, last, eventIndex=None):
+    """
+    Parses the events sortedEvents[first:last] for the given task with the matching parse function.
+    If the posting lists of the events (eventIndex) are given, only the events of the task are parsed (see getTaskEvents()).
+    """
+    positions = getTaskEvents(eventIndex, task, tickIds, first, last) if eventIndex is not None else None
+
+    if "idle" in task.name.lower():
+        parseIdleTask(sortedEvents, task, state, first, last, positions)
+    elif 100 <= task.id <= len(tickIds) + 100:    # scheduler IDs
+        parseScheduler(sortedEvents, task, state, first, last, positions)
+    elif task.id in tickIds:
+        parseIrq(sortedEvents, task, state, first, last, positions)
+    else:
+        parseTask(sortedEvents, task, mutex_id_to_letter, tickIds[0], state, first, last, positions)
+
+def getTaskEvents(eventIndex, task, tickIds, first, last):
+    """
+    Returns the positions (first <= p < last) of the events that the parse function of the task reacts to: the events
+    of the own core for idle tasks and schedulers, the ISR events for tick ISRs, and for other tasks their own events and
+    the events that are assigned to the task that executes on a core (start of execution, ISRs, delays and mutexes).
+    """
+    if "idle" in task.name.lower():
+        return eventIndex.select(types=[TRACE_IDLE, TRACE_ISR_ENTER, TRACE_TASK_START_EXEC], cores=[int(task.name[len("IDLE"):])], first=first, last=last).tolist()
+    elif 100 <= task.id <= len(tickIds) + 100:    # scheduler IDs
+        return eventIndex.select(types=[TRACE_ISR_EXIT_TO_SCHEDULER, TRACE_TASK_STOP_EXEC, TRACE_IDLE, TRACE_TASK_START_EXEC], cores=[task.id - 100], first=first, last=last).tolist()
+    elif task.id in tickIds:
+        return eventIndex.select(types=[TRACE_ISR_ENTER, TRACE_ISR_EXIT, TRACE_ISR_EXIT_TO_SCHEDULER], first=first, last=last).tolist()
+    else:
+        executingEvents = eventIndex.select(types=[TRACE_TASK_START_EXEC, TRACE_ISR_ENTER, TRACE_ISR_EXIT, TRACE_DELAY_UNTIL, TRACE_DELAY, TRACE_MUTEX_TAKE, TRACE_MUTEX_GIVE], first=first, last=last)
+        return np.union1d(executingEvents, eventIndex.getPostings('taskIds', task.id, first, last)).tolist()
         
-def parseScheduler(sortedEvents, schedulerTask):
+def parseScheduler(sortedEvents, schedulerTask, state=None, first=0, last=None, positions=None):
 
     coreId = schedulerTask.id - 100   # For the scheduler task, the task id is equal to the core id
 
-    for evt in sortedEvents:
+    if last is None:
+        last = len(sortedEvents)
+
+    for i in (range(first, last) if positions is None else positions):
+        evt = sortedEvents[i]
         type = evt.get('type')
         core = evt.get('core')
         ts = evt.get('ts')
@@ -346,11 +950,15 @@ def parseScheduler(sortedEvents, schedulerTask):
                     schedulerTask.stopExec(ts)
                     schedulerTask.finishJob()
 
-def parseIdleTask(sortedEvents, task):
+def parseIdleTask(sortedEvents, task, state=None, first=0, last=None, positions=None):
 
     coreId = int(task.name[len("IDLE"):])
 
-    for evt in sortedEvents:
+    if last is None:
+        last = len(sortedEvents)
+
+    for i in (range(first, last) if positions is None else positions):
+        evt = sortedEvents[i]
         type = evt.get('type')
         core = evt.get('core')
         ts = evt.get('ts')
@@ -367,31 +975,32 @@ def parseIdleTask(sortedEvents, task):
                     task.stopExec(ts)
                     task.finishJob()
 
-    if task.currentJob is not None:
-        task.stopExec(ts)
-        task.finishJob()
+    # At the end of the trace, the open idle interval is closed.
+    if last >= len(sortedEvents):
+        if task.currentJob is not None:
+            task.stopExec(sortedEvents[-1].get('ts'))
+            task.finishJob()
 
-def parseTask(sortedEvents, task, mutex_id_to_letter, tickId):
+def parseTask(sortedEvents, task, mutex_id_to_letter, tickId, state=None, first=0, last=None, positions=None):
     """
     Parses the execution of a single task.
+    If the trace is parsed in chunks, the state of the previous chunk is passed and only the events
+    sortedEvents[first:last] are processed. Unfinished jobs are handled once the end of the trace is reached.
+    If positions is given, only the events at these positions (in first..last-1) are processed (see getTaskEvents()).
     """
     
-    finishJob = False       # Flag to indicate that the job is about to finish.
-    deadlineMiss = False    # Flag to indicate that a deadline was missed.
-    startExecCore = None    # Task started to execute on this core.
-    lastExecTask = None     # Keep track of the last task started on the core.
-    tickTs = []             # We keep track if tick timestamps to be able to handle deadline misses.
-    missedDeadlineAt = None # Record the tick at which the release should have happened after a deadline miss.
-    tickTs.append(0)        # By default the first tick appears at t=0
-
-    for i, evt in enumerate(sortedEvents):
+    if state is None:
+        state = TaskParserState()
+    if last is None:
+        last = len(sortedEvents)
+
+    for i in (range(first, last) if positions is None else positions):
+        evt = sortedEvents[i]
         type = evt.get('type')
         taskId = evt.get('taskId')
         core = evt.get('core')
         ts = evt.get('ts')
 
-        next_evt = sortedEvents[i + 1] if i + 1 < len(sortedEvents) else None
-
         if type == TRACE_TASK_START_READY:
             if task.id == taskId:
                 if task.currentJob == None: #If the job was blocked it might get the ready event again.
@@ -402,20 +1011,14 @@ def parseTask(sortedEvents, task, mutex_id_to_letter, tickId):
 
         if type == TRACE_TASK_START_EXEC:
             #if task.currentJob is not None: # If there is an active job, and this event if from the same core, remember the task id
-            if core == startExecCore:
-                lastExecTask = taskId
+            if core == state.startExecCore:
+                state.lastExecTask = taskId
 
-            if task.id == taskId:
+            if task.id == taskId and task.currentJob is not None:   # No job if it was released before the first event (e.g. of a time window)
                 #print(f"Start execution at {ts} on core {core}")
-
-                # if task.currentJob is not None:
-                #     #if task.currentJob.activeInterval is not None:
-                #     if next_evt.get('type') == TRACE_DEADLINE_MISS and next_evt.get('taskId') == task.id: 
-                #         task.newJob(ts, None)
-
                 task.startExec(ts, core, ExecutionType.EXECUTE)
-                startExecCore = core
-                lastExecTask = taskId
+                state.startExecCore = core
+                state.lastExecTask = taskId
 
         if type == TRACE_TASK_STOP_EXEC:
             if task.id == taskId:
@@ -423,78 +1026,83 @@ def parseTask(sortedEvents, task, mutex_id_to_letter, tickId):
                 if task.currentJob is not None:
                     if task.currentJob.activeInterval is not None:
                         task.stopExec(ts)
-                    startExecCore = None
-                    if finishJob == True:
-                        finishJob = False
+                    state.startExecCore = None
+                    if state.finishJob == True:
+                        state.finishJob = False
                         #print(f"Finish job at {ts}")
                         task.finishJob()
 
-                        if deadlineMiss == True:
-                            deadlineMiss = False
-                            releaseTs = tickTs[missedDeadlineAt]    # Get the timestamp of the tick where the task should have been released.
+                        if state.deadlineMiss == True:
+                            state.deadlineMiss = False
+                            releaseTs = state.tickTs[state.missedDeadlineAt]    # Get the timestamp of the tick where the task should have been released.
                             task.newJob(releaseTs, None)            # Release the job at the intended tick time.
 
         if type == TRACE_EVT_GROUP_SYNC or type == TRACE_EVT_GROUP_WAIT:
             if task.id == taskId:
-                finishJob = True
+                state.finishJob = True
 
         elif type == TRACE_ISR_ENTER:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     #print(f"Stop execution due to ISR at {ts}")
                     task.stopExec(ts)
             irqId = evt.get('irqId')
             if irqId == tickId:
-                tickTs.append(ts)
+                state.tickTs.append(ts)
         elif type == TRACE_ISR_EXIT:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     #print(f"Stop execution due to ISR at {ts}")
                     task.startExec(ts, core, ExecutionType.EXECUTE)
 
         elif type == TRACE_DELAY_UNTIL:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     #print(f"Delay Until called at {ts}")
-                    finishJob = True
+                    state.finishJob = True
                     if evt.get('deadlineMiss') == True:
-                        missedDeadlineAt = evt.get('timeToWake')
-                        deadlineMiss = True
+                        state.missedDeadlineAt = evt.get('timeToWake')
+                        state.deadlineMiss = True
         
         elif type == TRACE_DELAY:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     #print(f"Delay called at {ts}")
-                    finishJob = True
+                    state.finishJob = True
 
         elif type == TRACE_MUTEX_TAKE:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     letterId = map_mutex_id(mutex_id_to_letter, evt.get('mutexId'))
                     task.mutexTake(ts, evt.get('mutexId'), letterId)
 
         elif type == TRACE_MUTEX_GIVE:
-            if startExecCore == core:
-                if lastExecTask == task.id:
+            if state.startExecCore == core:
+                if state.lastExecTask == task.id:
                     task.mutexGive(ts, evt.get('mutexId'))
             
-            
-    # In case there are unfinished jobs, we handle them here.
-    if task.currentJob is not None:
-        if task.currentJob.activeInterval is not None:
-            task.stopExec(ts)
-        task.finishJob()
+    # In case there are unfinished jobs at the end of the trace, we handle them here. They are cut by the end of the
+    # trace and marked as incomplete, so they are excluded from the statistics.
+    if last >= len(sortedEvents):
+        if task.currentJob is not None:
+            if task.currentJob.activeInterval is not None:
+                task.stopExec(sortedEvents[last - 1].get('ts'))
+            task.finishJobIncomplete()
 
-def parseIrq(sortedEvents, irqTask):
+def parseIrq(sortedEvents, irqTask, state=None, first=0, last=None, positions=None):
     """
     This function parses the execution of a specific IRQ.
     We assume that each IRQ-job runs to completion. In case an IRQ is interrupted by
     a higher-priority IRQ, the execution is shown as multiple jobs.
     """
 
-    enterCore = None
+    if state is None:
+        state = TaskParserState()
+    if last is None:
+        last = len(sortedEvents)
     
-    for evt in sortedEvents:
+    for i in (range(first, last) if positions is None else positions):
+        evt = sortedEvents[i]
         type = evt.get('type')
 
         if type in [TRACE_ISR_EXIT, TRACE_ISR_EXIT_TO_SCHEDULER, TRACE_ISR_ENTER]:
@@ -507,21 +1115,22 @@ def parseIrq(sortedEvents, irqTask):
                 if type == TRACE_ISR_ENTER:
                     irqTask.newJob(ts, None)
                     irqTask.startExec(ts, core, ExecutionType.EXECUTE)
-                    enterCore = core
+                    state.enterCore = core
 
             if type == TRACE_ISR_EXIT or type == TRACE_ISR_EXIT_TO_SCHEDULER:
-                if core == enterCore:
+                if core == state.enterCore:
                     irqTask.stopExec(ts)
                     irqTask.finishJob()
-                    enterCore = None
+                    state.enterCore = None
     
-def parseTraceEvents(events, buffers):
+def parseTraceEvents(events, buffers, filterSpec=None):
     """
     This function converts the trace buffer of the traget into processable trace events.
     As buffers of different cores can contain events up to different timestamps, this function
     gets the events of each core's trace buffer up to the earliest timestamp of the last event on 
     any core. Otherwise, trace data can be inconsistent (for example under FreeRTOS new task instances 
     become ready on core 0, even if they are mapped to a different core.)
+    If filterSpec is given, the events it excludes are skipped by the decoder.
     """
     coreId = 0
 
@@ -531,13 +1140,15 @@ def parseTraceEvents(events, buffers):
         HelperFunctions.printState("Reading events of core " + str(coreId))
         bufferEvents.append([])
 
-        parser = EventParser(buffer)
+        parser = EventParser(buffer, printEvents=False if filterSpec is not None else None)
 
         while True:
-            evt = parser.read_event(coreId)
+            evt = parser.read_event(coreId, filterSpec)
             #print(evt)
             if evt is None:
                 break
+            if evt is skippedEvent:
+                continue
             #events.append(evt)
             bufferEvents[-1].append(evt)
         coreId = coreId + 1
@@ -564,13 +1175,19 @@ class EventParser:
     This class describes the event parser. It is used to extract all trace events from a raw buffer.
     """
     
-    def __init__(self, inBuffer):
+    def __init__(self, inBuffer, printEvents=None):
         """
         Initialization of the event parser.
-        The object gets a trace buffer in bytearray format as argument.
+        The object gets a trace buffer in bytearray format (or a trace buffer file opened in binary mode) as argument.
+        The decoded events are printed if printEvents is True (enable_entry_print if None).
         """
-        self.maxBytes = len(inBuffer)
-        self.buffer = file = io.BytesIO(inBuffer)
+        self.printEvents = enable_entry_print if printEvents is None else printEvents
+        if isinstance(inBuffer, (bytes, bytearray)):
+            self.maxBytes = len(inBuffer)
+            self.buffer = file = io.BytesIO(inBuffer)
+        else:
+            self.maxBytes = os.fstat(inBuffer.fileno()).st_size
+            self.buffer = inBuffer
         self.time = 0
         self.bytesRead = 0   
 
@@ -606,9 +1223,26 @@ class EventParser:
         else:
             return None
 
-    def read_event(self, coreId):
+    def skipPayload(self, eventId):
+        """
+        Function skips the payload of an event that is not decoded. Returns skippedEvent, or None at the end of the buffer.
+        """
+        if eventId == TRACE_TASK_CREATE:
+            header = self.readBytes(12)
+            if header is None:
+                return None
+            size = int.from_bytes(header[4:8], byteorder='little', signed=False) * 4
+        else:
+            size = payloadSizes.get(eventId, 0)
+
+        if size > 0 and self.readBytes(size) is None:
+            return None
+        return skippedEvent
+
+    def read_event(self, coreId, filterSpec=None):
         """
         Function reads the next event of the trace buffer.
+        Events that are excluded by the filterSpec (if given) are skipped and returned as skippedEvent.
         """
         b = self.readBytes(2)
         if b is None:
@@ -624,37 +1258,49 @@ class EventParser:
         eventId = int.from_bytes(b, byteorder='little', signed=False)
         #print("Identifyer ", "".join([f"\\x{byte:02x}" for byte in b]), " -> ", eventId)
         self.time = self.time + deltaTime # Compute the current timestamp in absolute time
+
+        if filterSpec is not None and not filterSpec.keepEvent(eventId, coreId):
+            return self.skipPayload(eventId)
         
         if eventId == TRACE_IDLE:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_IDLE" + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_IDLE" + " Core: " + str(coreId))
             evt = {'type':TRACE_IDLE, 'ts':self.time, 'core':coreId}
 
         elif eventId == TRACE_TASK_START_EXEC:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_START_EXEC  -> taskId: " + str(taskId) + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_START_EXEC  -> taskId: " + str(taskId) + " Core: " + str(coreId))
             evt = {'type':TRACE_TASK_START_EXEC, 'ts':self.time, 'core':coreId, 'taskId':taskId}
 
         elif eventId == TRACE_TASK_STOP_EXEC:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_STOP_EXEC   -> taskId: " + str(taskId) + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_STOP_EXEC   -> taskId: " + str(taskId) + " Core: " + str(coreId))
             evt = {'type':TRACE_TASK_STOP_EXEC, 'ts':self.time, 'core':coreId, 'taskId':taskId}
 
         elif eventId == TRACE_TASK_START_READY:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_START_READY -> taskId: " + str(taskId) + " Core: " + str(coreId))
+            if filterSpec is not None and not filterSpec.keepTask(taskId):
+                return skippedEvent
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_START_READY -> taskId: " + str(taskId) + " Core: " + str(coreId))
             evt = {'type':TRACE_TASK_START_READY, 'ts':self.time, 'core':coreId, 'taskId':taskId}
 
         elif eventId == TRACE_TASK_STOP_READY:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_STOP_READY  -> taskId: " + str(taskId) + " Core: " + str(coreId))
+            if filterSpec is not None and not filterSpec.keepTask(taskId):
+                return skippedEvent
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_STOP_READY  -> taskId: " + str(taskId) + " Core: " + str(coreId))
             evt = {'type':TRACE_TASK_STOP_READY, 'ts':self.time, 'core':coreId, 'taskId':taskId}
 
         elif eventId == TRACE_TASK_CREATE:
@@ -668,15 +1314,20 @@ class EventParser:
             if priority is None:
                 return None
             name = self.readBytes(strLen * 4).decode('UTF-8')
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_CREATE      -> Task: " + name + " ID: " + str(taskId) + " with priority: " + str(priority) + " Core: " + str(coreId))
+            if filterSpec is not None and not filterSpec.keepTask(taskId):
+                return skippedEvent
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TASK_CREATE      -> Task: " + name + " ID: " + str(taskId) + " with priority: " + str(priority) + " Core: " + str(coreId))
             evt = {'type':TRACE_TASK_CREATE, 'ts':self.time, 'core':coreId, 'taskId':taskId, 'name':name, 'priority':priority}
 
         elif eventId == TRACE_START:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_START" + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_START" + " Core: " + str(coreId))
             evt = {'type':TRACE_START, 'ts':self.time, 'core':coreId}
 
         elif eventId == TRACE_STOP:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_STOP" + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_STOP" + " Core: " + str(coreId))
             evt = {'type':TRACE_STOP, 'ts':self.time, 'core':coreId}
 
         elif eventId == TRACE_DELAY_UNTIL:
@@ -687,63 +1338,78 @@ class EventParser:
 
             if timeToWake is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_DELAY_UNTIL      -> timeToWake: " + str(timeToWake) + " ms Deadline Miss: " + str(deadlineMiss) + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_DELAY_UNTIL      -> timeToWake: " + str(timeToWake) + " ms Deadline Miss: " + str(deadlineMiss) + " Core: " + str(coreId))
             evt = {'type':TRACE_DELAY_UNTIL, 'ts':self.time, 'core':coreId, 'timeToWake':timeToWake, 'deadlineMiss':deadlineMiss}
 
         elif eventId == TRACE_ISR_ENTER:
             irqId = self.readInteger()
             if irqId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_ENTER        -> irqId: " + str(irqId) + " Core: " + str(coreId))
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_ENTER        -> irqId: " + str(irqId) + " Core: " + str(coreId))
             evt = {'type':TRACE_ISR_ENTER, 'ts':self.time, 'core':coreId, 'irqId':irqId}
 
         elif eventId == TRACE_ISR_EXIT:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_EXIT" + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_EXIT" + " Core: " + str(coreId)) 
             evt = {'type':TRACE_ISR_EXIT, 'ts':self.time, 'core':coreId} 
 
         elif eventId == TRACE_ISR_EXIT_TO_SCHEDULER:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_EXIT_TO_SCHEDULER" + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_ISR_EXIT_TO_SCHEDULER" + " Core: " + str(coreId)) 
             evt = {'type':TRACE_ISR_EXIT_TO_SCHEDULER, 'ts':self.time, 'core':coreId} 
 
         elif eventId == TRACE_DELAY:
             delayTime = self.readInteger()
             if delayTime is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_DELAY.           -> delayTime: " + str(delayTime) + " ms Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_DELAY.           -> delayTime: " + str(delayTime) + " ms Core: " + str(coreId)) 
             evt = {'type':TRACE_DELAY, 'ts':self.time, 'core':coreId, 'delayTime':delayTime} 
         
         elif eventId == TRACE_TIME_ZERO:
-            entryPrint("[t=" + str(self.time) + "us] TRACE_TIME_ZERO" + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_TIME_ZERO" + " Core: " + str(coreId)) 
             evt = {'type':TRACE_TIME_ZERO, 'ts':self.time, 'core':coreId} 
         elif eventId == TRACE_EVT_GROUP_WAIT:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_EVT_GROUP_WAIT -> taskId: " + str(taskId) + " Core: " + str(coreId)) 
+            if filterSpec is not None and not filterSpec.keepTask(taskId):
+                return skippedEvent
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_EVT_GROUP_WAIT -> taskId: " + str(taskId) + " Core: " + str(coreId)) 
             evt = {'type':TRACE_EVT_GROUP_WAIT, 'ts':self.time, 'core':coreId, 'taskId':taskId} 
         elif eventId == TRACE_EVT_GROUP_SYNC:
             taskId = self.readInteger()
             if taskId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_EVT_GROUP_SYNC -> taskId: " + str(taskId) + " Core: " + str(coreId)) 
+            if filterSpec is not None and not filterSpec.keepTask(taskId):
+                return skippedEvent
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_EVT_GROUP_SYNC -> taskId: " + str(taskId) + " Core: " + str(coreId)) 
             evt = {'type':TRACE_EVT_GROUP_SYNC, 'ts':self.time, 'core':coreId, 'taskId':taskId}
         elif eventId == TRACE_MUTEX_CREATE:
             mutexId = self.readInteger()
             if mutexId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_CREATE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_CREATE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
             evt = {'type':TRACE_MUTEX_CREATE, 'ts':self.time, 'core':coreId, 'mutexId':mutexId}
         elif eventId == TRACE_MUTEX_TAKE:
             mutexId = self.readInteger()
             if mutexId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_TAKE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_TAKE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
             evt = {'type':TRACE_MUTEX_TAKE, 'ts':self.time, 'core':coreId, 'mutexId':mutexId}
         elif eventId == TRACE_MUTEX_GIVE:
             mutexId = self.readInteger()
             if mutexId is None:
                 return None
-            entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_GIVE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
+            if self.printEvents:
+                entryPrint("[t=" + str(self.time) + "us] TRACE_MUTEX_GIVE -> mutexId: " + str(mutexId) + " Core: " + str(coreId)) 
             evt = {'type':TRACE_MUTEX_GIVE, 'ts':self.time, 'core':coreId, 'mutexId':mutexId}
         else:
             #print("ERROR Unknown Event!")
@@ -752,9 +1418,6 @@ class EventParser:
         return evt
 
 def getTickStart(events, irqCore0):
-    startTime = 0   # Timestamp of the first tick
-    tolerance_us = 50
-
     # Get an array of all tick times on core 0
     tickTimes = []
     for evt in events:
@@ -766,20 +1429,28 @@ def getTickStart(events, irqCore0):
                 tickTimes.append(ts)
 
     ticks = np.asarray(tickTimes, dtype=np.int64)
+    residueCounts = np.bincount(ticks % tickPeriod_us, minlength=tickPeriod_us)
 
-    period_us = 1000 # We like to align ticks with a 1ms grid
+    return getTickOrigin(residueCounts, int(ticks[0]))
+
+def getTickOrigin(residueCounts, firstTick):
+    """
+    Returns the start of the trace from the histogram of the tick times modulo tickPeriod_us and the first tick time.
+    """
+    period_us = tickPeriod_us # We like to align ticks with a 1ms grid
+    tolerance_us = tickTolerance_us
     phases = np.arange(period_us)
-    residues = ticks % period_us
+    residues = np.arange(period_us)
 
     # Signed circular distance from every residue to every possible phase (-500 to 499)
     errors = ( (residues[:, None] - phases[None, :] + period_us // 2) % period_us - period_us // 2)
     abs_errors = np.abs(errors)
 
-    # Maximise the number of aligned ticks
-    inlier_counts = np.sum(abs_errors <= tolerance_us, axis = 0)
+    # Maximise the number of aligned ticks (each residue counts as often as it appears)
+    inlier_counts = residueCounts @ (abs_errors <= tolerance_us)
 
     # Minimize clipped error to reduce influence of startup outliers
-    clipper_loss = np.sum(np.minimum(abs_errors, tolerance_us), axis=0)
+    clipper_loss = residueCounts @ np.minimum(abs_errors, tolerance_us)
 
     order = np.lexsort((clipper_loss, -inlier_counts))
     phase_us = int(phases[order[0]])
@@ -787,7 +1458,7 @@ def getTickStart(events, irqCore0):
     # Any origin congruent to phase_us modulo 1000 gives the same alignment.
     # Select the grid point immediately before or equal to the first tick.
     # -1000 since we like t=0 which has no IRQ. 
-    t0_us = phase_us + period_us * ((ticks[0] - phase_us) // period_us) - 1000
+    t0_us = phase_us + period_us * ((firstTick - phase_us) // period_us) - 1000
 
     return int(t0_us)
 
@@ -800,4 +1471,4 @@ if __name__ == "__main__":
     """
     Debugging.
     """
-    parser_thread(None, 2)
\ No newline at end of file
+    parseRecording(sys.argv[1], 2)
\ No newline at end of file
@@ -1,11 +1,14 @@
-from threading import Thread
 from pathlib import Path
 import io
 from TraceTask import *
+from TraceSet import TraceSet
 import os
 import HelperFunctions
+import ParserWorker
+import TraceEventStore
 import configparser
 import sys
+import numpy as np
 
 """
 Set to True to print state machine events when parsing execution.
@@ -24,6 +27,13 @@ every time a color is assigned to a task. The index wraps around if it reaches t
 taskColorIndex = 0
 taskColors = [(100, 237, 157), (100, 143, 237), (212, 237, 76), (237, 123, 100), (141, 100, 237)]
 
+"""
+The reconstruction processes the trace events in time ordered chunks. The first chunk is small to show
+the beginning of the trace quickly, every following chunk is twice as large (up to maxChunkEvents).
+"""
+firstChunkEvents = 20000
+maxChunkEvents = 1000000
+
 """
 Scheduling events that are logged
 """
@@ -64,6 +74,15 @@ eventMap = {
     ID_USER_REGISTER_PRIORITY : "ID_USER_REGISTER_PRIORITY",
 }
 
+"""
+Key of the event_value column and of the string of the events, to read the events from an event store.
+"""
+storeDecodeKeys = {
+    'valueKeys': {ID_USER_REGISTER_PERIOD: 'period', ID_USER_REGISTER_PRIORITY: 'priority'},
+    'nameKey': 'taskName',
+    'allKeys': ['period', 'taskName', 'priority']
+}
+
 def getTaskColor(taskId):
     """
     Function returns the task colors for the trace. The colors are selected in sequence from the list, wrapping around when the end of the list is reached. 
@@ -79,23 +98,33 @@ def getTaskColor(taskId):
 def parseTraceFiles(gui, numCores):
     """
     Main function that is called from the GUI to read the trace files from the target device.
-    To not block the GUI, this is done in a separate thread.
+    To not block the GUI, this is done in a separate worker process.
     """
-    global taskColorIndex
-    global enable_event_print
-
-    #enable_event_print = gui.printEvents_var.get()
-
-    taskColorIndex = 0      # Reset the task color index, so we always start with the same task color assignments.
-    thread = Thread(target = parser_thread, args = (gui, numCores))
-    thread.start()
+    configName = gui.targets[gui.selectedTarget].get('name').replace(' ', '_')    # Get the configuration name
+    folderName = HelperFunctions.getViewingFolderName(gui)
+    ParserWorker.startParser(gui, parseRecording, (folderName, configName))
 
-def parser_thread(gui, numCores):
+def parseComparisonFiles(gui, numCores, measurementName, onResult):
     """
-    Thread used to parse and convert the trace information into task execution.
-    As dedicated thread to not block the GUI while parsing.
+    Parses another recording of the selected target in a worker process (e.g. to compare it with the loaded trace).
+    onResult is called with the trace set once the recording is parsed.
     """
     configName = gui.targets[gui.selectedTarget].get('name').replace(' ', '_')    # Get the configuration name
+    folderName = HelperFunctions.getViewingFolderName(gui, measurementName)
+    return ParserWorker.ParserJob(gui, parseRecording, (folderName, configName), onResult, lambda message: HelperFunctions.printState("Parsing failed"))
+
+def parseRecording(folderName, configName, publish=None):
+    """
+    Parses the eBPF trace file of a recording and converts the trace information into task execution.
+    Returns the trace set with all tasks and the list of trace events. If the trace file is larger than
+    TraceEventStore.outOfCoreBytes (and no user-events are used), the events are kept in an event store in the recording
+    folder instead of a list.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
+    """
+    global taskColorIndex
+
+    taskColorIndex = 0      # Reset the task color index, so we always start with the same task color assignments.
+
     config = configparser.ConfigParser()
     config.read(HelperFunctions.getConfigFilePath())
 
@@ -103,23 +132,27 @@ def parser_thread(gui, numCores):
 
     HelperFunctions.printState("Use User-Events: ", info=str(use_user_events))
 
-    filename = os.path.abspath(os.path.join(HelperFunctions.getViewingFolderName(gui), 'trace.txt'))
-    eventFilePath = os.path.abspath(os.path.join(HelperFunctions.getViewingFolderName(gui), 'events.txt'))
+    filename = os.path.abspath(os.path.join(folderName, 'trace.txt'))
+    eventFilePath = os.path.abspath(os.path.join(folderName, 'events.txt'))
 
-    tasks = parser(filename, eventFilePath, use_user_events)    # Parse the content of the trace buffers
+    if not use_user_events and os.path.getsize(filename) > TraceEventStore.outOfCoreBytes:
+        tasks, events = parserOutOfCore(filename, os.path.join(folderName, 'eventstore'), eventFilePath, publish)
+        tasks.origin = filename
+        return tasks, events
 
-    # If this was called from the GUI, enable the buttons and update the GUI
-    if gui is not None:
-        gui.btn_loadTrace.configure(state="normal")
-        gui.traceView.setTasks(tasks)
-        gui.traceView.draw()
-        gui.update()
+    events = []
+    tasks = parser(filename, eventFilePath, use_user_events, events, publish)    # Parse the content of the trace buffers
+    tasks.origin = filename
+
+    return tasks, events
 
-def parser(buffers, eventFilePath, use_user_events):
+def parser(buffers, eventFilePath, use_user_events, sortedEvents=None, publish=None):
     """
     Function parses the trace file to internal events.
     Trace events are then converted to tasks, jobs and execution segments.
-    The function returns an array with all trace tasks.
+    The function returns a trace set with all trace tasks.
+    If sortedEvents is a list, the time sorted trace events are added to it.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
     """
     HelperFunctions.printHeader("Parsing Trace Files")
 
@@ -128,22 +161,88 @@ def parser(buffers, eventFilePath, use_user_events):
 
     events = sorted(events, key=lambda e: e['ts'])
 
-    with open(eventFilePath, "w") as f:
-        for evt in events:
-            entryPrint(evt)
-            f.write("ts: " + str(evt['ts']) + " " + eventMap.get(evt['type']) + " " + str(evt) + "\r\n")
+    writeEventFile(events, eventFilePath)
  
     if not use_user_events:
-        allTasks = extractTraceInfo(events)     # Parse all trace tasks from the event trace (afterwards we have trace tasks, jobs and execution segments). 
+        allTasks = extractTraceInfo(events, publish)     # Parse all trace tasks from the event trace (afterwards we have trace tasks, jobs and execution segments). 
     else:
-        allTasks = extractTraceInfoUserEvents(events, eventFilePath)
+        allTasks = extractTraceInfoUserEvents(events, eventFilePath, publish)
+
+    if sortedEvents is not None:
+        sortedEvents.extend(events)
         
-    tasks = []
+    return selectTasks(allTasks)
+
+def parserOutOfCore(filename, storeFolder, eventFilePath, publish=None):
+    """
+    Parses a trace file that is too large to keep all events in memory (without user-events). The events are read into an
+    event store (or an existing store of the same file is used), the reconstruction reads the time sorted events window by window.
+    Returns the trace set with all tasks and the event store.
+    """
+    HelperFunctions.printHeader("Parsing Trace Files")
+
+    source = TraceEventStore.getSource([filename])
+    store = TraceEventStore.openStore(storeFolder, source)
+    if store is None:
+        store = storeTraceEvents(filename, storeFolder, source)
+    else:
+        HelperFunctions.printState("Using event store: ", info=storeFolder)
+
+    events = TraceEventStore.EventWindow(store)
+    writeEventFile(events, eventFilePath)
+
+    allTasks = extractTraceInfo(events, publish, getTaskIds(store.getColumns()['event_taskId']))
+    return selectTasks(allTasks), store
+
+def storeTraceEvents(filename, storeFolder, source):
+    """
+    Reads the trace file into a new event store. The lines are converted to events in chunks, so only one chunk of
+    events is in memory. As in parseTraceEvents(), all timestamps are relative to the last EXECED event.
+    """
+    store = TraceEventStore.EventStore(storeFolder, create=True, intTime=False, decodeKeys=storeDecodeKeys, source=source)
+    minTime = None
+    chunk = []
+
+    print("Reading events of file " + filename)
+
+    with open(filename) as file:
+        for line in file:
+            evt = parseEventLine(line)
+            if evt['type'] == EXECED:
+                minTime = evt['ts']
+
+            chunk.append(evt)
+            if len(chunk) >= TraceEventStore.windowEvents:
+                store.append(chunk)
+                chunk = []
+    store.append(chunk)
+
+    HelperFunctions.printState("Sorting " + str(len(store)) + " events")
+    store.finish(minTime)
+    return store
+
+def getTaskIds(taskIds):
+    """
+    Returns the task IDs of the time sorted taskId column in the order in which they appear first.
+    The column is scanned in chunks, so it can be a memory map of a large trace.
+    """
+    ids = []
+    known = set()
+    for first in range(0, len(taskIds), TraceEventStore.windowEvents):
+        chunkIds, index = np.unique(taskIds[first:first + TraceEventStore.windowEvents], return_index=True)
+        for id in chunkIds[np.argsort(index)].tolist():
+            if id not in known:
+                known.add(id)
+                ids.append(id)
+    return ids
+
+def selectTasks(allTasks):
+    """
+    Returns the tasks that have jobs in the trace and prints them.
+    """
     HelperFunctions.printState("Found trace data for tasks:")
 
-    for task in allTasks:                   # Some tasks might be created in the trace but never execute. We exclue those here. 
-        if len(task.jobs) != 0:
-            tasks.append(task)
+    tasks = allTasks.select(lambda task: len(task.jobs) != 0)   # Some tasks might be created in the trace but never execute. We exclue those here. 
 
     for task in tasks:                      # Print a list with parsed tasks and the number of jobs they have in the trace.
         print("\t" + str(task))
@@ -151,6 +250,15 @@ def parser(buffers, eventFilePath, use_user_events):
 
     return tasks
 
+def writeEventFile(events, eventFilePath):
+    """
+    Writes the time sorted events to the event file.
+    """
+    with open(eventFilePath, "w") as f:
+        for evt in events:
+            entryPrint(evt)
+            f.write("ts: " + str(evt['ts']) + " " + eventMap.get(evt['type']) + " " + str(evt) + "\r\n")
+
 def parseTraceEvents(events, filename): 
     """
     Method parses the trace file produced by the eBPF logger and converts it to 
@@ -163,51 +271,15 @@ def parseTraceEvents(events, filename):
     file = open(filename)
 
     for line in file:
-        
-        parts = line.split()
-
-        ts = float(parts[0])    # in ns
-        event = getEvtId(parts[1])
-        tid = int(parts[2].split('=')[1])
-        cpu = int(parts[3].split('=')[1])
-        
-        if (event == ID_USER_REGISTER_PERIOD):
-            period = int(parts[5].split('=')[1])
-        else:
-            period = None
-
-        if (event == ID_USER_REGISTER_NAME):
-            taskName = parts[5].split('=')[1]
-            taskName = taskName[2:]
-            taskName = taskName[:-1]
-        else:
-            taskName = None
-
-        if (event == ID_USER_REGISTER_PRIORITY):
-            priority = int(parts[5].split('=')[1])
-        else:
-            priority = None
+        evt = parseEventLine(line)
 
         """
         Events are not necessarily delivered in order. The event with type EXECED markes the start,
         and then later adjust all timestamps relative to this one.
         """
-        if event == EXECED:
-            minTime = ts
-
-        evt = {
-            'ts': ts,
-            'type': event,
-            'taskId': tid,
-            'core': cpu,
-            'period': period,
-            'taskName': taskName,
-            'priority': priority
-        }
-
-        if evt is None:
-            break
-        #events.append(evt)
+        if evt['type'] == EXECED:
+            minTime = evt['ts']
+
         events.append(evt)
 
     """
@@ -216,138 +288,183 @@ def parseTraceEvents(events, filename):
     for evt in events:
         evt['ts'] -= minTime
 
-def extractTraceInfo(events):
+def parseEventLine(line):
+    """
+    Converts one line of the trace file into a trace event.
+    """
+    parts = line.split()
+
+    ts = float(parts[0])    # in ns
+    event = getEvtId(parts[1])
+    tid = int(parts[2].split('=')[1])
+    cpu = int(parts[3].split('=')[1])
+    
+    if (event == ID_USER_REGISTER_PERIOD):
+        period = int(parts[5].split('=')[1])
+    else:
+        period = None
+
+    if (event == ID_USER_REGISTER_NAME):
+        taskName = parts[5].split('=')[1]
+        taskName = taskName[2:]
+        taskName = taskName[:-1]
+    else:
+        taskName = None
+
+    if (event == ID_USER_REGISTER_PRIORITY):
+        priority = int(parts[5].split('=')[1])
+    else:
+        priority = None
+
+    return {
+        'ts': ts,
+        'type': event,
+        'taskId': tid,
+        'core': cpu,
+        'period': period,
+        'taskName': taskName,
+        'priority': priority
+    }
+
+def extractTraceInfo(events, publish=None, taskIds=None):
     """
     Method used to convert the individual trace events into tasks, jobs and execution segments.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
+    taskIds are the task IDs in the order they appear in the events (they are taken from the events if not given).
     """
 
-    tasks = []
+    tasks = TraceSet(traceFormat="Linux")
 
-    # Find all task IDs
-    taskIds = []
-    for evt in events:
-        taskId = evt['taskId']
-        if taskId not in taskIds:
-            taskIds.append(taskId)
+    if taskIds is None:
+        taskIds = [evt['taskId'] for evt in events]
 
     # For each task ID a trace task is created
     for id in taskIds:
-        tmpTask = TraceTask(id, "Task_" + (str(id)), None, getTaskColor(id))
-        tasks.append(tmpTask)
+        if tasks.findById(id) is None:
+            tmpTask = TraceTask(id, "Task_" + (str(id)), None, getTaskColor(id))
+            tasks.append(tmpTask)
 
     # The events are individual for each task, i.e. start, stop, sleep and wakeup. 
     # Hence, we can parse the execution for each task separately. 
-    # This can be done more efficiently to scale better, but as proof of concept this is enough.
+    # The events are processed in time ordered chunks, so the tasks can be published after each chunk.
+    for first, last in TraceEventStore.getChunkRanges(events, firstChunkEvents, maxChunkEvents):
+        for task in tasks:
+            if first == 0:
+                parsingPrint("=== THREAD ID: " + str(task.id) + " ===")
+            parseThread(events, task, first, last)
 
-    for task in tasks:
-        parsingPrint("=== THREAD ID: " + str(task.id) + " ===")
-        for evt in events:
-            """
-            EXECED -> Start of the traced program.
-            SCHED_IN -> Task starts to run on the CPU
-            SCHED_OUT -> Task is removed from the CPU
-            SLEEP_CALL -> Task signals to sleep (user-level, not sleeping yet!)
-            WAKING -> Something is trying to wake the task
-            WAKE -> The task is now in the run-queue
-            WAKE_NEW -> A forked thread is in run-queue for the first time
-            FORKED -> A new thread is created
-            """
-            if evt['taskId'] == task.id:
-                if evt['ts'] >= 0:
-                    if evt['type'] == EXECED:
-                        # Marks the start of the traced program. We assume the thread is running.
-                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " START_OF_TRACE -> EVECED, TASK_ID: " + str(evt['taskId']))
-                        task.newJob(evt['ts'], None)
-                        task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+        if publish is not None and last < len(events):
+            publish(tasks)
 
-                    elif evt['type'] == SCHED_IN:
-                        # There should always be a job with SCHED_IN 
-                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_IN, TASK_ID: " + str(evt['taskId']))
-                        task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+    return tasks
 
-                    elif evt['type'] == SCHED_OUT:
-                        if task.delayUntil is True: 
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, FINISHED JOB, TASK_ID: " + str(evt['taskId']))
-                            task.stopExec(evt['ts'])  
-                            task.finishJob()
-                            task.delayUntil = False
-                        else:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, PREEMPTED, TASK_ID: " + str(evt['taskId']))
-                            task.stopExec(evt['ts'])  
-                            
-                    elif evt['type'] == SLEEP_CALL:
-                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SLEEP_CALL, TASK_ID: " + str(evt['taskId']))
-                        task.delayUntil = True
-                        
-                    elif evt['type'] == WAKING:
-                        # We don't do anything with this event for now.
-                        pass
-                    elif evt['type'] == WAKE:
+def parseThread(events, task, first, last):
+    """
+    Parses the execution of a single thread for the events events[first:last].
+    All state of the reconstruction is kept in the task, so jobs that are still open at the end of a chunk are carried over.
+    """
+    for i in range(first, last):
+        evt = events[i]
+        """
+        EXECED -> Start of the traced program.
+        SCHED_IN -> Task starts to run on the CPU
+        SCHED_OUT -> Task is removed from the CPU
+        SLEEP_CALL -> Task signals to sleep (user-level, not sleeping yet!)
+        WAKING -> Something is trying to wake the task
+        WAKE -> The task is now in the run-queue
+        WAKE_NEW -> A forked thread is in run-queue for the first time
+        FORKED -> A new thread is created
+        """
+        if evt['taskId'] == task.id:
+            if evt['ts'] >= 0:
+                if evt['type'] == EXECED:
+                    # Marks the start of the traced program. We assume the thread is running.
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " START_OF_TRACE -> EVECED, TASK_ID: " + str(evt['taskId']))
+                    task.newJob(evt['ts'], None)
+                    task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+
+                elif evt['type'] == SCHED_IN:
+                    # There should always be a job with SCHED_IN 
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_IN, TASK_ID: " + str(evt['taskId']))
+                    task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+
+                elif evt['type'] == SCHED_OUT:
+                    if task.delayUntil is True: 
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, FINISHED JOB, TASK_ID: " + str(evt['taskId']))
+                        task.stopExec(evt['ts'])  
+                        task.finishJob()
+                        task.delayUntil = False
+                    else:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, PREEMPTED, TASK_ID: " + str(evt['taskId']))
+                        task.stopExec(evt['ts'])  
                         
-                        if task.currentJob is not None:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE (TASK WAS NOT SLEEPING!), TASK_ID: " + str(evt['taskId']))
-                            # It can happen that the task is not going to sleep after a sleep call (e.g. if the absolute sleep time has already passed.)
-                            # In those cases, we have to finish the previous job and start the new job directly.
-                            task.stopExec(evt['ts'])  
-                            task.finishJob()
-                            task.delayUntil = False
-                            task.newJob(evt['ts'], None)
-                            task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
-                        else:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE, TASK_ID: " + str(evt['taskId']))
-                            # For normal cases we only need to release the next job.
-                            task.newJob(evt['ts'], None)
-                    elif evt['type'] == WAKE_NEW:
-                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE_NEW, First job of TASK_ID: " + str(evt['taskId']))
+                elif evt['type'] == SLEEP_CALL:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SLEEP_CALL, TASK_ID: " + str(evt['taskId']))
+                    task.delayUntil = True
+                    
+                elif evt['type'] == WAKING:
+                    # We don't do anything with this event for now.
+                    pass
+                elif evt['type'] == WAKE:
+                    
+                    if task.currentJob is not None:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE (TASK WAS NOT SLEEPING!), TASK_ID: " + str(evt['taskId']))
+                        # It can happen that the task is not going to sleep after a sleep call (e.g. if the absolute sleep time has already passed.)
+                        # In those cases, we have to finish the previous job and start the new job directly.
+                        task.stopExec(evt['ts'])  
+                        task.finishJob()
+                        task.delayUntil = False
                         task.newJob(evt['ts'], None)
-                    elif evt['type'] == WAIT:
-                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAIT, TASK_ID: " + str(evt['taskId']))
-                        # This is a simplification. If a task is blocked on something (i.e. waiting) we start a new job. 
-                        task.delayUntil = True
-
-    return tasks
-
-def extractTraceInfoUserEvents(events, eventFilePath):
+                        task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+                    else:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE, TASK_ID: " + str(evt['taskId']))
+                        # For normal cases we only need to release the next job.
+                        task.newJob(evt['ts'], None)
+                elif evt['type'] == WAKE_NEW:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE_NEW, First job of TASK_ID: " + str(evt['taskId']))
+                    task.newJob(evt['ts'], None)
+                elif evt['type'] == WAIT:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAIT, TASK_ID: " + str(evt['taskId']))
+                    # This is a simplification. If a task is blocked on something (i.e. waiting) we start a new job. 
+                    task.delayUntil = True
+
+def extractTraceInfoUserEvents(events, eventFilePath, publish=None):
     """
     Method used to convert the individual trace events into tasks, jobs and execution segments.
     This method considers the user-events that add additional information for tracing.
+    If publish is given, it is called with the tasks reconstructed so far after each chunk of events.
     """
 
-    tasks = []
-
-    # Find all task IDs
-    taskIds = []
-    for evt in events:
-        taskId = evt['taskId']
-        if taskId not in taskIds:
-            taskIds.append(taskId)
+    tasks = TraceSet(traceFormat="Linux")
 
     # For each task ID a trace task is created
-    for id in taskIds:
-        tmpTask = TraceTask(id, "Task_" + (str(id)), None, getTaskColor(id))
-        tasks.append(tmpTask)
+    for evt in events:
+        id = evt['taskId']
+        if tasks.findById(id) is None:
+            tmpTask = TraceTask(id, "Task_" + (str(id)), None, getTaskColor(id))
+            tasks.append(tmpTask)
 
     # Identify the base task that starts the program
     baseTaskId = events[0]['taskId']
-    baseTask = findTaskById(tasks, baseTaskId)
-    baseTask.name = "BaseTask"
+    baseTask = tasks.findById(baseTaskId)
+    tasks.rename(baseTask, "BaseTask")
 
     # Get the extra information on all tasks form the user events
     for evt in events:
         if evt['ts'] >= 0:
                     if evt['type'] == ID_USER_REGISTER_PERIOD:
                         taskId = evt['taskId']
-                        task = findTaskById(tasks, taskId)
+                        task = tasks.findById(taskId)
                         task.period = int(evt['period'])
                         
                     elif evt['type'] == ID_USER_REGISTER_NAME:
                         taskId = evt['taskId']
-                        task = findTaskById(tasks, taskId)
-                        task.name = evt['taskName']
+                        task = tasks.findById(taskId)
+                        tasks.rename(task, evt['taskName'])
                         
                     elif evt['type'] == ID_USER_REGISTER_PRIORITY:
                         taskId = evt['taskId']
-                        task = findTaskById(tasks, taskId)
+                        task = tasks.findById(taskId)
                         task.priority = int(evt['priority'])
 
     # Finds the initial release time of the user tasks. 
@@ -382,79 +499,94 @@ def extractTraceInfoUserEvents(events, eventFilePath):
             entryPrint(evt)
             f.write("ts: " + str(evt['ts']) + " " + eventMap.get(evt['type']) + " " + str(evt) + "\r\n")
 
-    # Parse the user task execution. As without user events, we can do this for each thread individually
-    for task in tasks:
-        if task is not baseTask:
-            parsingPrint("=== THREAD ID: " + str(task.id) + " NAME: " + task.name + "===")
-            for evt in events:
-                """
-                EXECED -> Start of the traced program.
-                SCHED_IN -> Task starts to run on the CPU
-                SCHED_OUT -> Task is removed from the CPU
-                SLEEP_CALL -> Task signals to sleep (user-level, not sleeping yet!)
-                WAKING -> Something is trying to wake the task
-                WAKE -> The task is now in the run-queue
-                WAKE_NEW -> A forked thread is in run-queue for the first time
-                FORKED -> A new thread is created
-                """
-
-                if evt['taskId'] == task.id:
-                    if evt['ts'] >= 0:
-                        if evt['type'] == SCHED_IN:
-                            # There should always be a job with SCHED_IN 
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_IN, TASK_ID: " + str(evt['taskId']))
-                            task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
-
-                        elif evt['type'] == SCHED_OUT:
-                            if task.delayUntil is True: 
-                                parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, FINISHED JOB, TASK_ID: " + str(evt['taskId']))
-                                task.stopExec(evt['ts'])  
-                                task.finishJob()
-                                task.delayUntil = False
-                            else:
-                                parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, PREEMPTED, TASK_ID: " + str(evt['taskId']))
-                                task.stopExec(evt['ts'])  
-                                    
-                        elif evt['type'] == ID_USER_END_EVENT:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " ID_USER_END_EVENT, TASK_ID: " + str(evt['taskId']))
-                            task.delayUntil = True
-                                
-                        elif evt['type'] == WAKING:
-                            # We don't do anything with this event for now.
-                            pass
-                        elif evt['type'] == WAKE:
-                                
-                            if task.currentJob is not None:
-                                parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE (TASK WAS NOT SLEEPING!), TASK_ID: " + str(evt['taskId']))
-                                # It can happen that the task is not going to sleep after a sleep call (e.g. if the absolute sleep time has already passed.)
-                                # In those cases, we have to finish the previous job and start the new job directly.
-                                if task.currentJob.activeInterval is not None:
-                                    core = task.currentJob.activeInterval.core
-                                
-
-                                    task.stopExec(evt['ts'])  
-                                    task.finishJob()
-                                    task.delayUntil = False
-                                    task.newJob(evt['ts'], None)
-                                    task.startExec(evt['ts'], core, ExecutionType.EXECUTE)
-                            else:
-                                parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE, TASK_ID: " + str(evt['taskId']))
-                                # For normal cases we only need to release the next job.
-                                task.newJob(evt['ts'], None)
-                        elif evt['type'] == WAKE_NEW:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE_NEW, First job of TASK_ID: " + str(evt['taskId']))
-                            task.newJob(evt['ts'], None)
-                        elif evt['type'] == WAIT:
-                            parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAIT, TASK_ID: " + str(evt['taskId']))
-                            # This is a simplification. If a task is blocked on something (i.e. waiting) we start a new job. 
-                            task.delayUntil = True
+    # Parse the user task execution. As without user events, we can do this for each thread individually.
+    # The events are processed in time ordered chunks, so the tasks can be published after each chunk.
+    for first, last in HelperFunctions.chunkRanges(len(events), firstChunkEvents, maxChunkEvents):
+        for task in tasks:
+            if task is not baseTask:
+                if first == 0:
+                    parsingPrint("=== THREAD ID: " + str(task.id) + " NAME: " + task.name + "===")
+                parseUserThread(events, task, first, last)
 
+        if publish is not None and last < len(events):
+            publish(tasks)
+
+    # Jobs that are still running at the end of the trace are cut and marked as incomplete.
     for task in tasks:
         if task.currentJob != None:
-            task.finishJob()
+            task.finishJobIncomplete()
 
     return tasks
 
+def parseUserThread(events, task, first, last):
+    """
+    Parses the execution of a single user thread for the events events[first:last], considering the user-events.
+    All state of the reconstruction is kept in the task, so jobs that are still open at the end of a chunk are carried over.
+    """
+    for i in range(first, last):
+        evt = events[i]
+        """
+        EXECED -> Start of the traced program.
+        SCHED_IN -> Task starts to run on the CPU
+        SCHED_OUT -> Task is removed from the CPU
+        SLEEP_CALL -> Task signals to sleep (user-level, not sleeping yet!)
+        WAKING -> Something is trying to wake the task
+        WAKE -> The task is now in the run-queue
+        WAKE_NEW -> A forked thread is in run-queue for the first time
+        FORKED -> A new thread is created
+        """
+
+        if evt['taskId'] == task.id:
+            if evt['ts'] >= 0:
+                if evt['type'] == SCHED_IN:
+                    # There should always be a job with SCHED_IN 
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_IN, TASK_ID: " + str(evt['taskId']))
+                    task.startExec(evt['ts'], evt['core'], ExecutionType.EXECUTE)
+
+                elif evt['type'] == SCHED_OUT:
+                    if task.delayUntil is True: 
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, FINISHED JOB, TASK_ID: " + str(evt['taskId']))
+                        task.stopExec(evt['ts'])  
+                        task.finishJob()
+                        task.delayUntil = False
+                    else:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " SCHED_OUT, PREEMPTED, TASK_ID: " + str(evt['taskId']))
+                        task.stopExec(evt['ts'])  
+                            
+                elif evt['type'] == ID_USER_END_EVENT:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " ID_USER_END_EVENT, TASK_ID: " + str(evt['taskId']))
+                    task.delayUntil = True
+                        
+                elif evt['type'] == WAKING:
+                    # We don't do anything with this event for now.
+                    pass
+                elif evt['type'] == WAKE:
+                        
+                    if task.currentJob is not None:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE (TASK WAS NOT SLEEPING!), TASK_ID: " + str(evt['taskId']))
+                        # It can happen that the task is not going to sleep after a sleep call (e.g. if the absolute sleep time has already passed.)
+                        # In those cases, we have to finish the previous job and start the new job directly.
+                        if task.currentJob.activeInterval is not None:
+                            core = task.currentJob.activeInterval.core
+                        
+
+                            task.stopExec(evt['ts'])  
+                            task.finishJob()
+                            task.delayUntil = False
+                            task.newJob(evt['ts'], None)
+                            task.startExec(evt['ts'], core, ExecutionType.EXECUTE)
+                    else:
+                        parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE, TASK_ID: " + str(evt['taskId']))
+                        # For normal cases we only need to release the next job.
+                        task.newJob(evt['ts'], None)
+                elif evt['type'] == WAKE_NEW:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAKE_NEW, First job of TASK_ID: " + str(evt['taskId']))
+                    task.newJob(evt['ts'], None)
+                elif evt['type'] == WAIT:
+                    parsingPrint("ts=" + str(evt['ts']) + " - Core: " + str(evt['core']) + " WAIT, TASK_ID: " + str(evt['taskId']))
+                    # This is a simplification. If a task is blocked on something (i.e. waiting) we start a new job. 
+                    task.delayUntil = True
+
 def getEvtId(evtString):
     """
     Mapping function to get the event type from the event string.
@@ -0,0 +1,163 @@
+import numpy as np
+import TraceStatistics
+
+"""
+Inference of the period, offset and jitter of tasks from their release times.
+The period is the peak of the histogram of the times between consecutive releases (robust against missed and
+delayed releases). Each release is then assigned to the index of its nominal release (the sum of round(time between releases / period)),
+and a least squares fit of release = offset + period * index refines the period and gives the offset. The jitter is the
+spread of the residuals of this fit. All steps are linear in the number of jobs.
+"""
+
+"""
+Number of histogram bins between 0 and twice the median time between releases.
+"""
+histogramBins = 100
+
+"""
+A release is on time if it deviates at most tolerance * period from its nominal release.
+"""
+tolerance = 0.05
+
+"""
+A task is periodic if at least minConfidence of its releases are on time, and it has at least minJobs jobs.
+"""
+minConfidence = 0.9
+minJobs = 3
+
+class PeriodEstimate():
+    """
+    Estimated timing parameters of a task, in the time unit of the trace.
+    """
+    def __init__(self, period, offset, jitter, confidence):
+        self.period = period            # Time between two nominal releases
+        self.offset = offset            # Nominal release of the first job
+        self.jitter = jitter            # Maximum minus minimum deviation of the releases from the nominal releases
+        self.confidence = confidence    # Fraction of releases that are on time (see tolerance)
+
+    def isPeriodic(self):
+        return self.confidence >= minConfidence
+
+def estimatePeriod(release):
+    """
+    Returns the PeriodEstimate of the sorted release times, or None if there are too few releases.
+    """
+    release = np.asarray(release, dtype=np.float64)
+    release = release[~np.isnan(release)]
+    if len(release) < minJobs:
+        return None
+
+    diffs = np.diff(release)
+    diffs = diffs[diffs > 0]
+    if len(diffs) == 0:
+        return None
+    median = float(np.median(diffs))
+
+    # The peak of the histogram is the most common time between releases.
+    counts, edges = np.histogram(diffs, bins=histogramBins, range=(0.0, 2 * median))
+    peak = int(np.argmax(counts))
+    low = edges[max(peak - 1, 0)]
+    high = edges[min(peak + 2, histogramBins)]
+    candidates = diffs[(diffs >= low) & (diffs <= high)]
+    period = float(np.median(candidates)) if len(candidates) > 0 else median
+    if period <= 0:
+        return None
+
+    # Fit the releases to their nominal releases. The index is counted from the time between consecutive releases,
+    # so a small error of the histogram period does not add up over long traces.
+    index = np.concatenate(([0.0], np.cumsum(np.round(np.diff(release) / period))))
+    if index[-1] > 0:
+        period, offset = np.polyfit(index, release, 1)
+    else:
+        offset = release[0]
+    residual = release - (offset + period * index)
+
+    duplicate = np.zeros(len(index), dtype=np.bool_)
+    duplicate[1:] = index[1:] == index[:-1]     # Two releases for the same nominal release
+    onTime = (np.abs(residual) <= tolerance * period) & ~duplicate
+
+    return PeriodEstimate(float(period), float(offset), float(residual.max() - residual.min()), float(np.count_nonzero(onTime)) / len(release))
+
+def inferPeriods(traceSet, overwrite=False):
+    """
+    Estimates the period of each user task of the trace set and stores the estimates in traceSet.periods (task -> PeriodEstimate).
+    If the task is periodic and its period is not set (or overwrite is True), task.period is set to the estimate and jobs without
+    deadline get the implicit deadline release + period. Periods set by the trace (e.g. Linux user events) are kept, since their
+    unit can differ from the unit of the timestamps.
+    Returns traceSet.periods.
+    """
+    periods = {}
+    for task in traceSet:
+        if traceSet.getTaskKind(task) != 'user':
+            continue
+
+        task.freeze()
+        estimate = estimatePeriod(task.columns['job_release'])
+        if estimate is None:
+            continue
+        periods[task] = estimate
+
+        if not estimate.isPeriodic() or (task.period is not None and not overwrite):
+            continue
+
+        task.period = int(round(estimate.period)) if task.intTime else estimate.period
+        deadline = task.columns['job_deadline']
+        implicit = np.isnan(deadline)
+        deadline[implicit] = task.columns['job_release'][implicit] + task.period
+
+    traceSet.periods = periods
+    traceSet.statistics = None      # The deadline misses depend on the deadlines
+    return periods
+
+def encodePeriods(traceSet):
+    """
+    Returns the inferred periods (traceSet.periods) and the deadlines of the jobs of these tasks as columns, e.g. to send
+    them to another process. Tasks are identified by their index in the trace set.
+    """
+    tasks = list(traceSet.periods)
+    estimates = list(traceSet.periods.values())
+    deadlines = [task.columns['job_deadline'] for task in tasks]
+    return {
+        'period_task':              np.asarray([traceSet.index(task) for task in tasks], dtype=np.int64),
+        'period_period':            np.asarray([estimate.period for estimate in estimates], dtype=np.float64),
+        'period_offset':            np.asarray([estimate.offset for estimate in estimates], dtype=np.float64),
+        'period_jitter':            np.asarray([estimate.jitter for estimate in estimates], dtype=np.float64),
+        'period_confidence':        np.asarray([estimate.confidence for estimate in estimates], dtype=np.float64),
+        'period_deadlineOffset':    np.concatenate(([0], np.cumsum([len(deadline) for deadline in deadlines], dtype=np.int64))).astype(np.int64),
+        'period_deadline':          np.concatenate(deadlines) if len(deadlines) > 0 else np.zeros(0),
+    }
+
+def decodePeriods(traceSet, columns):
+    """
+    Restores the periods and deadlines created by encodePeriods() in a trace set with the same (frozen) tasks.
+    The periods of the tasks are not part of the columns, they are sent with the tasks.
+    Returns traceSet.periods.
+    """
+    periods = {}
+    offsets = columns['period_deadlineOffset'].tolist()
+    for row, index in enumerate(columns['period_task'].tolist()):
+        task = traceSet[index]
+        periods[task] = PeriodEstimate(float(columns['period_period'][row]), float(columns['period_offset'][row]),
+                                       float(columns['period_jitter'][row]), float(columns['period_confidence'][row]))
+        task.columns['job_deadline'][:] = columns['period_deadline'][offsets[row]:offsets[row + 1]]
+
+    traceSet.periods = periods
+    traceSet.statistics = None
+    return periods
+
+def getPeriodTable(traceSet):
+    """
+    Returns the column names and the rows (one per user task) of the inferred periods.
+    """
+    if traceSet.periods is None:
+        inferPeriods(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["Task", "Jobs", "Period [" + unit + "]", "Estimated Period [" + unit + "]", "Offset [" + unit + "]", "Jitter [" + unit + "]", "On Time [%]", "Periodic"]
+    rows = []
+    for task, estimate in traceSet.periods.items():
+        if task not in traceSet:
+            continue
+        rows.append([task.name, len(task.jobs), task.period if task.period is not None else "-", round(estimate.period, 1), round(estimate.offset, 1),
+                     round(estimate.jitter, 1), round(100 * estimate.confidence, 1), "yes" if estimate.isPeriodic() else "no"])
+    return columns, rows
@@ -0,0 +1,206 @@
+import numpy as np
+import TraceStatistics
+import TraceUtilization
+from TraceSet import taskKinds
+
+"""
+Preemption and migration statistics.
+An execution interval of a user task that is not the last interval of its job ends while the job is still open. The task
+that executes next on the core (ignoring the scheduler) tells why: an ISR or another user task preempted the job, and the idle
+task means the job was blocked. The scheduler time between the end of the interval and the start of the preempting task is the
+cost of the context switch. A job migrates if two consecutive intervals of the job execute on different cores.
+All intervals of the trace are collected once into columns, the preempting task of all intervals is found with one binary
+search per core.
+"""
+
+class TaskPreemptions():
+    """
+    Preemption and migration counts of one task.
+    """
+    def __init__(self, task):
+        self.task = task
+        self.jobs = len(task.jobs)
+        self.preemptions = 0            # Number of times a user task preempted a job of the task
+        self.isrPreemptions = 0         # Number of times an ISR preempted a job of the task
+        self.blocked = 0                # Number of times a job was blocked (the core became idle)
+        self.migrations = 0             # Number of times a job continued on another core
+        self.switchTime = 0.0           # Scheduler time between the preemptions and the start of the preempting task
+
+class CorePreemptions():
+    """
+    Preemption and migration counts of one core.
+    """
+    def __init__(self, core):
+        self.core = core
+        self.preemptions = 0            # Number of preemptions of user tasks by user tasks on the core
+        self.isrPreemptions = 0         # Number of preemptions of user tasks by ISRs on the core
+        self.migrationsIn = 0           # Number of jobs that continued on this core after executing on another core
+        self.migrationsOut = 0          # Number of jobs that continued on another core after executing on this core
+        self.switchTime = 0.0           # Scheduler time in the preemptions on the core
+        self.schedulerCalls = 0         # Number of scheduler executions on the core
+        self.schedulerTime = 0.0        # Total execution time of the scheduler on the core
+
+class PreemptionAnalysis():
+    """
+    Result of the preemption analysis of a trace.
+    """
+    def __init__(self):
+        self.tasks = []                 # TaskPreemptions of each user task
+        self.cores = []                 # CorePreemptions of each core
+        self.pairs = {}                 # (preempted task, preempting task) -> [number of preemptions, scheduler time]
+
+def collectIntervals(traceSet):
+    """
+    Returns the tasks of the trace set and the columns of all their execution intervals: start, stop, core, task index,
+    and whether the interval is the last interval of its job. Migrations are counted per task on the way (task index -> list of (from core, to core)).
+    """
+    tasks = list(traceSet)
+    starts = []
+    stops = []
+    cores = []
+    taskIndexes = []
+    lasts = []
+    migrations = {}
+
+    for index, task in enumerate(tasks):
+        task.freeze()
+        columns = task.columns
+        offsets = columns['job_intervalOffset']
+        intervals = len(columns['interval_start'])
+        core = columns['interval_core'].astype(np.int64)
+
+        last = np.zeros(intervals, dtype=np.bool_)
+        executed = offsets[1:] > offsets[:-1]
+        last[offsets[1:][executed] - 1] = True
+
+        # Consecutive intervals of the same job on different cores
+        job = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        migrated = np.flatnonzero((job[1:] == job[:-1]) & (core[1:] != core[:-1]))
+        migrations[index] = list(zip(core[migrated].tolist(), core[migrated + 1].tolist()))
+
+        starts.append(columns['interval_start'])
+        stops.append(columns['interval_stop'])
+        cores.append(core)
+        taskIndexes.append(np.full(intervals, index, dtype=np.int64))
+        lasts.append(last)
+
+    def concatenate(arrays, dtype):
+        return np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0, dtype=dtype)
+
+    return (tasks, concatenate(starts, np.float64), concatenate(stops, np.float64), concatenate(cores, np.int64),
+            concatenate(taskIndexes, np.int64), concatenate(lasts, np.bool_), migrations)
+
+def analyzePreemptions(traceSet):
+    """
+    Returns the PreemptionAnalysis of the trace set. The result is cached in the trace set.
+    """
+    if traceSet.preemptions is None:
+        tasks, start, stop, core, taskIndex, last, migrations = collectIntervals(traceSet)
+        kind = np.asarray([taskKinds.index(traceSet.getTaskKind(task)) for task in tasks], dtype=np.int64)
+        intervalKind = kind[taskIndex] if len(taskIndex) > 0 else np.zeros(0, dtype=np.int64)
+        utilization = TraceUtilization.getUtilizationIndex(traceSet)
+
+        analysis = PreemptionAnalysis()
+        taskResults = {index: TaskPreemptions(task) for index, task in enumerate(tasks) if kind[index] == taskKinds.index('user')}
+        coreResults = {coreId: CorePreemptions(coreId) for coreId in utilization.cores}
+
+        # Intervals of user tasks that end while the job is still open
+        openRows = np.flatnonzero(~last & (intervalKind == taskKinds.index('user')))
+        candidates = np.flatnonzero(intervalKind != taskKinds.index('scheduler'))
+
+        for coreId in np.unique(core[openRows]).tolist():
+            preempted = openRows[core[openRows] == coreId]
+            coreCandidates = candidates[core[candidates] == coreId]
+            coreCandidates = coreCandidates[np.argsort(start[coreCandidates], kind='stable')]
+
+            # First interval that starts on the core after the preempted interval stopped (skipping the own task)
+            position = np.searchsorted(start[coreCandidates], stop[preempted], side='left')
+            valid = position < len(coreCandidates)
+            preempted = preempted[valid]
+            following = coreCandidates[position[valid]]
+            other = taskIndex[following] != taskIndex[preempted]
+            preempted = preempted[other]
+            following = following[other]
+
+            switchTime = utilization.busyUntil(coreId, 'scheduler', start[following]) - utilization.busyUntil(coreId, 'scheduler', stop[preempted])
+            nextKind = intervalKind[following]
+            coreResult = coreResults.setdefault(coreId, CorePreemptions(coreId))
+
+            for row, (victim, preemptor) in enumerate(zip(taskIndex[preempted].tolist(), taskIndex[following].tolist())):
+                result = taskResults[victim]
+                if nextKind[row] == taskKinds.index('idle'):
+                    result.blocked = result.blocked + 1
+                    continue
+
+                if nextKind[row] == taskKinds.index('isr'):
+                    result.isrPreemptions = result.isrPreemptions + 1
+                    coreResult.isrPreemptions = coreResult.isrPreemptions + 1
+                else:
+                    result.preemptions = result.preemptions + 1
+                    coreResult.preemptions = coreResult.preemptions + 1
+                result.switchTime = result.switchTime + float(switchTime[row])
+                coreResult.switchTime = coreResult.switchTime + float(switchTime[row])
+
+                pair = analysis.pairs.setdefault((tasks[victim], tasks[preemptor]), [0, 0.0])
+                pair[0] = pair[0] + 1
+                pair[1] = pair[1] + float(switchTime[row])
+
+        for index, result in taskResults.items():
+            result.migrations = len(migrations[index])
+            for fromCore, toCore in migrations[index]:
+                fromResult = coreResults.setdefault(fromCore, CorePreemptions(fromCore))
+                fromResult.migrationsOut = fromResult.migrationsOut + 1
+                toResult = coreResults.setdefault(toCore, CorePreemptions(toCore))
+                toResult.migrationsIn = toResult.migrationsIn + 1
+
+        for coreId, coreResult in coreResults.items():
+            if (coreId, 'scheduler') in utilization.groups:
+                schedulerStart, startPrefix, schedulerStop, stopPrefix = utilization.groups[(coreId, 'scheduler')]
+                coreResult.schedulerCalls = len(schedulerStart)
+                coreResult.schedulerTime = float(stopPrefix[-1] - startPrefix[-1])
+
+        analysis.tasks = list(taskResults.values())
+        analysis.cores = [coreResults[coreId] for coreId in sorted(coreResults)]
+        traceSet.preemptions = analysis
+
+    return traceSet.preemptions
+
+def getTaskTable(traceSet):
+    """
+    Returns the column names and the rows (one per user task) of the preemption statistics.
+    """
+    analysis = analyzePreemptions(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["Task", "Jobs", "Preemptions", "ISR Preemptions", "Blocked", "Migrations", "Switch Time [" + unit + "]", "Avg Switch Time [" + unit + "]"]
+    rows = []
+    for result in analysis.tasks:
+        count = result.preemptions + result.isrPreemptions
+        rows.append([result.task.name, result.jobs, result.preemptions, result.isrPreemptions, result.blocked, result.migrations,
+                     round(result.switchTime, 1), round(result.switchTime / count, 1) if count > 0 else "-"])
+    return columns, rows
+
+def getPairTable(traceSet):
+    """
+    Returns the column names and the rows (one per pair of preempted and preempting task) of the preemptions.
+    """
+    analysis = analyzePreemptions(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    columns = ["Preempted Task", "Preempting Task", "Preemptions", "Avg Switch Time [" + unit + "]"]
+    rows = []
+    for (victim, preemptor), (count, switchTime) in sorted(analysis.pairs.items(), key=lambda item: -item[1][0]):
+        rows.append([victim.name, preemptor.name, count, round(switchTime / count, 1)])
+    return columns, rows
+
+def printCoreStatistics(traceSet):
+    """
+    Prints the preemptions, migrations and scheduler time of each core.
+    """
+    analysis = analyzePreemptions(traceSet)
+    unit = TraceStatistics.getTimeUnit(traceSet)
+
+    for result in analysis.cores:
+        print("Core " + str(result.core) + ": " + str(result.preemptions) + " preemptions, " + str(result.isrPreemptions) + " ISR preemptions, "
+              + str(result.migrationsIn) + " migrations in, " + str(result.migrationsOut) + " migrations out, switch time " + str(round(result.switchTime, 1)) + " " + unit
+              + ", scheduler " + str(result.schedulerCalls) + " calls (" + str(round(result.schedulerTime, 1)) + " " + unit + ")")
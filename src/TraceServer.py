@@ -0,0 +1,310 @@
+import argparse
+import http.server
+import json
+import os
+import threading
+import urllib.parse
+import numpy as np
+import HelperFunctions
+import TraceStatistics
+import TraceUtilization
+import TraceBatch
+from TraceSet import taskKinds
+
+"""
+Local HTTP server to look at parsed traces from a browser or a script, without the Tk application.
+Recordings are parsed once (on the first request, or at startup) and kept in memory. All endpoints are answered with the
+sorted interval columns and prefix sums of the window indexes (see TraceStatistics.TaskWindowIndex), so a request only
+costs a few binary searches. The size of each response is bounded: occupancy has at most maxBins bins per task and
+interval requests return at most maxIntervals intervals (with the cursor of the next page).
+The server only uses the standard library and binds to localhost by default, it does not need a network connection.
+
+Endpoints (all GET, the trace is selected with ?target=<data folder>&recording=<measurement>):
+    /recordings                             Recordings of all targets and whether they are loaded
+    /tasks                                  Tasks of the trace, the bounds and the time unit
+    /occupancy?start=&stop=&bins=           Busy fraction of each task and core in the bins of the window
+    /intervals?task=&start=&stop=&limit=    Execution intervals of the tasks (all if no task is given) in the window,
+                                            the next page is requested with after=<next> (X-Next header for binary)
+Add format=binary to /occupancy or /intervals to get little-endian float64 arrays instead of JSON (see the X-Shape header).
+"""
+
+"""
+Limits of the response size.
+"""
+maxBins = 4000
+defaultBins = 1000
+maxIntervals = 50000
+
+class TraceStore():
+    """
+    Parsed traces of the server, by (target, recording). A trace is parsed on the first request, concurrent requests
+    for the same trace wait for the same parse.
+    """
+    def __init__(self, dataPath):
+        self.dataPath = dataPath
+        self.traces = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, target, recording):
+        if target not in TraceBatch.batchTargets:
+            raise LookupError("Unknown target " + str(target))
+        folderName = os.path.join(self.dataPath, target, str(recording))
+        if recording is None or os.path.dirname(os.path.normpath(folderName)) != os.path.normpath(os.path.join(self.dataPath, target)) or not os.path.isdir(folderName):
+            raise LookupError("Unknown recording " + str(recording))
+
+        key = (target, recording)
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self.traces:
+                HelperFunctions.printState("Loading", info=target + "/" + recording)
+                traceSet = TraceBatch.loadRecording(target, folderName)
+                TraceStatistics.getWindowIndexes(traceSet)      # Build the indexes before the trace is used by requests
+                TraceUtilization.getUtilizationIndex(traceSet)
+                self.traces[key] = traceSet
+        return self.traces[key]
+
+    def getRecordings(self):
+        recordings = {}
+        for target in TraceBatch.batchTargets:
+            targetFolder = os.path.join(self.dataPath, target)
+            if os.path.isdir(targetFolder):
+                recordings[target] = [{'name': name, 'loaded': (target, name) in self.traces} for name in TraceBatch.findRecordings(targetFolder)]
+        return recordings
+
+class RequestError(Exception):
+    """
+    Error that is sent to the client with the given HTTP status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def getFloat(query, name, default):
+    try:
+        return float(query[name][0]) if name in query else default
+    except ValueError:
+        raise RequestError(400, "Invalid value for " + name)
+
+def getInt(query, name, default):
+    try:
+        return int(query[name][0]) if name in query else default
+    except ValueError:
+        raise RequestError(400, "Invalid value for " + name)
+
+def getTasks(traceSet, query):
+    """
+    Returns the tasks selected with task=<index> (can be repeated), or all tasks.
+    """
+    if 'task' not in query:
+        return list(traceSet)
+    try:
+        return [traceSet[int(index)] for index in query['task']]
+    except (ValueError, IndexError):
+        raise RequestError(400, "Invalid task index")
+
+def getWindow(traceSet, query):
+    """
+    Returns the time window of the request, by default the complete trace.
+    """
+    first, last = traceSet.getBounds()
+    left = getFloat(query, 'start', float(first) if first is not None else 0.0)
+    right = getFloat(query, 'stop', float(last) if last is not None else 0.0)
+    if right <= left:
+        raise RequestError(400, "stop must be larger than start")
+    return left, right
+
+def describeTasks(traceSet):
+    first, last = traceSet.getBounds()
+    indexes = TraceStatistics.getWindowIndexes(traceSet)
+    tasks = []
+    for index, task in enumerate(traceSet):
+        tasks.append({'index': index, 'id': task.id, 'name': task.name, 'kind': traceSet.getTaskKind(task), 'priority': task.priority,
+                      'color': task.taskColor, 'jobs': len(task.jobs), 'intervals': len(indexes[task].start), 'cores': sorted(indexes[task].cores)})
+    return {'format': traceSet.traceFormat, 'unit': TraceStatistics.getTimeUnit(traceSet), 'start': first, 'stop': last,
+            'cores': TraceUtilization.getUtilizationIndex(traceSet).cores, 'tasks': tasks}
+
+def getOccupancy(traceSet, query):
+    """
+    Returns the bin edges, the busy fraction of the selected tasks in each bin and the busy fraction of each core and task kind.
+    """
+    left, right = getWindow(traceSet, query)
+    bins = min(max(getInt(query, 'bins', defaultBins), 1), maxBins)
+    tasks = getTasks(traceSet, query)
+    indexes = TraceStatistics.getWindowIndexes(traceSet)
+
+    edges = np.linspace(left, right, bins + 1)
+    width = np.diff(edges)
+    busy = np.zeros((len(tasks), bins))
+    for row, task in enumerate(tasks):
+        busy[row] = np.clip(np.diff(indexes[task].busyUntil(edges)) / width, 0.0, 1.0)
+
+    utilization = TraceUtilization.getUtilization(traceSet, left, right, bins)
+    cores = {core: {kind: utilization.busy[core][kind] for kind in taskKinds} for core in utilization.cores}
+    return edges, tasks, busy, cores
+
+def getCursor(query):
+    """
+    Returns the cursor (start, task index, row) of the page selected with after=<start>,<task>,<row>, or None for the first page.
+    """
+    if 'after' not in query:
+        return None
+    try:
+        start, task, row = query['after'][0].split(',')
+        return float(start), int(task), int(row)
+    except ValueError:
+        raise RequestError(400, "Invalid value for after")
+
+def getIntervals(traceSet, query):
+    """
+    Returns the columns (task index, start, stop, core) of the intervals of the selected tasks in the window, sorted by
+    start (then task index and row of the interval in the task). At most limit (and maxIntervals) intervals are returned,
+    the second result is the cursor of the next page (after=<cursor>), or None if this is the last page.
+    """
+    left, right = getWindow(traceSet, query)
+    limit = min(max(getInt(query, 'limit', maxIntervals), 1), maxIntervals)
+    cursor = getCursor(query)
+    indexes = TraceStatistics.getWindowIndexes(traceSet)
+
+    taskIndexes = []
+    rows = []
+    starts = []
+    stops = []
+    cores = []
+    for task in getTasks(traceSet, query):
+        index = indexes[task]
+        taskIndex = traceSet.index(task)
+        first, end = index.intervalsInWindow(left, right)
+        if cursor is not None:
+            # Skip the intervals that are before the cursor (sent with the previous pages)
+            cursorStart, cursorTask, cursorRow = cursor
+            if taskIndex < cursorTask:
+                first = max(first, int(np.searchsorted(index.start, cursorStart, side='right')))
+            elif taskIndex == cursorTask:
+                first = max(first, int(np.searchsorted(index.start, cursorStart, side='left')), cursorRow)
+            else:
+                first = max(first, int(np.searchsorted(index.start, cursorStart, side='left')))
+        end = max(min(end, first + limit + 1), first)       # No task can contribute more than a page
+        taskIndexes.append(np.full(end - first, taskIndex, dtype=np.int64))
+        rows.append(np.arange(first, end, dtype=np.int64))
+        starts.append(index.start[first:end])
+        stops.append(index.stop[first:end])
+        cores.append(task.columns['interval_core'][first:end].astype(np.int64))
+
+    taskIndex = np.concatenate(taskIndexes) if len(taskIndexes) > 0 else np.zeros(0, dtype=np.int64)
+    row = np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=np.int64)
+    start = np.concatenate(starts) if len(starts) > 0 else np.zeros(0)
+    stop = np.concatenate(stops) if len(stops) > 0 else np.zeros(0)
+    core = np.concatenate(cores) if len(cores) > 0 else np.zeros(0, dtype=np.int64)
+
+    order = np.lexsort((row, taskIndex, start))
+    nextCursor = None
+    if len(order) > limit:
+        nextRow = order[limit]
+        nextCursor = repr(float(start[nextRow])) + ',' + str(int(taskIndex[nextRow])) + ',' + str(int(row[nextRow]))
+        order = order[:limit]
+    return taskIndex[order], start[order], stop[order], core[order], nextCursor
+
+class TraceRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the requests of the server (see the endpoints in the module description).
+    """
+    store = None        # TraceStore shared by all requests, set by serve()
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        binary = query.get('format', ['json'])[0] == 'binary'
+
+        try:
+            if url.path == '/':
+                self.sendJson({'endpoints': ['/recordings', '/tasks', '/occupancy', '/intervals']})
+            elif url.path == '/recordings':
+                self.sendJson(self.store.getRecordings())
+            elif url.path in ('/tasks', '/occupancy', '/intervals'):
+                try:
+                    traceSet = self.store.get(query.get('target', [None])[0], query.get('recording', [None])[0])
+                except LookupError as e:
+                    raise RequestError(404, str(e))
+
+                if url.path == '/tasks':
+                    self.sendJson(describeTasks(traceSet))
+                elif url.path == '/occupancy':
+                    edges, tasks, busy, cores = getOccupancy(traceSet, query)
+                    if binary:
+                        self.sendArray(busy, {'X-Start': edges[0], 'X-Stop': edges[-1], 'X-Tasks': ",".join(str(traceSet.index(task)) for task in tasks)})
+                    else:
+                        self.sendJson({'edges': edges.tolist(), 'tasks': {traceSet.index(task): row.tolist() for task, row in zip(tasks, busy)},
+                                       'cores': {core: {kind: values.tolist() for kind, values in kinds.items()} for core, kinds in cores.items()}})
+                else:
+                    taskIndex, start, stop, core, nextCursor = getIntervals(traceSet, query)
+                    if binary:
+                        self.sendArray(np.column_stack((taskIndex, start, stop, core)).astype(np.float64), {'X-Next': nextCursor if nextCursor is not None else ''})
+                    else:
+                        self.sendJson({'task': taskIndex.tolist(), 'start': start.tolist(), 'stop': stop.tolist(), 'core': core.tolist(), 'next': nextCursor})
+            else:
+                raise RequestError(404, "Unknown endpoint " + url.path)
+
+        except RequestError as e:
+            self.sendJson({'error': str(e)}, e.status)
+        except Exception as e:
+            self.sendJson({'error': type(e).__name__ + ": " + str(e)}, 500)
+
+    def sendJson(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendArray(self, array, headers):
+        body = np.ascontiguousarray(array, dtype='<f8').tobytes()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Shape', ",".join(str(size) for size in array.shape))
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(host, port, dataPath, preload=()):
+    """
+    Runs the server until it is interrupted. preload is a list of (target, recording) that are parsed before the server starts.
+    """
+    store = TraceStore(dataPath)
+    for target, recording in preload:
+        store.get(target, recording)
+
+    TraceRequestHandler.store = store
+    server = http.server.ThreadingHTTPServer((host, port), TraceRequestHandler)
+    HelperFunctions.printState("Serving traces", info="http://" + host + ":" + str(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Serves parsed traces over HTTP.")
+    ap.add_argument("--host", default="127.0.0.1", help="Address to bind to")
+    ap.add_argument("--port", type=int, default=8050, help="Port to listen on")
+    ap.add_argument("--data", default=TraceBatch.getDataPath(), help="Folder that contains the data folders of the targets")
+    ap.add_argument("--load", action="append", default=[], metavar="TARGET/RECORDING", help="Parse a recording at startup (can be repeated)")
+    args = ap.parse_args()
+
+    preload = []
+    for name in args.load:
+        if "/" not in name:
+            ap.error("--load expects TARGET/RECORDING")
+        preload.append(tuple(name.split("/", 1)))
+
+    serve(args.host, args.port, args.data, preload)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+from TraceTask import *
+import TraceColumns
+
+"""
+Kinds of tasks in a trace (see TraceSet.getTaskKind()).
+"""
+taskKinds = ('user', 'isr', 'scheduler', 'idle')
+
+class TraceSet():
+    """
+    Container for the tasks of a trace. It behaves like the list of tasks that was used before (iteration, len(),
+    indexing and index()), but keeps indexes to find tasks by id and name in O(1) and supports removing tasks in O(1).
+    It also holds the trace level information: where the trace comes from, the tick ids and the trace events.
+    """
+    def __init__(self, tasks=None, origin=None, traceFormat=None, tickIds=None, events=None, mutexTable=None):
+        self.tasks = {}                 # All tasks of the trace in insertion order (a dict is used as ordered set)
+        self.byId = {}                  # Task id -> list of tasks with this id (in insertion order)
+        self.byName = {}                # Task name -> list of tasks with this name (in insertion order)
+        self.order = None               # List of all tasks, created when a task is accessed by index
+        self.positions = None           # Task -> index of the task, created when index() is used
+
+        self.origin = origin            # Recording folder or trace file the trace was parsed from
+        self.traceFormat = traceFormat  # Name of the parser that created the trace ("FreeRTOS" or "Linux")
+        self.tickIds = tickIds          # Ids of the tick ISRs of each core (FreeRTOS only)
+        self.events = events            # Time sorted trace events (columns of TraceColumns.eventFields)
+        self.eventIndex = None          # Cached posting lists of the trace events (see getEventIndex())
+        self.mutexTable = mutexTable    # MutexAccessTable of the trace (filled by the parser, or created by getMutexTable())
+        self.statistics = None          # Cached task statistics (see TraceStatistics.getStatistics())
+        self.windowIndexes = None       # Cached window indexes of the tasks (see TraceStatistics.getWindowIndexes())
+        self.utilization = None         # Cached utilization index (see TraceUtilization.getUtilizationIndex())
+        self.mutexAnalysis = None       # Cached mutex analysis (see TraceContention.analyzeMutexes())
+        self.readyLatency = None        # Cached ready latency analysis (see TraceLatency.analyzeReadyLatency())
+        self.interruptProfile = None    # Cached interrupt profile (see TraceInterrupts.analyzeInterrupts())
+        self.periods = None             # Inferred periods of the tasks (see TracePeriods.inferPeriods())
+        self.preemptions = None         # Cached preemption analysis (see TracePreemption.analyzePreemptions())
+        self.issues = None              # Cached index of the timing issues (see TraceIssues.getIssueIndex())
+
+        if tasks is not None:
+            for task in tasks:
+                self.append(task)
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(list(self.tasks))   # Iterate over a copy, so tasks can be removed while iterating
+
+    def __contains__(self, task):
+        return task in self.tasks
+
+    def __getitem__(self, index):
+        if self.order is None:
+            self.order = list(self.tasks)
+        return self.order[index]
+
+    def __str__(self) -> str:
+        return "TraceSet (" + str(len(self)) + " tasks)"
+
+    def index(self, task):
+        """
+        Returns the position of the task in the trace.
+        """
+        if self.positions is None:
+            self.positions = {t: i for i, t in enumerate(self.tasks)}
+        return self.positions[task]
+
+    def append(self, task):
+        """
+        Adds a task to the trace.
+        """
+        if task in self.tasks:
+            return
+        self.tasks[task] = None
+        self.byId.setdefault(task.id, []).append(task)
+        self.byName.setdefault(task.name, []).append(task)
+        self.order = None
+        self.positions = None
+
+        if self.mutexTable is not None and task.mutexTable is None and len(task.jobs) == 0 and task.currentJob is None:
+            task.mutexTable = self.mutexTable   # Mutex accesses of the new task are added to the table of the trace
+
+    def remove(self, task):
+        """
+        Removes a task from the trace.
+        """
+        del self.tasks[task]
+        self.removeFromIndex(self.byId, task.id, task)
+        self.removeFromIndex(self.byName, task.name, task)
+        self.order = None
+        self.positions = None
+
+    def removeFromIndex(self, index, key, task):
+        tasks = index.get(key)
+        if tasks is not None and task in tasks:
+            tasks.remove(task)
+            if len(tasks) == 0:
+                del index[key]
+
+    def rename(self, task, name):
+        """
+        Changes the name of a task and updates the name index.
+        """
+        self.removeFromIndex(self.byName, task.name, task)
+        task.name = name
+        self.byName.setdefault(name, []).append(task)
+
+    def findById(self, id):
+        """
+        Returns the first task with the given id, or None if there is no such task.
+        """
+        tasks = self.byId.get(id)
+        return tasks[0] if tasks else None
+
+    def findByName(self, name):
+        """
+        Returns the first task with the given name, or None if there is no such task.
+        """
+        tasks = self.byName.get(name)
+        return tasks[0] if tasks else None
+
+    def getIdIndex(self):
+        """
+        Returns a dictionary task id -> task (the first task if several tasks have the same id).
+        """
+        return {id: tasks[0] for id, tasks in self.byId.items()}
+
+    def getNameIndex(self):
+        """
+        Returns a dictionary task name -> task (the first task if several tasks have the same name).
+        """
+        return {name: tasks[0] for name, tasks in self.byName.items()}
+
+    def getCoreIndex(self):
+        """
+        Returns a dictionary core -> list of tasks that execute on this core.
+        """
+        index = {}
+        for task in self.tasks:
+            for core in sorted(task.getCores()):
+                index.setdefault(core, []).append(task)
+        return dict(sorted(index.items()))
+
+    def getCores(self):
+        """
+        Returns the sorted list of cores used in the trace.
+        """
+        return list(self.getCoreIndex())
+
+    def getBounds(self):
+        """
+        Returns the release time of the first job and the finish time of the last job in the trace,
+        or (None, None) if no task has a job.
+        """
+        start = None
+        stop = None
+        for task in self.tasks:
+            if len(task.jobs) > 0:
+                release = task.jobs[0].releaseTime
+                if start is None or release < start:
+                    start = release
+            finish = task.getLastFinishTime()
+            if finish is not None and (stop is None or finish > stop):
+                stop = finish
+        return start, stop
+
+    def getEventIndex(self):
+        """
+        Returns the posting lists of the trace events (TraceColumns.EventIndex), or None if the trace set has no events.
+        """
+        if self.eventIndex is None and self.events is not None:
+            self.eventIndex = TraceColumns.EventIndex(self.events)
+        return self.eventIndex
+
+    def getMutexTable(self):
+        """
+        Returns the table of all mutex accesses of the trace. If the parser did not fill a table, it is created from the jobs.
+        """
+        if self.mutexTable is None:
+            self.mutexTable = MutexAccessTable.fromTasks(self)
+        return self.mutexTable
+
+    def getTaskKind(self, task):
+        """
+        Returns the kind of the task: 'idle', 'scheduler', 'isr' or 'user' (see taskKinds).
+        Scheduler and ISR tasks only exist in FreeRTOS traces, in Linux traces all threads except idle are user tasks.
+        """
+        if task.name[:4].upper() == 'IDLE':
+            return 'idle'
+        if self.traceFormat == "FreeRTOS":
+            if self.tickIds is not None and task.id in self.tickIds:
+                return 'isr'
+            if 100 <= task.id <= 100 + (len(self.tickIds) if self.tickIds is not None else 0):
+                return 'scheduler'
+        return 'user'
+
+    def getInfo(self):
+        """
+        Returns the trace level information (without tasks and events) as a dictionary, e.g. to send it to another process.
+        """
+        return {'origin': self.origin, 'traceFormat': self.traceFormat, 'tickIds': self.tickIds}
+
+    def select(self, condition):
+        """
+        Returns a new trace set with the same trace information and all tasks for which condition(task) is True.
+        """
+        selected = TraceSet([task for task in self.tasks if condition(task)], events=self.events, mutexTable=self.mutexTable, **self.getInfo())
+        selected.eventIndex = self.eventIndex
+        return selected
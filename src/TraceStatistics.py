@@ -0,0 +1,349 @@
+import numpy as np
+
+"""
+Timing statistics of the tasks of a trace.
+All statistics are computed with NumPy on the columns of frozen tasks (see TraceTask.freeze()), so they only take
+a few milliseconds even for traces with hundreds of thousands of jobs. Times are in the unit of the trace (see timeUnits).
+"""
+
+"""
+Unit of the timestamps for each trace format.
+"""
+timeUnits = {'FreeRTOS': 'us', 'Linux': 'ns'}
+
+"""
+Metrics computed for each job. The statistics (see summaryFields) are computed for each metric.
+"""
+jobMetrics = ('responseTime', 'executionTime', 'startLatency', 'releaseJitter')
+
+"""
+Statistics computed for each metric.
+"""
+summaryFields = ('min', 'avg', 'max', 'p50', 'p99')
+
+class TaskStatistics():
+    """
+    Timing statistics of one task.
+    """
+    def __init__(self, task):
+        self.task = task
+        self.jobs = 0               # Number of jobs
+        self.incompleteJobs = 0     # Number of jobs cut at the end of the trace (excluded from the statistics)
+        self.deadlineMisses = 0     # Number of jobs that finished after their deadline
+        self.metrics = {}           # Metric name -> dictionary with the statistics (see summaryFields)
+
+    def __str__(self) -> str:
+        return self.task.name + ": " + str(self.jobs) + " jobs, " + str(self.deadlineMisses) + " deadline misses"
+
+def summarize(values):
+    """
+    Returns a dictionary with the statistics (see summaryFields) of the values. All statistics are None if there are no values.
+    """
+    if len(values) == 0:
+        return {field: None for field in summaryFields}
+
+    p50, p99 = np.percentile(values, (50, 99))
+    return {'min': float(values.min()), 'avg': float(values.mean()), 'max': float(values.max()), 'p50': float(p50), 'p99': float(p99)}
+
+def getJobMetrics(task):
+    """
+    Returns the metrics of all jobs of the task as arrays (NaN if the metric is not defined for a job) and the deadline misses:
+    - responseTime: finish time - release time
+    - executionTime: sum of the length of all execution intervals
+    - startLatency: start of the first execution interval - release time
+    - releaseJitter: time between the release and the previous release - nominal inter-release time. The nominal
+      inter-release time is the median of the time between releases, so this does not depend on the unit of task.period.
+    - deadlineMiss: True if the job finished after its deadline. Jobs without deadline use the next release as deadline
+      (implicit deadline, as in the trace view).
+    - deadline: the deadline used for deadlineMiss (NaN for the last job if it has no deadline)
+    The task is frozen if it is not frozen yet.
+    """
+    task.freeze()
+    columns = task.columns
+
+    release = columns['job_release']
+    start = columns['job_start']
+    finish = columns['job_finish']
+    complete = ~columns['job_incomplete']
+
+    intervalLength = columns['interval_stop'] - columns['interval_start']
+    cumulative = np.concatenate(([0.0], np.cumsum(intervalLength)))
+    offsets = columns['job_intervalOffset']
+    executionTime = cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+    responseTime = np.where(complete, finish - release, np.nan)
+    executionTime = np.where(complete & ~np.isnan(finish), executionTime, np.nan)
+    startLatency = start - release
+
+    releaseJitter = np.full(len(release), np.nan)
+    if len(release) > 2:
+        interRelease = np.diff(release)
+        releaseJitter[1:] = interRelease - np.median(interRelease)
+
+    deadline = columns['job_deadline'].copy()
+    implicit = np.isnan(deadline)
+    implicit[-1:] = False       # The last job has no next release
+    deadline[implicit] = release[1:][implicit[:-1]]
+    with np.errstate(invalid='ignore'):
+        deadlineMiss = finish > deadline
+
+    return {
+        'responseTime': responseTime,
+        'executionTime': executionTime,
+        'startLatency': startLatency,
+        'releaseJitter': releaseJitter,
+        'deadlineMiss': deadlineMiss,
+        'deadline': deadline,
+    }
+
+def computeTaskStatistics(task):
+    """
+    Computes the timing statistics of one task.
+    """
+    metrics = getJobMetrics(task)
+
+    statistics = TaskStatistics(task)
+    statistics.jobs = len(task.jobs)
+    statistics.incompleteJobs = int(np.count_nonzero(task.columns['job_incomplete']))
+    statistics.deadlineMisses = int(np.count_nonzero(metrics['deadlineMiss']))
+
+    for name in jobMetrics:
+        values = metrics[name]
+        statistics.metrics[name] = summarize(values[~np.isnan(values)])
+
+    return statistics
+
+def getStatistics(traceSet):
+    """
+    Returns the statistics of all tasks of the trace set. The result is cached in the trace set.
+    """
+    if traceSet.statistics is None:
+        traceSet.statistics = [computeTaskStatistics(task) for task in traceSet]
+    return traceSet.statistics
+
+def getTimeUnit(traceSet):
+    """
+    Returns the unit of the timestamps of the trace set.
+    """
+    return timeUnits.get(traceSet.traceFormat, "ticks")
+
+def getStatisticsTable(traceSet):
+    """
+    Returns the column names and the rows (one per task) of the statistics table of the trace set.
+    """
+    unit = getTimeUnit(traceSet)
+    columns = ["Task", "Jobs", "Incomplete", "Deadline Misses"]
+    for name in jobMetrics:
+        for field in summaryFields:
+            columns.append(name + " " + field + " [" + unit + "]")
+
+    rows = []
+    for statistics in getStatistics(traceSet):
+        row = [statistics.task.name, statistics.jobs, statistics.incompleteJobs, statistics.deadlineMisses]
+        for name in jobMetrics:
+            for field in summaryFields:
+                value = statistics.metrics[name][field]
+                row.append("-" if value is None else round(value, 1))
+        rows.append(row)
+
+    return columns, rows
+
+class RangeMax():
+    """
+    Sparse table for range maximum queries. The table is built in O(n log n), each query takes O(1).
+    """
+    def __init__(self, values):
+        self.levels = [np.asarray(values, dtype=np.float64)]    # levels[k][i] = max(values[i:i + 2**k])
+        width = 1
+        while 2 * width <= len(values):
+            previous = self.levels[-1]
+            self.levels.append(np.maximum(previous[:-width], previous[width:]))
+            width = 2 * width
+
+    def query(self, first, last):
+        """
+        Returns the maximum of values[first:last + 1], or -inf if the range is empty.
+        """
+        if last < first:
+            return -np.inf
+        level = (last - first + 1).bit_length() - 1
+        values = self.levels[level]
+        return max(values[first], values[last - (1 << level) + 1])
+
+def coveredTime(start, stop, prefix, left, right):
+    """
+    Returns the time covered by the sorted, non overlapping intervals [start[i], stop[i]] between left and right.
+    prefix holds the prefix sums of the interval lengths (with a leading 0).
+    """
+    first = int(np.searchsorted(stop, left, side='right'))     # First interval that ends after left
+    end = int(np.searchsorted(start, right, side='left'))      # Intervals [first, end) start before right
+    if end <= first:
+        return 0.0
+
+    covered = prefix[end] - prefix[first]
+    covered = covered - max(0.0, left - start[first])           # Cut the intervals at the window boundaries
+    covered = covered - max(0.0, stop[end - 1] - right)
+    return float(covered)
+
+class TaskWindowIndex():
+    """
+    Prefix sums of the execution time (for the task and for each core) and a range maximum table of the response times
+    of one task. They are built once, afterwards the statistics of any time window are computed in O(log n).
+    """
+    def __init__(self, task):
+        task.freeze()
+        columns = task.columns
+        self.task = task
+
+        self.start = columns['interval_start']
+        self.stop = columns['interval_stop']
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.stop - self.start)))
+
+        self.cores = {}     # Core -> (start, stop, prefix) of the intervals on this core
+        for core in np.unique(columns['interval_core']).tolist():
+            onCore = columns['interval_core'] == core
+            start = self.start[onCore]
+            stop = self.stop[onCore]
+            self.cores[core] = (start, stop, np.concatenate(([0.0], np.cumsum(stop - start))))
+
+        responseTime = columns['job_finish'] - columns['job_release']
+        responseTime[columns['job_incomplete'] | np.isnan(responseTime)] = -np.inf
+        self.responseTimes = RangeMax(responseTime)
+
+    def busyTime(self, left, right, core=None):
+        """
+        Returns the execution time of the task (on the given core, or on all cores) between left and right.
+        """
+        if core is None:
+            return coveredTime(self.start, self.stop, self.prefix, left, right)
+        if core not in self.cores:
+            return 0.0
+        return coveredTime(*self.cores[core], left, right)
+
+    def busyUntil(self, times):
+        """
+        Returns the execution time of the task from the start of the trace up to each of the (sorted or unsorted) times.
+        The intervals of a task do not overlap, so this is the prefix sum of the finished intervals plus the executed
+        part of the next interval.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        finished = np.searchsorted(self.stop, times, side='right')
+        busy = self.prefix[finished]
+        running = finished < len(self.start)
+        following = finished[running]
+        busy[running] = busy[running] + np.clip(times[running] - self.start[following], 0.0, self.stop[following] - self.start[following])
+        return busy
+
+    def intervalsInWindow(self, left, right):
+        """
+        Returns the index of the first interval that ends after left and the index after the last interval that starts before right.
+        """
+        return int(np.searchsorted(self.stop, left, side='right')), int(np.searchsorted(self.start, right, side='left'))
+
+    def jobsInWindow(self, left, right):
+        """
+        Returns the index of the first and last job that may be visible between left and right (see TraceTask.getVisibleJobs()).
+        """
+        return self.task.getVisibleJobs(left, right)
+
+    def maxResponseTime(self, left, right):
+        """
+        Returns the maximum response time of the complete jobs visible between left and right, or None if there is no such job.
+        """
+        first, last = self.jobsInWindow(left, right)
+        value = self.responseTimes.query(max(first, 0), min(last, len(self.task.jobs) - 1))
+        return None if value == -np.inf else float(value)
+
+class WindowStatistics():
+    """
+    Statistics of a time window of the trace.
+    """
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.tasks = []             # List of (task, busy time, number of jobs, max response time or None)
+        self.coreBusy = {}          # Core -> busy time (all tasks except the idle tasks)
+        self.jobs = 0               # Number of jobs in the window (all tasks)
+        self.maxResponseTime = None # Max response time in the window (all tasks except idle tasks)
+        self.maxResponseTask = None # Task with the max response time
+
+def getWindowIndexes(traceSet):
+    """
+    Returns the window indexes of all tasks of the trace set. They are built on the first call and cached in the trace set.
+    """
+    if traceSet.windowIndexes is None:
+        traceSet.windowIndexes = {task: TaskWindowIndex(task) for task in traceSet}
+    return traceSet.windowIndexes
+
+def getWindowStatistics(traceSet, left, right):
+    """
+    Returns the statistics of the time window [left, right] of the trace: busy time and number of jobs of each task,
+    busy time of each core and the max response time.
+    """
+    statistics = WindowStatistics(left, right)
+
+    for task, index in getWindowIndexes(traceSet).items():
+        first, last = index.jobsInWindow(left, right)
+        jobs = max(0, min(last, len(task.jobs) - 1) - max(first, 0) + 1)
+        maxResponseTime = index.maxResponseTime(left, right)
+        statistics.tasks.append((task, index.busyTime(left, right), jobs, maxResponseTime))
+        statistics.jobs = statistics.jobs + jobs
+
+        if task.name[:4] != 'IDLE':     # Idle tasks do not count as busy time
+            for core in index.cores:
+                statistics.coreBusy[core] = statistics.coreBusy.get(core, 0.0) + index.busyTime(left, right, core)
+
+            if maxResponseTime is not None and (statistics.maxResponseTime is None or maxResponseTime > statistics.maxResponseTime):
+                statistics.maxResponseTime = maxResponseTime
+                statistics.maxResponseTask = task
+
+    statistics.coreBusy = dict(sorted(statistics.coreBusy.items()))
+    return statistics
+
+def getWindowSummary(traceSet, left, right):
+    """
+    Returns a one line summary of the statistics of the time window, e.g. for a status label.
+    """
+    statistics = getWindowStatistics(traceSet, left, right)
+    unit = getTimeUnit(traceSet)
+    length = right - left
+
+    text = "Window: " + str(round(length, 1)) + " " + unit + "   Jobs: " + str(statistics.jobs)
+    for core, busy in statistics.coreBusy.items():
+        text = text + "   Core " + str(core) + ": " + str(round(100 * busy / length, 1)) + "% busy"
+    if statistics.maxResponseTime is not None:
+        text = text + "   Max RT: " + str(round(statistics.maxResponseTime, 1)) + " " + unit + " (" + statistics.maxResponseTask.name + ")"
+    return text
+
+def getWindowStatisticsTable(traceSet, left, right):
+    """
+    Returns the column names and the rows (one per task) of the statistics of the time window.
+    """
+    statistics = getWindowStatistics(traceSet, left, right)
+    unit = getTimeUnit(traceSet)
+    length = right - left
+
+    columns = ["Task", "Jobs", "Busy [" + unit + "]", "Busy [%]", "Max RT [" + unit + "]"]
+    rows = []
+    for task, busy, jobs, maxResponseTime in statistics.tasks:
+        rows.append([task.name, jobs, round(busy, 1), round(100 * busy / length, 1), "-" if maxResponseTime is None else round(maxResponseTime, 1)])
+    return columns, rows
+
+if __name__ == "__main__":
+    """
+    Prints the statistics of a FreeRTOS recording (folder with the raw_buffer files).
+    """
+    import sys
+    import time
+    import TraceParserFreeRTOS
+
+    tasks, events = TraceParserFreeRTOS.parseRecording(sys.argv[1], 2)
+
+    startTime = time.perf_counter()
+    getStatistics(tasks)
+    duration = time.perf_counter() - startTime
+
+    columns, rows = getStatisticsTable(tasks)
+    for row in rows:
+        print(", ".join(str(column) + "=" + str(value) for column, value in zip(columns, row)))
+    print("Statistics computed in " + str(round(duration * 1000, 1)) + " ms")
@@ -1,6 +1,13 @@
 from enum import Enum
+from collections.abc import Sequence
+import numpy as np
 
 class MutexAccess():
+    """
+    The class implements an access to a mutex (i.e. a critical section) of a job in the trace.
+    """
+    __slots__ = ('start', 'stop', 'mutexId', 'letter')
+
     def __init__(self, startTime, mutexId, letter):
         self.start = startTime
         self.stop = None
@@ -21,13 +28,17 @@ class ExecutionType(Enum):
 class TraceInterval():
     """
     The class implements an execution interval of a job in the trace. 
+    A long trace creates millions of intervals, therefore all model classes use __slots__ instead of a per-instance __dict__.
     """
+    __slots__ = ('type', 'core', 'start', 'stop')
+
     def __init__(self, startTime, core, type):
-        self.type = type
-        self.core = core
+        self.type = type            # ExecutionType member (shared by all intervals)
+        self.core = core            # Core id (small ints are shared by python)
         self.start = startTime
+        self.stop = None
 
-    def stop(self, stopTime):
+    def finish(self, stopTime):
         self.stop = stopTime
 
     def __str__(self):
@@ -37,6 +48,8 @@ class TraceJob():
     """
     The class implements a job of a task in the trace.
     """
+    __slots__ = ('task', 'id', 'execIntervals', 'releaseTime', 'deadline', 'activeInterval', 'incomplete', 'mutexAccess', 'heldMutexes')
+
     def __init__(self, task, id, releaseTime, deadline):
         self.task = task                    # Stores the task this job belongs to
         self.id = id                        # Job id
@@ -46,6 +59,7 @@ class TraceJob():
         self.activeInterval = None          # Stores the current execution interval (i.e. this interval is not complete)
         self.incomplete = False             # A flag to indicate if this job was stopped before completion (i.e. cut at the end of the trace)
         self.mutexAccess = []               # List of all MutexAccess of the job
+        self.heldMutexes = None             # Mutex id -> MutexAccess of all mutexes currently held by the job (created on the first take)
 
     def __str__(self) -> str:
         return self.task.name + "-" + str(self.id)
@@ -59,6 +73,26 @@ class TraceJob():
         for seg in self.execIntervals:
             print("\t\t" + str(seg))
 
+    def copy(self, task):
+        """
+        Returns a copy of the (unfinished) job for the given task. The active interval and the mutex accesses are copied,
+        since they still change while the job is parsed. The finished intervals are shared.
+        """
+        job = TraceJob(task, self.id, self.releaseTime, self.deadline)
+        job.execIntervals = list(self.execIntervals)
+        job.incomplete = self.incomplete
+        if self.activeInterval is not None:
+            job.activeInterval = TraceInterval(self.activeInterval.start, self.activeInterval.core, self.activeInterval.type)
+
+        accesses = {}
+        for access in self.mutexAccess:
+            accesses[id(access)] = MutexAccess(access.start, access.mutexId, access.letter)
+            accesses[id(access)].stop = access.stop
+            job.mutexAccess.append(accesses[id(access)])
+        if self.heldMutexes is not None:
+            job.heldMutexes = {mutexId: accesses[id(access)] for mutexId, access in self.heldMutexes.items()}
+        return job
+
     def getStartTime(self):
         """
         Returns the start time of the job, or None if there was no execution.
@@ -91,7 +125,7 @@ class TraceJob():
         """
         assert self.activeInterval != None
 
-        self.activeInterval.stop(ts)
+        self.activeInterval.finish(ts)
         self.execIntervals.append(self.activeInterval)
         self.activeInterval = None
 
@@ -99,27 +133,33 @@ class TraceJob():
         """
         Start a new critical section.
         """
+        if self.heldMutexes is None:
+            self.heldMutexes = {}
 
-        for access in self.mutexAccess:     # Make sure there is no ongoing access to this mutex
-            if access.mutexId == mutexId:
-                assert access.stop != None, "Trying to take mutex " + str(mutexId) + " while still holding the mutex."
+        # Make sure there is no ongoing access to this mutex
+        assert mutexId not in self.heldMutexes, "Trying to take mutex " + str(mutexId) + " while still holding the mutex."
 
         newAccess = MutexAccess(ts, mutexId, letterId)
         self.mutexAccess.append(newAccess)
+        self.heldMutexes[mutexId] = newAccess
+
+        if self.task is not None and self.task.mutexTable is not None:
+            self.task.mutexTable.add(self.task, self.id, newAccess)
 
     def mutexGive(self, ts, mutexId):
         """
-        Finish a critical section.
+        Finish a critical section. Giving a mutex that is not held by the job is ignored.
         """
-
-        for access in self.mutexAccess:
-            if access.mutexId == mutexId:
-                access.stop = ts
+        if self.heldMutexes is not None:
+            access = self.heldMutexes.pop(mutexId, None)
+            if access is not None:
+                access.finish(ts)
 
 class TraceTask():
     """
     The class implements a task used to store trace information.
     """
+    __slots__ = ('id', 'name', 'priority', 'jobs', 'currentJob', 'delayUntil', 'period', 'taskColor', 'leftIndex', 'rightIndex', 'columns', 'intTime', 'mutexTable')
 
     def __init__(self, id, name, priority, color):
         self.id = id                # Task ID
@@ -129,6 +169,9 @@ class TraceTask():
         self.currentJob = None
         self.delayUntil = False     # Flag to indicate if delay until was called
         self.period = None          # Period of the task, if set by user-event
+        self.columns = None         # Columns of all jobs once the task is frozen (see freeze())
+        self.intTime = False        # True if the timestamps of the frozen task are integers
+        self.mutexTable = None      # MutexAccessTable of the trace, new mutex accesses of the jobs are added to it (if set)
 
         # Used for the visualization only
         self.taskColor = color      # Color of the task in the trace
@@ -209,10 +252,18 @@ class TraceTask():
 
     def getMaxResponseTime(self):
         """
-        Returns the maximum (observed) response time of all jobs of this task
+        Returns the maximum (observed) response time of all jobs of this task, or None if no job executed.
         """
+        if self.columns is not None:
+            responseTimes = self.columns['job_finish'] - self.columns['job_release']
+            if np.all(np.isnan(responseTimes)):
+                return None
+            return self.toTime(np.nanmax(responseTimes))
+
         maxRt = None
         for j in self.jobs:
+            if j.getFinishTime() is None:   # Jobs that never executed have no response time
+                continue
             rt = (j.getFinishTime() - j.releaseTime)
             if maxRt == None or maxRt < rt:
                 maxRt = rt
@@ -232,13 +283,348 @@ class TraceTask():
         assert self.currentJob != None
         self.currentJob.mutexGive(ts, mutexId)
 
+    def freeze(self):
+        """
+        Converts all jobs of the task into contiguous NumPy columns (see jobColumnTypes) and replaces the list of jobs
+        with a read-only view on those columns. task.jobs[i].execIntervals etc. still work, but analyses and the trace view
+        can work on the columns directly. The task must not be extended by the parser anymore.
+        """
+        if self.columns is not None:
+            return
+
+        jobs = self.jobs
+        columns = {name: [] for name in jobColumnTypes}
+        columns['job_intervalOffset'].append(0)
+        columns['job_mutexOffset'].append(0)
+
+        for job in jobs:
+            columns['job_id'].append(job.id)
+            columns['job_release'].append(job.releaseTime)
+            columns['job_deadline'].append(np.nan if job.deadline is None else job.deadline)
+            columns['job_incomplete'].append(job.incomplete)
+
+            for interval in job.execIntervals:
+                columns['interval_start'].append(interval.start)
+                columns['interval_stop'].append(interval.stop)
+                columns['interval_core'].append(interval.core)
+                columns['interval_type'].append(interval.type.value)
+            columns['job_intervalOffset'].append(len(columns['interval_start']))
+
+            for access in job.mutexAccess:
+                columns['mutex_start'].append(access.start)
+                columns['mutex_stop'].append(np.nan if access.stop is None else access.stop)
+                columns['mutex_id'].append(access.mutexId)
+                columns['mutex_letter'].append(0 if access.letter is None else ord(access.letter))
+            columns['job_mutexOffset'].append(len(columns['mutex_start']))
+
+        intTime = len(jobs) > 0 and isinstance(jobs[0].releaseTime, (int, np.integer))
+        self.jobs = []
+        self.appendColumns({name: np.asarray(values, dtype=jobColumnTypes[name]) for name, values in columns.items() if name not in derivedColumns}, intTime)
+
+    def appendColumns(self, columns, intTime):
+        """
+        Appends jobs given as columns to the task. The offset columns have one entry more than the job columns and start at 0.
+        The task is frozen first if needed.
+        """
+        if self.columns is None:
+            if len(self.jobs) > 0:
+                self.freeze()
+            else:
+                self.columns = {name: np.zeros(1 if name in offsetColumns else 0, dtype=dtype) for name, dtype in jobColumnTypes.items()}
+                self.jobs = FrozenJobs(self)
+
+        old = self.columns
+        new = {}
+        for name, dtype in jobColumnTypes.items():
+            if name in derivedColumns:
+                continue
+            values = np.asarray(columns[name], dtype=dtype)
+            if name in offsetColumns:
+                base = old[name][-1]
+                new[name] = np.concatenate((old[name], values[1:] - values[0] + base))
+            else:
+                new[name] = np.concatenate((old[name], values))
+
+        # Start and finish time of every job, NaN if the job did not execute
+        intervalOffset = new['job_intervalOffset']
+        executed = intervalOffset[1:] > intervalOffset[:-1]
+        new['job_start'] = np.full(len(new['job_id']), np.nan)
+        new['job_finish'] = np.full(len(new['job_id']), np.nan)
+        new['job_start'][executed] = new['interval_start'][intervalOffset[:-1][executed]]
+        new['job_finish'][executed] = new['interval_stop'][intervalOffset[1:][executed] - 1]
+
+        # Latest finish time up to every job (the release time is used for jobs without execution). This is monotonic, so
+        # the visible jobs can be found with a binary search.
+        new['job_finishMax'] = np.fmax.accumulate(np.where(executed, new['job_finish'], new['job_release'])) if len(executed) > 0 else np.zeros(0)
+
+        self.columns = new
+        self.intTime = intTime
+
+    def setColumns(self, columns, intTime):
+        """
+        Uses the given columns (all columns of jobColumnTypes, including the derived columns) as the jobs of the task without
+        copying them, e.g. columns that are memory mapped from a trace archive. The task must not have jobs yet.
+        """
+        assert len(self.jobs) == 0 and self.columns is None, "setColumns() needs a task without jobs"
+        self.columns = {name: columns[name] for name in jobColumnTypes}
+        self.jobs = FrozenJobs(self)
+        self.intTime = intTime
+
+    def toTime(self, value):
+        """
+        Converts a time from the columns of the frozen task to the time type used by the parser (None for NaN).
+        """
+        if value != value:
+            return None
+        return int(value) if self.intTime else float(value)
+
+    def getVisibleJobs(self, leftTime, rightTime):
+        """
+        Returns the index of the first and last job of the frozen task that may be visible between leftTime and rightTime,
+        i.e. the first job that finishes after leftTime and the last job that is released before rightTime.
+        """
+        first = int(np.searchsorted(self.columns['job_finishMax'], leftTime, side='right'))
+        last = int(np.searchsorted(self.columns['job_release'], rightTime, side='right')) - 1
+        return first, last
+
+    def getLastFinishTime(self):
+        """
+        Returns the finish time of the last job that executed, or None if no job executed.
+        """
+        if self.columns is not None:
+            finish = self.columns['job_finish']
+            executed = np.flatnonzero(~np.isnan(finish))
+            return self.toTime(finish[executed[-1]]) if len(executed) > 0 else None
+
+        for job in reversed(self.jobs):
+            if job.getFinishTime() != None:
+                return job.getFinishTime()
+        return None
+
+    def getCores(self, firstJob=0):
+        """
+        Returns the set of cores on which the jobs task.jobs[firstJob:] executed.
+        """
+        if self.columns is not None:
+            first = self.columns['job_intervalOffset'][min(firstJob, len(self.jobs))]
+            return set(np.unique(self.columns['interval_core'][first:]).tolist())
+
+        cores = set()
+        for job in self.jobs[firstJob:]:
+            for interval in job.execIntervals:
+                cores.add(interval.core)
+        return cores
+
+class MutexAccessTable():
+    """
+    Table of the mutex accesses of all tasks of a trace. Each row references the task, the job id and the MutexAccess,
+    so the stop time of an access is always up to date. An index per mutex id gives the rows of each mutex.
+    """
+    __slots__ = ('tasks', 'jobIds', 'accesses', 'byMutex')
+
+    def __init__(self):
+        self.tasks = []             # Task of each row
+        self.jobIds = []            # Job id of each row
+        self.accesses = []          # MutexAccess of each row
+        self.byMutex = {}           # Mutex id -> rows of all accesses to the mutex
+
+    @classmethod
+    def fromTasks(cls, tasks):
+        """
+        Creates a table with the mutex accesses of all jobs of the given tasks. The rows of each mutex are sorted by the start of the access.
+        """
+        table = cls()
+        for task in tasks:
+            columns = task.columns
+            if columns is not None and len(columns['mutex_id']) == 0:
+                continue    # Frozen task without mutex access, skip creating the job views
+            for job in task.jobs:
+                for access in job.mutexAccess:
+                    table.add(task, job.id, access)
+
+        for rows in table.byMutex.values():
+            rows.sort(key=lambda row: table.accesses[row].start)
+        return table
+
+    def __len__(self):
+        return len(self.accesses)
+
+    def add(self, task, jobId, access):
+        """
+        Adds the mutex access of a job to the table and returns its row.
+        """
+        row = len(self.accesses)
+        self.tasks.append(task)
+        self.jobIds.append(jobId)
+        self.accesses.append(access)
+        self.byMutex.setdefault(access.mutexId, []).append(row)
+        return row
+
+    def getMutexIds(self):
+        """
+        Returns the ids of all mutexes in the table.
+        """
+        return list(self.byMutex)
+
+    def getRows(self, mutexId):
+        """
+        Returns the rows of all accesses to the given mutex.
+        """
+        return self.byMutex.get(mutexId, [])
+
+    def getAccesses(self, mutexId):
+        """
+        Returns a list of (task, job id, MutexAccess) of all accesses to the given mutex.
+        """
+        return [(self.tasks[row], self.jobIds[row], self.accesses[row]) for row in self.getRows(mutexId)]
+
+    def getColumns(self):
+        """
+        Returns the table as NumPy columns (mutex_start, mutex_stop, mutex_id and mutex_jobId). A missing stop time is NaN.
+        """
+        return {
+            'mutex_start':  np.asarray([access.start for access in self.accesses], dtype=np.float64),
+            'mutex_stop':   np.asarray([np.nan if access.stop is None else access.stop for access in self.accesses], dtype=np.float64),
+            'mutex_id':     np.asarray([access.mutexId for access in self.accesses], dtype=np.int64),
+            'mutex_jobId':  np.asarray(self.jobIds, dtype=np.int64),
+        }
+
+"""
+Columns of a frozen task. Times are stored as float64, times that are not set (e.g. the deadline) are NaN.
+The job_intervalOffset and job_mutexOffset columns hold the first interval/mutex access row of every job and the total number of rows at the end.
+"""
+jobColumnTypes = {
+    'job_id':               np.int64,
+    'job_release':          np.float64,
+    'job_deadline':         np.float64,
+    'job_start':            np.float64,
+    'job_finish':           np.float64,
+    'job_finishMax':        np.float64,
+    'job_incomplete':       np.bool_,
+    'job_intervalOffset':   np.int64,
+    'job_mutexOffset':      np.int64,
+    'interval_start':       np.float64,
+    'interval_stop':        np.float64,
+    'interval_core':        np.int16,
+    'interval_type':        np.int8,
+    'mutex_start':          np.float64,
+    'mutex_stop':           np.float64,
+    'mutex_id':             np.int64,
+    'mutex_letter':         np.uint8,
+}
+
+"""
+Columns that are computed from the other columns when jobs are appended to a frozen task.
+"""
+derivedColumns = ('job_start', 'job_finish', 'job_finishMax')
+
+"""
+Columns that map jobs to interval and mutex access rows.
+"""
+offsetColumns = ('job_intervalOffset', 'job_mutexOffset')
+
+class FrozenJobs(Sequence):
+    """
+    Read-only list of the jobs of a frozen task. The jobs are created on access as JobView objects.
+    """
+    __slots__ = ('task',)
+
+    def __init__(self, task):
+        self.task = task
+
+    def __len__(self):
+        return len(self.task.columns['job_id'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [JobView(self.task, i) for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index = index + len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("job index out of range")
+        return JobView(self.task, index)
+
+class JobView():
+    """
+    A job of a frozen task. It has the same attributes as a TraceJob, but reads them from the columns of the task.
+    Intervals and mutex accesses are created on access.
+    """
+    __slots__ = ('task', 'index')
+
+    def __init__(self, task, index):
+        self.task = task
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, JobView) and self.task is other.task and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.task), self.index))
+
+    __str__ = TraceJob.__str__
+    printInfo = TraceJob.printInfo
+
+    @property
+    def id(self):
+        return int(self.task.columns['job_id'][self.index])
+
+    @property
+    def releaseTime(self):
+        return self.task.toTime(self.task.columns['job_release'][self.index])
+
+    @property
+    def deadline(self):
+        return self.task.toTime(self.task.columns['job_deadline'][self.index])
+
+    @property
+    def incomplete(self):
+        return bool(self.task.columns['job_incomplete'][self.index])
+
+    @property
+    def activeInterval(self):
+        return None
+
+    @property
+    def execIntervals(self):
+        columns = self.task.columns
+        toTime = self.task.toTime
+        intervals = []
+        for i in range(columns['job_intervalOffset'][self.index], columns['job_intervalOffset'][self.index + 1]):
+            interval = TraceInterval(toTime(columns['interval_start'][i]), int(columns['interval_core'][i]), ExecutionType(int(columns['interval_type'][i])))
+            interval.finish(toTime(columns['interval_stop'][i]))
+            intervals.append(interval)
+        return intervals
+
+    @property
+    def mutexAccess(self):
+        columns = self.task.columns
+        toTime = self.task.toTime
+        accesses = []
+        for i in range(columns['job_mutexOffset'][self.index], columns['job_mutexOffset'][self.index + 1]):
+            letter = None if columns['mutex_letter'][i] == 0 else chr(columns['mutex_letter'][i])
+            access = MutexAccess(toTime(columns['mutex_start'][i]), int(columns['mutex_id'][i]), letter)
+            access.finish(toTime(columns['mutex_stop'][i]))
+            accesses.append(access)
+        return accesses
+
+    def getStartTime(self):
+        return self.task.toTime(self.task.columns['job_start'][self.index])
+
+    def getFinishTime(self):
+        return self.task.toTime(self.task.columns['job_finish'][self.index])
+
 def findTaskByName(tasks, name):
+    if hasattr(tasks, 'findByName'):   # TraceSet, use the name index
+        return tasks.findByName(name)
     for task in tasks:
         if task.name == name:
             return task
     return None
 
 def findTaskById(tasks, id):
+    if hasattr(tasks, 'findById'):     # TraceSet, use the id index
+        return tasks.findById(id)
     for task in tasks:
         if task.id == id:
             return task
@@ -249,7 +635,7 @@ if __name__ == "__main__":
     """
     print("TraceTask Test")
 
-    task = TraceTask("TestTask", "#121212")
+    task = TraceTask(1, "TestTask", 1, "#121212")
     task.newJob(0, 100)
     task.startExec(1, 1, ExecutionType.READ)
     task.stopExec(10)
@@ -0,0 +1,114 @@
+import numpy as np
+from TraceSet import taskKinds
+
+"""
+Per-core CPU utilization over time.
+The execution intervals of all tasks are collected once into trace level columns and grouped by core and task kind
+(user, isr, scheduler, idle). For each group, the sorted start and stop times and their prefix sums give the busy time
+up to any point in time, so the utilization of all bins of a time window is computed with a few binary searches per group.
+"""
+
+class UtilizationIndex():
+    """
+    Sorted interval columns of a trace, grouped by core and task kind.
+    """
+    def __init__(self, traceSet):
+        starts = []
+        stops = []
+        cores = []
+        kinds = []
+        for task in traceSet:
+            task.freeze()
+            columns = task.columns
+            starts.append(columns['interval_start'])
+            stops.append(columns['interval_stop'])
+            cores.append(columns['interval_core'].astype(np.int64))
+            kinds.append(np.full(len(columns['interval_start']), taskKinds.index(traceSet.getTaskKind(task)), dtype=np.int64))
+
+        start = np.concatenate(starts) if len(starts) > 0 else np.zeros(0)
+        stop = np.concatenate(stops) if len(stops) > 0 else np.zeros(0)
+        core = np.concatenate(cores) if len(cores) > 0 else np.zeros(0, dtype=np.int64)
+        kind = np.concatenate(kinds) if len(kinds) > 0 else np.zeros(0, dtype=np.int64)
+
+        self.cores = np.unique(core).tolist()
+        self.groups = {}    # (core, kind) -> (sorted starts, prefix sums of starts, sorted stops, prefix sums of stops)
+
+        # Sort all intervals by group once, then split the columns into the groups.
+        group = core * len(taskKinds) + kind
+        order = np.argsort(group, kind='stable')
+        group = group[order]
+        start = start[order]
+        stop = stop[order]
+        bounds = np.flatnonzero(np.diff(group)) + 1
+
+        for first, last in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(group)]))):
+            if last <= first:
+                continue
+            groupStart = np.sort(start[first:last])
+            groupStop = np.sort(stop[first:last])
+            key = (int(group[first]) // len(taskKinds), taskKinds[int(group[first]) % len(taskKinds)])
+            self.groups[key] = (groupStart, np.concatenate(([0.0], np.cumsum(groupStart))), groupStop, np.concatenate(([0.0], np.cumsum(groupStop))))
+
+    def busyUntil(self, core, kind, times):
+        """
+        Returns the busy time of the tasks of the given kind on the core from the start of the trace up to each of the times.
+        This is sum(clip(t - start, 0, stop - start)) over all intervals, computed as the contribution of the started
+        intervals minus the contribution of the finished intervals.
+        """
+        if (core, kind) not in self.groups:
+            return np.zeros(len(times))
+
+        start, startPrefix, stop, stopPrefix = self.groups[(core, kind)]
+        started = np.searchsorted(start, times, side='right')
+        finished = np.searchsorted(stop, times, side='right')
+        return (started * times - startPrefix[started]) - (finished * times - stopPrefix[finished])
+
+class Utilization():
+    """
+    Utilization of each core in the bins of a time window. busy[core][kind] is an array with the fraction (0 to 1) of each bin
+    in which tasks of this kind executed on the core.
+    """
+    def __init__(self, edges, cores):
+        self.edges = edges      # Bin edges (one more than bins)
+        self.cores = cores      # Cores in the trace
+        self.busy = {}          # Core -> kind -> busy fraction per bin
+
+def getUtilizationIndex(traceSet):
+    """
+    Returns the utilization index of the trace set. It is built on the first call and cached in the trace set.
+    """
+    if traceSet.utilization is None:
+        traceSet.utilization = UtilizationIndex(traceSet)
+    return traceSet.utilization
+
+def getUtilization(traceSet, left, right, bins):
+    """
+    Returns the utilization of each core and task kind in the given number of bins between left and right.
+    """
+    index = getUtilizationIndex(traceSet)
+    edges = np.linspace(left, right, bins + 1)
+    width = np.diff(edges)
+
+    utilization = Utilization(edges, index.cores)
+    for core in index.cores:
+        utilization.busy[core] = {}
+        for kind in taskKinds:
+            busy = np.diff(index.busyUntil(core, kind, edges))
+            utilization.busy[core][kind] = np.clip(busy / width, 0.0, 1.0)
+
+    return utilization
+
+if __name__ == "__main__":
+    """
+    Prints the utilization of a FreeRTOS recording (folder with the raw_buffer files) in 10 bins.
+    """
+    import sys
+    import TraceParserFreeRTOS
+
+    tasks, events = TraceParserFreeRTOS.parseRecording(sys.argv[1], 2)
+    start, stop = tasks.getBounds()
+    utilization = getUtilization(tasks, start, stop, 10)
+
+    for core in utilization.cores:
+        for kind in taskKinds:
+            print("Core " + str(core) + " " + kind + ": " + " ".join(str(round(100 * value)) + "%" for value in utilization.busy[core][kind]))
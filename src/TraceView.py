@@ -1,5 +1,11 @@
 import customtkinter
 import math
+import numpy as np
+import HelperFunctions
+import TraceStatistics
+import TraceUtilization
+import TraceLatency
+import TraceIssues
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
@@ -32,6 +38,13 @@ class TraceView(customtkinter.CTkCanvas):
         self.maxTicks = 20                                      # Maximum number of tick marks plotted in view
         self.mutexAccessHeight = 15                             # Complete height of the symbol to denote access to a mutex
         self.mutexAccessDiameter = 10                           # Diameter of the circle used in the mutex access symbol
+        self.showUtilization = True                             # Show the utilization strip chart of each core below the tasks
+        self.utilizationHeight_px = 30                          # Height of the utilization strip chart of one core
+        self.utilizationBin_px = 4                              # Width of one utilization bin
+        self.utilizationColors = {'user': '#6298D2', 'isr': '#F5697C', 'scheduler': '#CC9DFB', 'idle': '#DDDDDD'}   # Colors of the task kinds in the utilization chart
+        self.showReadyPhases = True                             # Show the time a task is ready but not running as a hatched segment
+        self.readyHatchColor = '#808080'                        # Color of the hatch lines of the ready segments
+        self.readyHatch_px = 6                                  # Distance between two hatch lines
 
         # --> Internal variables. No manual configuration needed! <--
         self.sizeX_px = 0                                       # Width of the canvas
@@ -54,12 +67,24 @@ class TraceView(customtkinter.CTkCanvas):
         self.pdf_scale = 1
         self.pdf_height_pt = 0
         self.pdf_padding_north = 3
+        self.statusLabel = None                                 # Label that shows the statistics of the visible window (optional)
+        self.issueRow = None                                    # Index of the issue (see TraceIssues) the view was centered on last
+        self.issueView = None                                   # View bounds after centering on the issue, to detect if the view was moved since
+        self.fitWindowHeight = True                             # Resize the window of the GUI to the height of the trace
+        self.linkedViews = []                                   # Views that show the same time window (e.g. to compare two traces)
+        self.highlights = None                                  # Task -> (start times, stop times) of time windows that are outlined (e.g. regressed jobs)
+        self.highlightColor = '#E0001B'                         # Color of the outline of the highlighted time windows
+        self.windowSource = None                                # Windowed parser that reconstructs the visible jobs (see ParserWorker.WindowedParserJob)
+        self.loadedWindow = None                                # Time window (start, stop) of the jobs of the tasks, if they come from the windowSource
+        self.requestedWindow = None                             # Time window that was last requested from the windowSource
 
         self.ctk_textbox_scrollbar = customtkinter.CTkScrollbar(self, command=self.yview)
         self.ctk_textbox_scrollbar.place(relx=1,rely=0,relheight=1,anchor='ne')
         self.configure(yscrollcommand=self.ctk_textbox_scrollbar.set)
 
         self.tasks = None
+        self.scannedJobs = {}           # Number of jobs per task that were already considered for the trace bounds
+        self.coresFound = set()         # All cores on which jobs of the trace execute
 
         self.canvasItems = []           # Used to store all canvas items that are updated with a new view, so we can delete those easily
 
@@ -69,23 +94,108 @@ class TraceView(customtkinter.CTkCanvas):
 
     def setTasks(self, tasks):
         """
-        Function adds the tasks to the view.
+        Function adds the tasks (a TraceSet) to the view.
         """
+        if self.windowSource is not None:
+            self.windowSource.close()
+            self.windowSource = None
+        self.loadedWindow = None
+        self.requestedWindow = None
+
         self.tasks = tasks
+        self.scannedJobs = {}
+        self.coresFound = set()
 
         if self.tasks is not None:
             # Find the maximum time to display in ticks
-            self.rightBound_tks = 0
-            for task in self.tasks:
-                if task.id > 200:   # We are only interested in user tasks (all ISR task id < 100).
-                   
-                    lastExecution = self.findLastExecution(task)
+            self.updateTraceBounds()
+
+            self.rightBound_tks = self.zoomMin
+            if self.rightBound_tks > 100000:
+                self.rightBound_tks = 100000
+
+        else:
+            # If there is no task, reset bounds and legend width to default values.
+            self.leftBound_tks = 0
+            self.rightBound_tks = 50000
+            self.legend_px = 90
+            self.core = 1
+            self.clearTrace()
+
+    def extendTasks(self, tasks):
+        """
+        Function replaces the tasks of the view with a more complete version of the same trace (i.e. while the trace is still loaded).
+        The visible window is kept, only the end of the trace is moved. If the view shows the end of the trace, it grows with the trace.
+        """
+        oldEnd_tks = self.zoomMin
+
+        self.tasks = tasks
+        self.updateTraceBounds()
+
+        if self.rightBound_tks >= oldEnd_tks and self.rightBound_tks < 100000:
+            self.rightBound_tks = min(self.zoomMin, 100000)
+
+    def setWindowSource(self, source, end):
+        """
+        Function shows a trace that is reconstructed window by window (end is the time of its last event). With every draw,
+        the jobs of the visible window (with a margin of the view width on each side) are requested from the source, if the
+        tasks do not hold them yet (see showWindow()).
+        """
+        self.setTasks(None)
+        self.windowSource = source
 
-                    if lastExecution != None:
-                        if lastExecution > self.rightBound_tks:
-                            if task.name[:4] != 'IDLE':
-                                self.rightBound_tks = lastExecution
+        # we add one ms to the right bound to not finish the trace with the last event
+        self.zoomMin = end + 1000
+        self.leftBound_tks = 0
+        self.rightBound_tks = min(self.zoomMin, 100000)
 
+    def showWindow(self, tasks, start, stop):
+        """
+        Function replaces the tasks of the view with the jobs of the time window [start, stop] received from the window source.
+        """
+        if self.windowSource is None:
+            return
+
+        end_tks = self.zoomMin
+        self.tasks = tasks
+        self.scannedJobs = {}
+        self.updateTraceBounds()
+        self.zoomMin = end_tks          # The end of the trace is known from the source, not from the jobs of the window
+        self.loadedWindow = (start, stop)
+        self.draw()
+
+    def requestWindow(self):
+        """
+        Function requests the jobs of the visible window from the window source, unless they are already loaded or requested.
+        """
+        if self.windowSource is None:
+            return
+
+        for window in (self.loadedWindow, self.requestedWindow):
+            if window is not None and window[0] <= self.leftBound_tks and self.rightBound_tks <= window[1]:
+                return
+
+        viewWidth = self.rightBound_tks - self.leftBound_tks
+        self.requestedWindow = (max(self.leftBound_tks - viewWidth, 0), self.rightBound_tks + viewWidth)
+        self.windowSource.requestWindow(*self.requestedWindow)
+
+    def updateTraceBounds(self):
+        """
+        Function computes the end of the trace, the width of the legend and the number of cores used in the trace.
+        Jobs that were already scanned by a previous call are skipped, so this can be called for every chunk of a trace that is loaded.
+        """
+        lastExecution_tks = 0
+        for task in self.tasks:
+            if task.id > 200:   # We are only interested in user tasks (all ISR task id < 100).
+               
+                lastExecution = self.findLastExecution(task)
+
+                if lastExecution != None:
+                    if lastExecution > lastExecution_tks:
+                        if task.name[:4] != 'IDLE':
+                            lastExecution_tks = lastExecution
+
+            if task not in self.scannedJobs:
                 # Get the width of the task name on the canvas. We need to make sure that the legend width is large enough to hold the task name.
                 tmpElement = self.create_text(200, 200, anchor=customtkinter.N, text=task.name) # Create the text
                 bbox = self.bbox(tmpElement)    # Measure the text
@@ -94,34 +204,20 @@ class TraceView(customtkinter.CTkCanvas):
                 if elementWidth > self.legend_px:
                     self.legend_px = elementWidth
 
-            # we add one ms to the right bound to not finish the trace with the last event
-            self.rightBound_tks = self.rightBound_tks + 1000 
-            self.zoomMin = self.rightBound_tks
-
-            if self.rightBound_tks > 100000:
-                self.rightBound_tks = 100000
-
-            # Check how many cores are used in the trace. If there is one core, the task colors are used. If there are multiple cores, 
-            # one color is used per core. 
-            coresFound = []
-            for task in self.tasks:
-                for job in task.jobs:
-                    for exec in job.execIntervals:
-                        if exec.core not in coresFound:
-                            coresFound.append(exec.core)
-            
-            self.cores = len(coresFound)
+        # we add one ms to the right bound to not finish the trace with the last event
+        self.zoomMin = lastExecution_tks + 1000 
 
-            # Make sure that enough core colors are specified
-            assert max(coresFound) <= len(self.coreColors) - 1
+        # Check how many cores are used in the trace. If there is one core, the task colors are used. If there are multiple cores, 
+        # one color is used per core. 
+        for task in self.tasks:
+            self.coresFound.update(task.getCores(self.scannedJobs.get(task, 0)))
+            self.scannedJobs[task] = len(task.jobs)
+        
+        self.cores = len(self.coresFound)
 
-        else:
-            # If there is no task, reset bounds and legend width to default values.
-            self.leftBound_tks = 0
-            self.rightBound_tks = 50000
-            self.legend_px = 90
-            self.core = 1
-            self.clearTrace()
+        # Make sure that enough core colors are specified
+        if len(self.coresFound) > 0:
+            assert max(self.coresFound) <= len(self.coreColors) - 1
 
     def clearTrace(self):
         """
@@ -137,6 +233,8 @@ class TraceView(customtkinter.CTkCanvas):
         """
         #print("Draw...")
 
+        self.requestWindow()
+
         self.sizeX_px  = int(self.winfo_width())
 
         # Display a standard text if no task is set yet
@@ -146,6 +244,8 @@ class TraceView(customtkinter.CTkCanvas):
             traceHeight = 200
         else: 
             traceHeight = len(self.tasks) * self.taskTimelineHeight_px + self.borderY_px
+            if self.showUtilization:
+                traceHeight = traceHeight + self.utilizationChartHeight()
             
             # In case the view was updated, make sure to delete all canvas items first
             self.clearTrace()
@@ -176,10 +276,75 @@ class TraceView(customtkinter.CTkCanvas):
                 self.draw_line(self.sizeX_px - self.borderX_px, 0, self.sizeX_px - self.borderX_px, (self.taskTimelineHeight_px * (self.tasks.index(task) + 1)) - 1)
 
             self.paintLegend()
+
+            if self.showUtilization:
+                self.paintUtilization(len(self.tasks) * self.taskTimelineHeight_px + self.borderY_px)
+
+        self.updateStatus()
         
         self.configure(scrollregion = (0,0,100,traceHeight))
 
-        self.updateWindowHeight(traceHeight)
+        if self.fitWindowHeight:
+            self.updateWindowHeight(traceHeight)
+
+        # Linked views show the same time window. A linked view draws only if its window changed, so this does not recurse.
+        for view in self.linkedViews:
+            if view.leftBound_tks != self.leftBound_tks or view.rightBound_tks != self.rightBound_tks:
+                view.leftBound_tks = self.leftBound_tks
+                view.rightBound_tks = self.rightBound_tks
+                view.draw()
+
+    def utilizationChartHeight(self):
+        """
+        Returns the height of the utilization strip charts of all cores.
+        """
+        return len(TraceUtilization.getUtilizationIndex(self.tasks).cores) * (self.utilizationHeight_px + 10)
+
+    def paintUtilization(self, y):
+        """
+        Draws a strip chart for each core below the tasks. Each bin shows the busy percentage of the core in the bin,
+        stacked by task kind (user, isr, scheduler, idle).
+        """
+        plotWidth = self.sizeX_px - self.borderX_px - self.borderX_px - self.legend_px
+        bins = max(1, int(plotWidth / self.utilizationBin_px))
+        utilization = TraceUtilization.getUtilization(self.tasks, self.leftBound_tks, self.rightBound_tks, bins)
+        edges_px = [self.tickToPixel(edge) for edge in utilization.edges]
+
+        for row, core in enumerate(utilization.cores):
+            top = y + row * (self.utilizationHeight_px + 10)
+            bottom = top + self.utilizationHeight_px
+
+            self.draw_rectangle(self.plotXOffset(), top, self.sizeX_px - self.borderX_px, bottom, fill="#FFFFFF")
+            self.draw_text(self.legend_px + (self.borderX_px / 2), top + (self.utilizationHeight_px / 2), anchor=customtkinter.E, text="CPU " + str(core))
+
+            busy = utilization.busy[core]
+            for bin in range(bins):
+                level = bottom
+                for kind, color in self.utilizationColors.items():
+                    height = busy[kind][bin] * self.utilizationHeight_px
+                    if height >= 0.5:
+                        height = min(height, level - top)   # The stack can not be higher than the chart
+                        self.draw_rectangle(edges_px[bin], level - height, edges_px[bin + 1], level, fill=color, outline="")
+                        level = level - height
+
+    def setStatusLabel(self, label):
+        """
+        Sets a label that shows the statistics of the visible window. The label is updated with every draw (i.e. pan and zoom).
+        """
+        self.statusLabel = label
+        self.updateStatus()
+
+    def updateStatus(self):
+        """
+        Updates the status label with the statistics of the visible window.
+        """
+        if self.statusLabel is None:
+            return
+
+        if self.tasks is None or self.rightBound_tks <= self.leftBound_tks:
+            self.statusLabel.configure(text="")
+        else:
+            self.statusLabel.configure(text=TraceStatistics.getWindowSummary(self.tasks, self.leftBound_tks, self.rightBound_tks))
 
     def paintLegend(self):
         """
@@ -211,6 +376,39 @@ class TraceView(customtkinter.CTkCanvas):
 
             self.paintJob(task, job, y, deadlineMissAt)
 
+        if self.showReadyPhases:
+            self.paintReady(task, y)
+
+        if self.highlights is not None and task in self.highlights:
+            self.paintHighlights(task, y)
+
+    def paintHighlights(self, task, y):
+        """
+        Function outlines the highlighted time windows of the task that are in view.
+        """
+        start, stop = self.highlights[task]
+        # The windows do not overlap, so both start and stop are sorted
+        begin = np.searchsorted(stop, self.leftBound_tks, side='left')
+        end = np.searchsorted(start, self.rightBound_tks, side='right')
+        for first, last in zip(start[begin:end].tolist(), stop[begin:end].tolist()):
+            first_px = self.tickToPixel(max(first, self.leftBound_tks))
+            last_px = self.tickToPixel(min(last, self.rightBound_tks))
+            self.draw_rectangle(first_px - 1, y - 2, max(last_px, first_px + 1) + 1, y + self.taskHeight_px + 2, outline=self.highlightColor)
+
+    def paintReady(self, task, y):
+        """
+        Function draws the ready phases of the task (ready but not running) that are in view as hatched segments.
+        """
+        latency = TraceLatency.analyzeReadyLatency(self.tasks)
+        if latency is None:
+            return  # No events yet (the trace is still loaded)
+
+        for ready, start in latency.getSegments(task.id, self.leftBound_tks, self.rightBound_tks):
+            ready_px = self.tickToPixel(max(ready, self.leftBound_tks))
+            start_px = self.tickToPixel(min(start, self.rightBound_tks))
+            if start_px - ready_px >= 1:
+                self.draw_hatch(ready_px, y, start_px, y + self.taskHeight_px, self.readyHatchColor)
+
     def paintJob(self, task, job, y, deadlineMissAt):
         """
         Function prints the job to the canvas. 
@@ -342,6 +540,11 @@ class TraceView(customtkinter.CTkCanvas):
         This is used to more efficiently update the view if there are a large number of task jobs. 
         This function is called once the visible view changes and updates the minimum and maximum visible job index of each task.
         """
+        if task.columns is not None:
+            # The jobs of a frozen task are stored as columns, so the visible jobs are found with a binary search.
+            task.leftIndex, task.rightIndex = task.getVisibleJobs(self.leftBound_tks, self.rightBound_tks)
+            return
+
         maxIndex = len(task.jobs) - 1
 
         # Here we prepare the index accoring to the currently visible window. 
@@ -546,6 +749,65 @@ class TraceView(customtkinter.CTkCanvas):
 
         self.draw()
 
+    def centerView(self, start, stop=None):
+        """
+        Moves the view to show the time window [start, stop] (or the time start with the current view width) in the center.
+        The window is shown with a margin of its length on each side.
+        """
+        if stop is None:
+            newWidth = self.rightBound_tks - self.leftBound_tks
+            stop = start
+        else:
+            newWidth = 3 * (stop - start)
+
+        if newWidth < self.zoomMax:     # Enforce maximum zoom level
+            newWidth = self.zoomMax
+        elif newWidth > self.zoomMin:   # Enforce minimum zoom level
+            newWidth = self.zoomMin
+
+        center = (start + stop) / 2
+        self.leftBound_tks = center - (newWidth / 2)
+        self.rightBound_tks = center + (newWidth / 2)
+
+        if self.leftBound_tks < 0:  # Don't allow to display negative times
+            self.leftBound_tks = 0
+            self.rightBound_tks = newWidth
+        elif self.rightBound_tks > self.zoomMin:    # Don't allow to display times larger than the last event.
+            self.leftBound_tks = self.zoomMin - newWidth
+            self.rightBound_tks = self.zoomMin
+
+        self.draw()
+
+    def jumpToIssue(self, direction):
+        """
+        Centers the view on the next (direction 1) or previous (direction -1) timing issue (deadline miss, incomplete job or
+        response time outlier). If the view was not moved since the last jump, the issue after the last one is shown, otherwise
+        the issue after (or before) the center of the view.
+        """
+        if self.tasks is None:
+            return None
+
+        index = TraceIssues.getIssueIndex(self.tasks)
+        if self.issueRow is not None and self.issueView == (self.leftBound_tks, self.rightBound_tks):
+            row = self.issueRow + direction
+            if row < 0 or row >= len(index):
+                row = None
+        else:
+            center = (self.leftBound_tks + self.rightBound_tks) / 2
+            row = index.findNext(center) if direction > 0 else index.findPrevious(center)
+
+        if row is None:
+            HelperFunctions.printState("No further timing issue")
+            return None
+
+        self.centerView(float(index.start[row]), float(index.stop[row]))
+        self.issueRow = row
+        self.issueView = (self.leftBound_tks, self.rightBound_tks)
+
+        task = index.tasks[row]
+        HelperFunctions.printState("Issue " + str(row + 1) + "/" + str(len(index)) + ": " + TraceIssues.issueKinds[index.kind[row]], (task.name if task is not None else "") + " at " + str(round(float(index.time[row]), 1)))
+        return row
+
     def mouseDragHandler(self, event):
         """
         Function to handle mouse drag events. If the button was pressed before, this means 
@@ -588,13 +850,7 @@ class TraceView(customtkinter.CTkCanvas):
         self.moveView = False
 
     def findLastExecution(self, task):
-        id = len(task.jobs) - 1
-        
-        while id >= 0:
-            if task.jobs[id].getFinishTime() != None:
-                return task.jobs[id].getFinishTime()
-            id = id - 1
-        return None
+        return task.getLastFinishTime()
     
     def updateWindowHeight(self, traceHeight):
 
@@ -625,9 +881,9 @@ class TraceView(customtkinter.CTkCanvas):
             self.exportCanvas.setStrokeColor(HexColor(color_pdf))
             self.exportCanvas.line(x1_pt, y1_pt, x2_pt, y2_pt)
 
-    def draw_rectangle(self, x1, y1, x2, y2, fill="", ):
+    def draw_rectangle(self, x1, y1, x2, y2, fill="", outline="#000000"):
         if self.exportCanvas is None:
-            self.canvasItems.append(self.create_rectangle(x1, y1, x2, y2, fill=fill))
+            self.canvasItems.append(self.create_rectangle(x1, y1, x2, y2, fill=fill, outline=outline))
         else:
             if fill == "":
                 fillFlag = 0
@@ -645,8 +901,23 @@ class TraceView(customtkinter.CTkCanvas):
             color_pdf = self.to_hex6(fill)
             self.exportCanvas.setLineWidth(line_width_pt)
             self.exportCanvas.setFillColor(HexColor(color_pdf))
-            self.exportCanvas.setStrokeColor(HexColor("#000000"))
-            self.exportCanvas.rect(x1_pt, y1_pt, width_pt, height_pt, stroke=1, fill=fillFlag)
+            self.exportCanvas.setStrokeColor(HexColor(self.to_hex6(outline) if outline != "" else "#000000"))
+            self.exportCanvas.rect(x1_pt, y1_pt, width_pt, height_pt, stroke=0 if outline == "" else 1, fill=fillFlag)
+
+    def draw_hatch(self, x1, y1, x2, y2, color):
+        """
+        Draws a rectangle with diagonal hatch lines. The lines are clipped to the rectangle, so this works on the canvas and on the PDF.
+        """
+        height = y2 - y1
+        x = x1 - height
+        while x < x2:
+            # Line from (x, y2) to (x + height, y1), clipped to x1 <= x <= x2
+            t1 = max(0, x1 - x)
+            t2 = min(height, x2 - x)
+            if t2 > t1:
+                self.draw_line(x + t1, y2 - t1, x + t2, y2 - t2, fill=color)
+            x = x + self.readyHatch_px
+        self.draw_rectangle(x1, y1, x2, y2, outline=color)
 
     def draw_oval(self, x1, y1, x2, y2, fill="", outline="#000000", width=1):
         if self.exportCanvas is None:
@@ -0,0 +1,344 @@
+import argparse
+import concurrent.futures
+import contextlib
+import fnmatch
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+import HelperFunctions
+import TraceStatistics
+import TraceBatch
+
+"""
+SQLite warehouse of parsed recordings. The tasks, jobs, execution intervals, mutex accesses and task statistics of each
+recording are stored in one indexed database (data/warehouse.sqlite by default), so questions across many recordings
+(e.g. the worst response time of a task in all recordings of this month) are answered by a query instead of parsing
+every recording again.
+A recording is identified by its target, its name and the hash of its trace files (the files written by the parsers,
+e.g. events.txt, are not hashed). Ingesting a recording that is already in the warehouse with the same trace files does
+nothing, all rows of a recording are inserted with executemany in a single transaction.
+
+Example:
+    python TraceWarehouse.py ingest Pico2_FreeRTOS_SRAM "nightly_*" --jobs 8
+    python TraceWarehouse.py worst TaskA --since 2026-10-01
+"""
+
+"""
+Version of the database schema. A database with another version has to be recreated.
+"""
+schemaVersion = 2
+
+schema = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    target TEXT NOT NULL,
+    name TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    format TEXT,
+    unit TEXT,
+    recordedAt TEXT NOT NULL,
+    ingestedAt TEXT NOT NULL,
+    UNIQUE (target, name)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    recording INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    priority INTEGER,
+    period REAL,
+    jobs INTEGER NOT NULL,
+    incompleteJobs INTEGER NOT NULL,
+    deadlineMisses INTEGER NOT NULL,
+    PRIMARY KEY (recording, task)
+);
+CREATE TABLE IF NOT EXISTS taskStatistics (
+    recording INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    min REAL,
+    avg REAL,
+    max REAL,
+    p50 REAL,
+    p99 REAL,
+    PRIMARY KEY (recording, task, metric)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    recording INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    job INTEGER NOT NULL,
+    release REAL NOT NULL,
+    deadline REAL,
+    start REAL,
+    finish REAL,
+    responseTime REAL,
+    executionTime REAL,
+    incomplete INTEGER NOT NULL,
+    deadlineMiss INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    recording INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    job INTEGER NOT NULL,
+    start REAL NOT NULL,
+    stop REAL NOT NULL,
+    core INTEGER NOT NULL,
+    type INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mutexAccesses (
+    recording INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    task INTEGER NOT NULL,
+    job INTEGER NOT NULL,
+    mutex INTEGER NOT NULL,
+    letter TEXT,
+    start REAL NOT NULL,
+    stop REAL
+);
+CREATE INDEX IF NOT EXISTS recordingsByTime ON recordings (recordedAt);
+CREATE INDEX IF NOT EXISTS recordingsByHash ON recordings (hash);
+CREATE INDEX IF NOT EXISTS tasksByName ON tasks (name);
+CREATE INDEX IF NOT EXISTS jobsByTask ON jobs (recording, task, release);
+CREATE INDEX IF NOT EXISTS jobsByResponseTime ON jobs (responseTime);
+CREATE INDEX IF NOT EXISTS intervalsByTask ON intervals (recording, task, start);
+CREATE INDEX IF NOT EXISTS mutexAccessesByMutex ON mutexAccesses (recording, mutex, start);
+"""
+
+def getDatabasePath():
+    """
+    Returns the default path of the warehouse database.
+    """
+    return os.path.join(TraceBatch.getDataPath(), 'warehouse.sqlite')
+
+def connect(filename):
+    """
+    Opens (and creates, if needed) the warehouse database.
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA journal_mode = WAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, schemaVersion):
+        connection.close()
+        raise RuntimeError("Warehouse " + filename + " has schema version " + str(version) + ", expected " + str(schemaVersion))
+
+    connection.executescript(schema)
+    connection.execute("PRAGMA user_version = " + str(schemaVersion))
+    return connection
+
+"""
+Trace files of a recording (fnmatch patterns): the raw buffers of the FreeRTOS targets and the trace of the Linux targets.
+"""
+traceFiles = ('raw_buffer*.txt', 'trace.txt')
+
+def hashRecording(folderName):
+    """
+    Returns the SHA-256 hash of the trace files of a recording (names and content, in the order of the file names).
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(folderName)):
+        path = os.path.join(folderName, name)
+        if not os.path.isfile(path) or not any(fnmatch.fnmatch(name, pattern) for pattern in traceFiles):
+            continue
+        digest.update(name.encode())
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+def getRecordingTime(folderName):
+    """
+    Returns the time of a recording as 'YYYY-MM-DD HH:MM:SS'. This is the time string appended to the measurement name
+    when the recording was made (see HelperFunctions.getRecordingFolderName()), or the modification time of the folder.
+    """
+    try:
+        recorded = datetime.strptime(os.path.basename(folderName)[-19:], "%Y-%m-%d_%H:%M:%S")
+    except ValueError:
+        recorded = datetime.fromtimestamp(os.path.getmtime(folderName))
+    return recorded.strftime("%Y-%m-%d %H:%M:%S")
+
+def extractRows(traceSet):
+    """
+    Returns the rows of a parsed trace set for each table (except recordings), as columns of NumPy arrays or lists.
+    The first column (the recording) is added when the rows are inserted.
+    """
+    taskRows = []
+    statisticRows = []
+    tables = {'jobs': [], 'intervals': [], 'mutexAccesses': []}
+    estimates = traceSet.periods if traceSet.periods is not None else {}
+
+    for index, statistics in enumerate(TraceStatistics.getStatistics(traceSet)):
+        task = statistics.task
+        estimate = estimates.get(task)
+        period = float(estimate.period) if estimate is not None and estimate.isPeriodic() else None
+        taskRows.append((index, task.id, task.name, traceSet.getTaskKind(task), task.priority, period, statistics.jobs, statistics.incompleteJobs, statistics.deadlineMisses))
+        for metric, values in statistics.metrics.items():
+            statisticRows.append((index, metric) + tuple(values[field] for field in TraceStatistics.summaryFields))
+
+        metrics = TraceStatistics.getJobMetrics(task)
+        columns = task.columns
+        jobs = len(columns['job_id'])
+        tables['jobs'].append([np.full(jobs, index), columns['job_id'], columns['job_release'], columns['job_deadline'], columns['job_start'], columns['job_finish'],
+                               metrics['responseTime'], metrics['executionTime'], columns['job_incomplete'], metrics['deadlineMiss']])
+
+        intervalJobs = np.repeat(columns['job_id'], np.diff(columns['job_intervalOffset']))
+        tables['intervals'].append([np.full(len(intervalJobs), index), intervalJobs, columns['interval_start'], columns['interval_stop'],
+                                    columns['interval_core'], columns['interval_type']])
+
+        mutexJobs = np.repeat(columns['job_id'], np.diff(columns['job_mutexOffset']))
+        letters = np.where(columns['mutex_letter'] > 0, columns['mutex_letter'], ord('?')).astype(np.uint8).tobytes().decode('ascii')
+        tables['mutexAccesses'].append([np.full(len(mutexJobs), index), mutexJobs, columns['mutex_id'], list(letters), columns['mutex_start'], columns['mutex_stop']])
+
+    rows = {'tasks': taskRows, 'taskStatistics': statisticRows}
+    for table, parts in tables.items():
+        rows[table] = [np.concatenate([part[column] for part in parts]) if len(parts) > 0 else np.zeros(0) for column in range(len(parts[0]) if len(parts) > 0 else 0)]
+    return rows
+
+def toSql(column):
+    """
+    Converts a column to a list of Python values, NaN is stored as NULL.
+    """
+    if isinstance(column, np.ndarray) and column.dtype.kind == 'f':
+        return [None if value != value else value for value in column.tolist()]
+    if isinstance(column, np.ndarray):
+        return column.tolist()
+    return column
+
+def prepareRecording(targetName, folderName):
+    """
+    Parses a recording and returns the information of the recording and its rows (see extractRows()).
+    This is the function executed by the workers of the process pool.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        traceSet = TraceBatch.loadRecording(targetName, folderName)
+        rows = extractRows(traceSet)
+    info = {'format': traceSet.traceFormat, 'unit': TraceStatistics.getTimeUnit(traceSet)}
+    return info, rows
+
+def insertRecording(connection, recordingHash, targetName, folderName, info, rows):
+    """
+    Inserts a recording with all its rows in a single transaction. Returns the id of the recording.
+    A previous version of the recording (same target and name, other files) is replaced.
+    """
+    with connection:
+        connection.execute("DELETE FROM recordings WHERE target = ? AND name = ?", (targetName, os.path.basename(folderName)))
+        cursor = connection.execute("INSERT INTO recordings (hash, target, name, folder, format, unit, recordedAt, ingestedAt) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    (recordingHash, targetName, os.path.basename(folderName), folderName, info['format'], info['unit'],
+                                     getRecordingTime(folderName), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        recording = cursor.lastrowid
+
+        connection.executemany("INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", ((recording,) + row for row in rows['tasks']))
+        connection.executemany("INSERT INTO taskStatistics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ((recording,) + row for row in rows['taskStatistics']))
+        for table in ('jobs', 'intervals', 'mutexAccesses'):
+            columns = [toSql(column) for column in rows[table]]
+            if len(columns) > 0:
+                placeholders = ", ".join("?" * (len(columns) + 1))
+                connection.executemany("INSERT INTO " + table + " VALUES (" + placeholders + ")", ((recording,) + row for row in zip(*columns)))
+    return recording
+
+def ingestRecordings(databaseName, targetName, recordings, dataPath, jobs=None):
+    """
+    Parses the recordings of the target that are not yet in the warehouse on a process pool and inserts them.
+    Returns the number of ingested, skipped (already in the warehouse) and failed recordings.
+    """
+    connection = connect(databaseName)
+    targetFolder = os.path.join(dataPath, targetName)
+
+    pending = {}
+    for name in recordings:
+        folderName = os.path.join(targetFolder, name)
+        recordingHash = hashRecording(folderName)
+        if connection.execute("SELECT 1 FROM recordings WHERE target = ? AND name = ? AND hash = ?", (targetName, name, recordingHash)).fetchone() is None:
+            pending[folderName] = recordingHash
+    skipped = len(recordings) - len(pending)
+    ingested = 0
+    failed = 0
+
+    # Only the main process writes to the database, the workers parse.
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=context) as pool:
+        futures = {pool.submit(prepareRecording, targetName, folderName): folderName for folderName in pending}
+        for future in concurrent.futures.as_completed(futures):
+            folderName = futures[future]
+            try:
+                info, rows = future.result()
+            except Exception as e:
+                failed = failed + 1
+                HelperFunctions.printState("Failed to parse", info=os.path.basename(folderName) + ": " + str(e))
+                continue
+            insertRecording(connection, pending[folderName], targetName, folderName, info, rows)
+            ingested = ingested + 1
+            HelperFunctions.printState("Ingested", info=os.path.basename(folderName))
+
+    connection.close()
+    return ingested, skipped, failed
+
+def getWorstResponseTimes(connection, taskName, since=None, until=None, target=None):
+    """
+    Returns (recording name, recorded at, worst response time, unit) of the task in all recordings of the time range
+    ('YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS', both optional), the worst first.
+    """
+    query = ("SELECT r.name, r.recordedAt, s.max, r.unit FROM tasks t JOIN recordings r ON r.id = t.recording "
+             "JOIN taskStatistics s ON s.recording = t.recording AND s.task = t.task AND s.metric = 'responseTime' WHERE t.name = ? AND s.max IS NOT NULL")
+    args = [taskName]
+    if since is not None:
+        query = query + " AND r.recordedAt >= ?"
+        args.append(since)
+    if until is not None:
+        query = query + " AND r.recordedAt < ?"
+        args.append(until)
+    if target is not None:
+        query = query + " AND r.target = ?"
+        args.append(target)
+    return connection.execute(query + " ORDER BY s.max DESC", args).fetchall()
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Stores parsed recordings in an SQLite database and queries it.")
+    ap.add_argument("--database", default=getDatabasePath(), help="Warehouse database file")
+    commands = ap.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Parse recordings and store them in the warehouse")
+    ingest.add_argument("target", choices=sorted(TraceBatch.batchTargets), help="Target, i.e. the data folder of the recordings")
+    ingest.add_argument("recordings", nargs="*", help="Recordings (folder names or fnmatch patterns), all recordings of the target if omitted")
+    ingest.add_argument("--data", default=TraceBatch.getDataPath(), help="Folder that contains the data folders of the targets")
+    ingest.add_argument("--jobs", type=int, default=None, help="Number of worker processes (default: number of CPUs)")
+
+    worst = commands.add_parser("worst", help="Worst response time of a task in each recording")
+    worst.add_argument("task", help="Name of the task")
+    worst.add_argument("--since", default=None, help="Only recordings made at or after this time (YYYY-MM-DD)")
+    worst.add_argument("--until", default=None, help="Only recordings made before this time (YYYY-MM-DD)")
+    worst.add_argument("--target", default=None, help="Only recordings of this target")
+
+    sql = commands.add_parser("sql", help="Run an SQL query on the warehouse")
+    sql.add_argument("query", help="SQL query")
+    args = ap.parse_args()
+
+    if args.command == "ingest":
+        targetFolder = os.path.join(args.data, args.target)
+        if not os.path.isdir(targetFolder):
+            print("Error: Folder " + targetFolder + " does not exist!")
+            return TraceBatch.exitError
+        recordings = TraceBatch.findRecordings(targetFolder, args.recordings)
+        ingested, skipped, failed = ingestRecordings(args.database, args.target, recordings, args.data, args.jobs)
+        HelperFunctions.printState("Done", info=str(ingested) + " ingested, " + str(skipped) + " already in the warehouse, " + str(failed) + " failed")
+        return TraceBatch.exitError if failed > 0 else 0
+
+    connection = connect(args.database)
+    if args.command == "worst":
+        for name, recordedAt, responseTime, unit in getWorstResponseTimes(connection, args.task, args.since, args.until, args.target):
+            print(recordedAt + "  " + name + ": " + str(round(responseTime, 1)) + " " + unit)
+    else:
+        cursor = connection.execute(args.query)
+        if cursor.description is not None:
+            print("\t".join(column[0] for column in cursor.description))
+        for row in cursor:
+            print("\t".join(str(value) for value in row))
+    connection.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+import contextlib
+import io
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import TraceParserFreeRTOS
+import TraceStatistics
+
+"""
+Synthetic two core recording: the tick ISRs (ids 15 and 42) run every 1000us. TaskB (core 0) executes longer than its
+period, so it misses its deadline and reports it with TRACE_DELAY_UNTIL.
+Each task is (id, name, priority, core, period in ticks, execution time in us).
+"""
+tickIds = [15, 42]
+tasks = [
+    (0x20001000, "TaskA", 3, 0, 5, 300),
+    (0x20002000, "TaskB", 2, 0, 10, 9800),
+    (0x20003000, "TaskC", 2, 1, 4, 400),
+    (0x20004000, "IDLE0", 0, 0, None, None),
+    (0x20005000, "IDLE1", 0, 1, None, None),
+]
+
+class TraceBuffer():
+    def __init__(self):
+        self.data = bytearray()
+        self.time = 0
+
+    def event(self, time, eventId, *values, payload=b""):
+        self.data += struct.pack("<HH", time - self.time, eventId)
+        self.time = time
+        for value in values:
+            self.data += struct.pack("<I", value)
+        self.data += payload
+
+def writeRecording(folder, ticks):
+    """
+    Writes the trace buffers of the synthetic recording to the folder.
+    """
+    buffers = [TraceBuffer(), TraceBuffer()]
+    start = 5000
+    for id, name, priority, core, period, execution in tasks:
+        encoded = name.encode() + b"\0"
+        encoded = encoded + b"\0" * (-len(encoded) % 4)
+        buffers[0].event(start + 10, TraceParserFreeRTOS.TRACE_TASK_CREATE, id, len(encoded) // 4, priority, payload=encoded)
+
+    for core, buffer in enumerate(buffers):
+        coreTasks = [task for task in tasks if task[3] == core and task[4] is not None]
+        ready = []      # [task, remaining execution time, release tick]
+        running = None
+        buffer.event(start + 100, TraceParserFreeRTOS.TRACE_IDLE)
+        for tick in range(ticks):
+            now = start + 1000 * (tick + 1)
+            released = [task for task in coreTasks if tick % task[4] == 0]
+            buffer.event(now, TraceParserFreeRTOS.TRACE_ISR_ENTER, tickIds[core])
+            for task in released:
+                buffer.event(now + 3, TraceParserFreeRTOS.TRACE_TASK_START_READY, task[0])
+                ready.append([task, task[5], tick])
+            ready.sort(key=lambda job: -job[0][2])
+
+            if len(released) > 0:
+                buffer.event(now + 8, TraceParserFreeRTOS.TRACE_ISR_EXIT_TO_SCHEDULER)
+                now = now + 12
+                if running is not None and running is not ready[0]:
+                    buffer.event(now, TraceParserFreeRTOS.TRACE_TASK_STOP_EXEC, running[0][0])
+                    now = now + 4
+                if running is not ready[0]:
+                    running = ready[0]
+                    buffer.event(now, TraceParserFreeRTOS.TRACE_TASK_START_EXEC, running[0][0])
+                    now = now + 2
+            else:
+                buffer.event(now + 8, TraceParserFreeRTOS.TRACE_ISR_EXIT)
+                now = now + 10
+
+            end = start + 1000 * (tick + 2) - 20
+            while running is not None and now < end:
+                executed = min(running[1], end - now)
+                now = now + executed
+                running[1] = running[1] - executed
+                if running[1] == 0:
+                    wake = running[2] + running[0][4]
+                    missed = 1 if wake <= tick else 0
+                    buffer.event(now, TraceParserFreeRTOS.TRACE_DELAY_UNTIL, wake | (missed << 31))
+                    buffer.event(now + 2, TraceParserFreeRTOS.TRACE_TASK_STOP_EXEC, running[0][0])
+                    now = now + 4
+                    ready.remove(running)
+                    running = ready[0] if len(ready) > 0 else None
+                    if running is not None:
+                        buffer.event(now, TraceParserFreeRTOS.TRACE_TASK_START_EXEC, running[0][0])
+                        now = now + 2
+                    else:
+                        buffer.event(now, TraceParserFreeRTOS.TRACE_IDLE)
+
+    for core, buffer in enumerate(buffers):
+        with open(os.path.join(folder, "raw_buffer" + str(core) + ".txt"), "wb") as file:
+            file.write(buffer.data)
+
+def getJobs(task):
+    return [(job.releaseTime, [(interval.start, interval.stop, interval.core) for interval in job.execIntervals]) for job in task.jobs]
+
+class FilterSpecTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        writeRecording(self.folder.name, 400)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def parse(self, filterSpec=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            traceSet, events = TraceParserFreeRTOS.parseRecording(self.folder.name, 2, filterSpec)
+        return traceSet, events
+
+    def testDeadlineMissesInTimeWindow(self):
+        full, events = self.parse()
+        self.assertTrue(any(evt.get('deadlineMiss') for evt in events if evt['type'] == TraceParserFreeRTOS.TRACE_DELAY_UNTIL))
+
+        start = 150000
+        stop = 300000
+        window, events = self.parse(TraceParserFreeRTOS.FilterSpec(start=start, stop=stop))
+        self.assertTrue(all(start <= evt['ts'] <= stop for evt in events))
+
+        # The jobs that are completely in the window are the same as in the complete trace (including the jobs that are
+        # released at the missed tick after a deadline miss).
+        for task in window:
+            expected = [job for job in getJobs(full.findByName(task.name)) if job[0] >= start and job[1][-1][1] <= stop]
+            jobs = getJobs(task)
+            self.assertTrue(len(expected) > 0)
+            for job in expected:
+                self.assertIn(job, jobs)
+
+    def testEmptyFilter(self):
+        full, events = self.parse()
+        filtered, filteredEvents = self.parse(TraceParserFreeRTOS.FilterSpec())
+        self.assertEqual(events, filteredEvents)
+        self.assertEqual([getJobs(task) for task in full], [getJobs(task) for task in filtered])
+
+    def testEventStoreWindow(self):
+        filterSpec = TraceParserFreeRTOS.FilterSpec(taskIds=[tasks[0][0], tasks[1][0]], start=150000, stop=300000)
+        window, events = self.parse(filterSpec)
+
+        # Keep the events of the recording in an event store, the window is selected in the sorted timestamps
+        outOfCoreBytes = TraceParserFreeRTOS.TraceEventStore.outOfCoreBytes
+        TraceParserFreeRTOS.TraceEventStore.outOfCoreBytes = 0
+        try:
+            stored, storedEvents = self.parse(filterSpec)
+        finally:
+            TraceParserFreeRTOS.TraceEventStore.outOfCoreBytes = outOfCoreBytes
+
+        self.assertIsInstance(storedEvents, TraceParserFreeRTOS.TraceEventStore.EventWindow)
+        self.assertTrue(all(150000 <= evt['ts'] <= 300000 for evt in storedEvents))
+        self.assertEqual([task.name for task in window], [task.name for task in stored])
+        self.assertEqual([getJobs(task) for task in window], [getJobs(task) for task in stored])
+
+class WindowedTraceTest(unittest.TestCase):
+    def testWindowsOfFullParse(self):
+        with tempfile.TemporaryDirectory() as folder:
+            writeRecording(folder, 400)
+            with contextlib.redirect_stdout(io.StringIO()):
+                full, events = TraceParserFreeRTOS.parseRecording(folder, 2)
+                trace = TraceParserFreeRTOS.parseRecordingWindowed(folder, 2, interval=500)
+
+                # The windows are not requested in order, the checkpoints saved for one window are used by the next ones
+                for start, stop in [(300000, 320000), (10000, 60000), (150000, 151000), (398000, 420000), (0, 420000)]:
+                    window = trace.getWindow(start, stop)
+                    self.assertEqual([task.name for task in full], [task.name for task in window])
+                    for task in window:
+                        expected = [job for job in full.findByName(task.name).jobs if job.releaseTime <= stop and job.getFinishTime() >= start]
+                        self.assertEqual([(job.id, job.incomplete) for job in expected], [(job.id, job.incomplete) for job in task.jobs])
+                        self.assertEqual(getJobs(task), [(job.releaseTime, [(interval.start, interval.stop, interval.core) for interval in job.execIntervals]) for job in expected])
+
+            self.assertTrue(len(trace.checkpoints) > 5)
+
+class IncompleteJobsTest(unittest.TestCase):
+    def testJobsCutAtEndOfTrace(self):
+        with tempfile.TemporaryDirectory() as folder:
+            writeRecording(folder, 400)
+            with contextlib.redirect_stdout(io.StringIO()):
+                traceSet, events = TraceParserFreeRTOS.parseRecording(folder, 2)
+
+        # TaskB executes longer than its period, its last job is still running at the end of the trace
+        task = traceSet.findByName("TaskB")
+        self.assertTrue(task.jobs[-1].incomplete)
+        self.assertFalse(any(job.incomplete for job in task.jobs[:-1]))
+
+        statistics = TraceStatistics.computeTaskStatistics(task)
+        self.assertEqual(statistics.incompleteJobs, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import TraceParserFreeRTOS
+import TraceServer
+from test_TraceParserFreeRTOS import writeRecording
+
+class IntervalPagesTest(unittest.TestCase):
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as folder:
+            writeRecording(folder, 200)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.traceSet, events = TraceParserFreeRTOS.parseRecording(folder, 2)
+
+    def getPages(self, query):
+        intervals = []
+        while True:
+            taskIndex, start, stop, core, nextCursor = TraceServer.getIntervals(self.traceSet, query)
+            intervals += list(zip(start.tolist(), taskIndex.tolist(), stop.tolist()))
+            if nextCursor is None:
+                return intervals
+            query = dict(query, after=[nextCursor])
+
+    def testPagesReturnEachIntervalOnce(self):
+        # Intervals with the same start in several tasks are split over pages
+        taskIndex, start, stop, core, nextCursor = TraceServer.getIntervals(self.traceSet, {})
+        self.assertIsNone(nextCursor)
+        self.assertTrue(len(start) > len(set(start.tolist())))
+        for limit in (1, 3, 100):
+            intervals = self.getPages({'limit': [str(limit)]})
+            self.assertEqual(len(intervals), len(start))
+            self.assertEqual(len(set(intervals)), len(start))
+            self.assertEqual(intervals, sorted(intervals))
+
+    def testPagesOfWindow(self):
+        query = {'start': ['50000'], 'stop': ['120000']}
+        taskIndex, start, stop, core, nextCursor = TraceServer.getIntervals(self.traceSet, query)
+        self.assertIsNone(nextCursor)
+        self.assertEqual(self.getPages(dict(query, limit=['7'])), list(zip(start.tolist(), taskIndex.tolist(), stop.tolist())))
+
+if __name__ == "__main__":
+    unittest.main()